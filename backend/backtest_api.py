@@ -1,9 +1,18 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
 from typing import Optional, List
-import pandas as pd
-import market_data
-import backtester
+from lazy import lazy_import
+import singleflight
+
+# Data-stack modules load on first use (see lazy.py)
+np = lazy_import("numpy")
+backtester = lazy_import("backtester")
+costs = lazy_import("costs")
+feature_store = lazy_import("feature_store")
+result_cache = lazy_import("result_cache")
+oracle_training = lazy_import("oracle_training")
+serialization = lazy_import("serialization")
 
 router = APIRouter()
 
@@ -13,64 +22,113 @@ class BacktestRequest(BaseModel):
     timeframe: str = "1h"
     logic: Optional[dict] = None # Placeholder for dynamic rules
 
+def logic_error(df, logic):
+    """
+    Why logic cannot run on df, or None: invalid cost overrides or engine params (leverage,
+    invest_limit, ...) for any strategy type, and for RULES unknown columns / operators /
+    actions or bad indicator params.
+    """
+    if not logic:
+        return None
+    error = costs.config_error(logic.get("costs"))
+    if error:
+        return error
+    params = logic.get("params") or {}
+    if not isinstance(params, dict):
+        return "params must be an object"
+    try:
+        backtester.engine_params(params)
+    except ValueError as e:
+        return str(e)
+    if logic.get("type") != "RULES":
+        return None
+    try:
+        return backtester.check_rules(backtester.rule_columns(df, params), params)
+    except (TypeError, ValueError, KeyError, AttributeError) as e:
+        return f"Invalid indicators: {e}"
+
+def check_logic(df, logic):
+    """
+    400 for logic that cannot run (instead of a 500 mid-backtest).
+    """
+    error = logic_error(df, logic)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+def buy_and_hold_curve(df, initial_cap=10000):
+    """
+    Benchmark (Buy and Hold) equity curve in the same shape as run_backtest's.
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    dates = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+    equity = initial_cap * (close / close[0])
+    
+    return [
+        {"date": d, "equity": round(e, 2), "price": p}
+        for d, e, p in zip(dates, equity.tolist(), close.tolist())
+    ]
+
 @router.post("/run")
-async def run_backtest_endpoint(req: BacktestRequest):
+async def run_backtest_endpoint(req: BacktestRequest, request: Request):
+    # Blocking work runs in threads so concurrent identical requests can be coalesced
     # 1. Fetch Real Data
-    df = market_data.fetch_candles(req.market, req.timeframe)
+    df = await asyncio.to_thread(feature_store.get_features, req.market, req.timeframe)
     if df.empty:
         return {"error": "Could not fetch market data"}
+    check_logic(df, req.logic)
     
     # 2. Run Backtest
     # Pass 'req.logic' in future for dynamic. Currently defaults to RSI logic in backtester.py
-    results = backtester.run_backtest(df, req.logic)
+    results = await asyncio.to_thread(result_cache.cached_backtest, df, req.logic)
     
-    return results
+    return serialization.respond(request, results, arrow_result=results)
 
 @router.post("/compare")
-async def run_comparison(req: BacktestRequest):
+async def run_comparison(req: BacktestRequest, request: Request):
     """
     Runs the strategy AND a "Buy & Hold" benchmark.
     """
-    df = market_data.fetch_candles(req.market, req.timeframe)
+    df = await asyncio.to_thread(feature_store.get_features, req.market, req.timeframe)
     if df.empty:
         return {"error": "No data"}
+    check_logic(df, req.logic)
         
     # Strategy
-    strat_results = backtester.run_backtest(df, req.logic)
-    
-    # Benchmark (Buy and Hold)
-    initial_price = df.iloc[0]['close']
-    initial_cap = 10000
-    benchmark_curve = []
-    
-    for index, row in df.iterrows():
-        equity = initial_cap * (row['close'] / initial_price)
-        benchmark_curve.append({
-            "date": row['timestamp'].strftime('%Y-%m-%d %H:%M'),
-            "equity": round(equity, 2),
-            "price": row['close']
-        })
-        
-    return {
-        "strategy": strat_results,
-        "benchmark": benchmark_curve
-    }
+    strat_results = await asyncio.to_thread(result_cache.cached_backtest, df, req.logic)
+    benchmark = await asyncio.to_thread(buy_and_hold_curve, df)
+    
+    return serialization.respond(
+        request,
+        {"strategy": strat_results, "benchmark": benchmark},
+        arrow_result=strat_results,
+        arrow_benchmark=benchmark
+    )
 
-@router.post("/scan")
-async def scan_markets(req: BacktestRequest):
+SCAN_ASSETS = ["BTC", "ETH", "SOL", "AVAX", "DOGE", "ARB"]
+
+def _no_report(progress, partial=None):
+    pass
+
+def run_scan(req: BacktestRequest, report=_no_report):
     """
     Runs the strategy on multiple assets to find the best performer.
+    report(progress 0..1, partial) is called before every asset (see jobs.py).
     """
-    ASSETS = ["BTC", "ETH", "SOL", "AVAX", "DOGE", "ARB"]
     results = []
     
-    for asset in ASSETS:
+    # 1. Every asset's features at once (one batch indicator pass for unseen assets)
+    frames = feature_store.get_features_many(SCAN_ASSETS, req.timeframe)
+    
+    # 2. Backtest per asset
+    for n, asset in enumerate(SCAN_ASSETS):
+        report(n / len(SCAN_ASSETS), {"best_asset": max(results, key=lambda x: x["return_pct"]) if results else None})
         try:
-            df = market_data.fetch_candles(asset, req.timeframe)
+            df = frames[asset]
             if df.empty:
                 continue
+            check_logic(df, req.logic)
                 
-            res = backtester.run_backtest(df, req.logic)
+            res = result_cache.cached_backtest(df, req.logic)
             metrics = res["metrics"]
             
             results.append({
@@ -79,6 +137,8 @@ async def scan_markets(req: BacktestRequest):
                 "trades": metrics["total_trades"],
                 "final_equity": metrics["final_equity"]
             })
+        except HTTPException:
+            raise # invalid logic fails the same way on every asset
         except Exception as e:
             print(f"Error scanning {asset}: {e}")
             continue
@@ -91,16 +151,24 @@ async def scan_markets(req: BacktestRequest):
         "all_results": results
     }
 
-@router.post("/optimize")
-async def optimize_strategy(req: BacktestRequest):
+@router.post("/scan")
+async def scan_markets(req: BacktestRequest):
+    """
+    Runs the strategy on multiple assets to find the best performer.
+    """
+    return await asyncio.to_thread(run_scan, req)
+
+def run_optimize(req: BacktestRequest, report=_no_report):
     """
     Attempts to improve the strategy by iterating over parameters (Take Profit, Stop Loss).
+    report(progress 0..1, partial) is called before every trial (see jobs.py).
     """
-    df = market_data.fetch_candles(req.market, req.timeframe)
+    df = feature_store.get_features(req.market, req.timeframe)
     if df.empty: return {"error": "No Data"}
+    check_logic(df, req.logic)
     
     # Baseline
-    base_res = backtester.run_backtest(df, req.logic)
+    base_res = result_cache.cached_backtest(df, req.logic)
     base_return = base_res["metrics"]["total_return_pct"]
     
     best_return = base_return
@@ -111,39 +179,51 @@ async def optimize_strategy(req: BacktestRequest):
     
     # --- Optimization Heuristics ---
     
+    TP_GRID = [1, 2, 3, 5, 8, 12, 15]
+    SL_GRID = [1, 2, 5, 10]
+    total = len(TP_GRID) + len(SL_GRID)
+    done = 0
+    
+    def progress():
+        report(done / total, {"best_return": best_return, "improved_params": best_params})
+    
     # 1. Try Adding Take Profit (1% to 15%)
-    for tp in [1, 2, 3, 5, 8, 12, 15]:
+    for tp in TP_GRID:
+        progress()
         test_params = current_params.copy()
         test_params["take_profit_pct"] = tp
         
         test_logic = req.logic.copy() if req.logic else {}
         test_logic["params"] = test_params
         
-        res = backtester.run_backtest(df, test_logic)
+        res = result_cache.cached_backtest(df, test_logic)
         ret = res["metrics"]["total_return_pct"]
         
         if ret > best_return:
             best_return = ret
             best_params = test_params.copy()
             improvement_log.append(f"Adding Take Profit {tp}% increased return from {base_return}% to {ret}%")
+        done += 1
             
     # 2. Try Adding Stop Loss (if Take Profit worked, keep it, else clean)
     current_best = best_params if best_params else current_params
     
-    for sl in [1, 2, 5, 10]:
+    for sl in SL_GRID:
+        progress()
         test_params = current_best.copy()
         test_params["stop_loss_pct"] = sl
         
         test_logic = req.logic.copy() if req.logic else {}
         test_logic["params"] = test_params
         
-        res = backtester.run_backtest(df, test_logic)
+        res = result_cache.cached_backtest(df, test_logic)
         ret = res["metrics"]["total_return_pct"]
         
         if ret > best_return:
             best_return = ret
             best_params = test_params.copy()
             improvement_log.append(f"Adding Stop Loss {sl}% increased return to {ret}%")
+        done += 1
 
     return {
         "original_return": base_return,
@@ -152,59 +232,126 @@ async def optimize_strategy(req: BacktestRequest):
         "improvement_log": improvement_log
     }
 
+@router.post("/optimize")
+async def optimize_strategy(req: BacktestRequest):
+    """
+    Attempts to improve the strategy by iterating over parameters (Take Profit, Stop Loss).
+    """
+    return await asyncio.to_thread(run_optimize, req)
+
+def run_train(req: BacktestRequest, report=_no_report):
+    """
+    Label ORACLE swing points across assets and history windows, join them to the
+    indicator feature matrix by bar index, and fit thresholds over the pooled dataset.
+    Optional req.logic: {"markets": [...], "days": 30, "window_bars": None, "step_bars": None}
+    (capped at oracle_training.MAX_MARKETS coins and MAX_BARS bars per coin)
+    """
+    opts = req.logic or {}
+    coins, days = oracle_training.clamp_request(opts.get("markets") or [req.market], req.timeframe, opts.get("days", 30))
+
+    # 1. Fetch every asset concurrently
+    report(0.0)
+    frames = oracle_training.fetch_frames(coins, req.timeframe, days)
+    if all(df.empty for df in frames.values()): return {"error": "No Data"}
+
+    # 2. Label + featurize per asset in worker processes, then fit
+    report(0.3)
+    model = oracle_training.train(frames, opts.get("window_bars"), opts.get("step_bars"))
+    samples = model["samples"]
+    if samples["buys"] + samples["sells"] == 0:
+        return {"error": "Oracle found no trades to learn from."}
+
+    params = model["learned_params"]
+    return {
+        **model,
+        "message": f"Analyzed {samples['buys'] + samples['sells']} perfect trades across {samples['assets']} assets. Oracle usually buys at RSI {params['rsi_buy']} and sells at {params['rsi_sell']}."
+    }
+
 @router.post("/train")
 async def train_oracle(req: BacktestRequest):
     """
     Run Oracle strategy, record stats of every perfect trade, 
     and return the 'Learned' parameters (Mean RSI, etc).
     """
-    df = market_data.fetch_candles(req.market, req.timeframe)
+    return await asyncio.to_thread(run_train, req)
+
+def run_evolve(req: BacktestRequest, report=_no_report):
+    """
+    Genetic rule search against req.logic['marked_trades'] (or ORACLE trades if none).
+    Optional req.logic keys: population, generations, seed.
+    """
+    import strategy_factory
+    
+    df = feature_store.get_features(req.market, req.timeframe)
     if df.empty: return {"error": "No Data"}
     
-    # 1. Run Oracle to get perfect trades
-    res = backtester.run_backtest(df, {"type": "ORACLE"})
-    trades = res["trades"]
+    logic = req.logic or {}
+    return strategy_factory.evolve_strategy(
+        df,
+        logic.get("marked_trades"),
+        population=int(logic.get("population", 200)),
+        generations=int(logic.get("generations", 40)),
+        seed=logic.get("seed"),
+        report=report
+    )
+
+@router.post("/evolve")
+async def evolve_strategy(req: BacktestRequest):
+    """
+    Strategy Factory (evolutionary): searches RSI/MACD/EMA/Bollinger rule
+    combinations that reproduce the marked trades.
+    """
+    return await asyncio.to_thread(run_evolve, req)
+
+class RobustnessRequest(BacktestRequest):
+    n_variants: int = 2000
+    block_size: int = Field(24, ge=1)
+    fee_bps: float = Field(4.5, ge=0)
+    jitter_bps: float = Field(5.0, ge=0)
+    seed: Optional[int] = Field(None, ge=0)
+
+@router.post("/robustness")
+async def robustness_analysis(req: RobustnessRequest):
+    """
+    Monte Carlo robustness: trade-order shuffles, block-bootstrapped returns
+    and jittered fills around one backtest. Returns percentile distributions.
+    """
+    return await asyncio.to_thread(run_robustness, req)
+
+def run_robustness(req: RobustnessRequest):
+    import robustness
     
-    if not trades:
-        return {"error": "Oracle found no trades to learn from."}
-      
-    # 2. Correlate trades with indicators to find patterns
-    df = backtester.calculate_indicators(df)
-    
-    rsi_buys = []
-    rsi_sells = []
-    macd_buys = []
-    
-    for t in trades:
-        trade_dt = pd.to_datetime(t["date"])
-        mask = df['timestamp'] == trade_dt
-        row = df[mask]
-        
-        if not row.empty:
-            val_rsi = row.iloc[0]['rsi']
-            val_macd = row.iloc[0]['macd']
-            
-            if t['side'] == 'BUY':
-                rsi_buys.append(val_rsi)
-                macd_buys.append(val_macd)
-            elif t['side'] == 'SELL':
-                rsi_sells.append(val_rsi)
-                
-    # 3. Calculate Learned Thresholds
-    avg_rsi_buy = sum(rsi_buys)/len(rsi_buys) if rsi_buys else 30
-    avg_rsi_sell = sum(rsi_sells)/len(rsi_sells) if rsi_sells else 70
-    avg_macd_buy = sum(macd_buys)/len(macd_buys) if macd_buys else 0
-    
-    params = {
-        "rsi_buy": round(float(avg_rsi_buy), 2),
-        "rsi_sell": round(float(avg_rsi_sell), 2),
-        "macd_buy": round(float(avg_macd_buy), 4)
-    }
+    df = feature_store.get_features(req.market, req.timeframe)
+    if df.empty: return {"error": "No Data"}
+    check_logic(df, req.logic)
     
-    return {
-        "learned_params": params,
-        "message": f"Analyzed {len(trades)} perfect trades. Oracle usually buys at RSI {params['rsi_buy']} and sells at {params['rsi_sell']}."
-    }
+    res = result_cache.cached_backtest(df, req.logic)
+    settings = backtester.engine_params((req.logic or {}).get("params") or {})
+    
+    return robustness.analyze(
+        res,
+        invest_limit=settings["invest_limit"],
+        leverage=settings["leverage"],
+        n_variants=min(max(req.n_variants, 100), 20000),
+        block_size=req.block_size,
+        fee_bps=req.fee_bps,
+        jitter_bps=req.jitter_bps,
+        seed=req.seed
+    )
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters of the backtest result cache.
+    """
+    return result_cache.get_cache().stats()
+
+@router.get("/coalescing/stats")
+async def coalescing_stats():
+    """
+    Single-flight counters: calls, executions, coalesced (callers that waited on an in-flight twin).
+    """
+    return singleflight.stats()
 
 @router.post("/infer")
 async def infer_strategy(req: BacktestRequest):
@@ -213,12 +360,15 @@ async def infer_strategy(req: BacktestRequest):
     Takes user-marked BUY/SELL points and infers the logic.
     req.logic should contain 'marked_trades' list.
     """
+    return await asyncio.to_thread(run_infer, req)
+
+def run_infer(req: BacktestRequest):
     import strategy_factory
     
-    df = market_data.fetch_candles(req.market, req.timeframe)
+    df = feature_store.get_features(req.market, req.timeframe)
     if df.empty: return {"error": "No Data"}
     
-    marks = req.logic.get("marked_trades", [])
+    marks = (req.logic or {}).get("marked_trades", [])
     if not marks:
         return {"error": "No trades marked."}
         
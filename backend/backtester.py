@@ -1,12 +1,38 @@
 import pandas as pd
 import numpy as np
+from candles import CandleArrays
+import costs
+import engine
+import patterns
+from strategy_api import BarContext, StrategyState, strategy, get_strategy, DEFAULT_STRATEGY
 
-def calculate_indicators(df):
+# EMA columns whose last value fully determines their continuation (feature_store seeds)
+EMA_SPANS = {'ema_9': 9, 'ema_21': 21, 'ema_50': 50, 'ema_200': 200, 'ema_12': 12, 'ema_26': 26}
+
+def _ema(series, span, seed=None):
+    """
+    ewm(span, adjust=False); with a seed, continues from the EMA value of the bar before series.
+    """
+    if seed is None or np.isnan(seed):
+        return series.ewm(span=span, adjust=False).mean()
+    values = np.concatenate([[seed], series.to_numpy(dtype=np.float64)])
+    return pd.Series(values).ewm(span=span, adjust=False).mean().iloc[1:].set_axis(series.index)
+
+def calculate_indicators(df, seed=None):
     """
     Calculate common indicators used by various strategies.
     (Existing code preserved)
+    Accepts a candle DataFrame or a CandleArrays container.
+    Frames from feature_store (df.attrs['features']) already carry every column.
+    seed: {ema column / 'macd_signal': value at the bar before df} to continue a stored history.
     """
-    df = df.copy()
+    if isinstance(df, CandleArrays):
+        df = df.to_frame()
+    elif df.attrs.get('features'):
+        return df.copy()
+    else:
+        df = df.copy()
+    seed = seed or {}
     
     # 1. RSI (14)
     delta = df['close'].diff()
@@ -16,10 +42,8 @@ def calculate_indicators(df):
     df['rsi'] = 100 - (100 / (1 + rs))
     
     # 2. EMAs & MAs
-    df['ema_9'] = df['close'].ewm(span=9, adjust=False).mean()
-    df['ema_21'] = df['close'].ewm(span=21, adjust=False).mean()
-    df['ema_50'] = df['close'].ewm(span=50, adjust=False).mean()
-    df['ema_200'] = df['close'].ewm(span=200, adjust=False).mean()
+    for col in ('ema_9', 'ema_21', 'ema_50', 'ema_200'):
+        df[col] = _ema(df['close'], EMA_SPANS[col], seed.get(col))
     df['sma_99'] = df['close'].rolling(window=99).mean()
     
     # 3. Volatility
@@ -28,17 +52,32 @@ def calculate_indicators(df):
     df['bollinger_lower'] = df['ema_21'] - (df['std_20'] * 2)
     
     # 4. MACD
-    ema_12 = df['close'].ewm(span=12, adjust=False).mean()
-    ema_26 = df['close'].ewm(span=26, adjust=False).mean()
-    df['macd'] = ema_12 - ema_26
-    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+    df['ema_12'] = _ema(df['close'], 12, seed.get('ema_12'))
+    df['ema_26'] = _ema(df['close'], 26, seed.get('ema_26'))
+    df['macd'] = df['ema_12'] - df['ema_26']
+    df['macd_signal'] = _ema(df['macd'], 9, seed.get('macd_signal'))
     df['macd_hist'] = df['macd'] - df['macd_signal']
     
+    # 5. Scale-free features (usable as thresholds across assets / price levels)
+    df['dist_ema50'] = (df['close'] - df['ema_50']) / df['ema_50']
+    df['dist_ema200'] = (df['close'] - df['ema_200']) / df['ema_200']
+    bb_range = df['bollinger_upper'] - df['bollinger_lower']
+    df['bb_pos'] = ((df['close'] - df['bollinger_lower']) / bb_range).where(bb_range != 0, 0.5)
+    
+    # 6. Patterns (see patterns.py): 0/1 flags on the bar they are confirmed, never earlier
+    low, high = df['low'].to_numpy(dtype=np.float64), df['high'].to_numpy(dtype=np.float64)
+    df['pivot_low'] = patterns.pivot_lows(low).astype(np.float64)
+    df['pivot_high'] = patterns.pivot_highs(high).astype(np.float64)
+    for name, flags in patterns.divergences(low, high, df['rsi'].to_numpy(dtype=np.float64)).items():
+        df[f'rsi_{name}_div'] = flags.astype(np.float64)
+    
     return df
 
 # --- Strategies ---
+# Registered with strategy_api.strategy; run_backtest looks them up by logic["type"].
 
-def strat_learned_clone(i, rows, position, params, state):
+@strategy("LEARNED")
+def strat_learned_clone(ctx, position, params, state):
     """
     AI CLONE: A real strategy that mimics the Oracle's patterns.
     It uses thresholds learned from the Oracle's perfect trades.
@@ -47,253 +86,199 @@ def strat_learned_clone(i, rows, position, params, state):
     rsi_sell = params.get("rsi_sell", 70)
     macd_buy = params.get("macd_buy", -100) # Default permissive
     
-    curr = rows[i][1]
+    rsi = ctx.rsi[ctx.i]
     
     # BUY LOGIC: Mimic Oracle's entry (Low RSI + MACD condition)
     if position == 0:
-        if curr['rsi'] < rsi_buy and curr['macd'] > macd_buy:
+        if rsi < rsi_buy and ctx.macd[ctx.i] > macd_buy:
              return 1
              
     # SELL LOGIC: Mimic Oracle's exit
     if position == 1:
-        if curr['rsi'] > rsi_sell:
+        if rsi > rsi_sell:
              return -1
              
     return 0
 
 
-def strat_learned_clone(i, rows, position, params, state):
-    """
-    AI CLONE: A real strategy that mimics the Oracle's patterns.
-    It uses thresholds learned from the Oracle's perfect trades.
-    """
-    rsi_buy = params.get("rsi_buy", 30)
-    rsi_sell = params.get("rsi_sell", 70)
-    macd_buy = params.get("macd_buy", -100) # Default permissive
-    
-    curr = rows[i][1]
-    
-    # BUY LOGIC: Mimic Oracle's entry (Low RSI + MACD condition)
-    if position == 0:
-        if curr['rsi'] < rsi_buy and curr['macd'] > macd_buy:
-             return 1
-             
-    # SELL LOGIC: Mimic Oracle's exit
-    if position == 1:
-        if curr['rsi'] > rsi_sell:
-             return -1
-             
-    return 0
-
+class RsiDivState(StrategyState):
+    __slots__ = (
+        'max_buy_count', 'rsi_reset', 'take_profit_pct', 'stop_loss_pct',
+        'buy_count', 'rsi_resetted', 'rsi_reset_for_bearish',
+        'divergence_active', 'bearish_divergence_active',
+        'last_low_price', 'last_low_rsi', 'last_high_price', 'last_high_rsi',
+        'new_low', 'new_high',
+    )
 
-def strat_learned_clone(i, rows, position, params, state):
-    """
-    AI CLONE: A real strategy that mimics the Oracle's patterns.
-    It uses thresholds learned from the Oracle's perfect trades.
-    """
-    rsi_buy = params.get("rsi_buy", 30)
-    rsi_sell = params.get("rsi_sell", 70)
-    macd_buy = params.get("macd_buy", -100) # Default permissive
-    
-    curr = rows[i][1]
-    
-    # BUY LOGIC: Mimic Oracle's entry (Low RSI + MACD condition)
-    if position == 0:
-        if curr['rsi'] < rsi_buy and curr['macd'] > macd_buy:
-             return 1
-             
-    # SELL LOGIC: Mimic Oracle's exit
-    if position == 1:
-        if curr['rsi'] > rsi_sell:
-             return -1
-             
-    return 0
+    def __init__(self, ctx=None, params=None):
+        super().__init__()
+        params = params or {}
+        # Dynamic Params
+        self.max_buy_count = params.get("max_buys", 4)
+        self.rsi_reset = params.get("rsi_reset", 50)
+        self.take_profit_pct = params.get("take_profit_pct", 0) # 0 = No TP
+        self.stop_loss_pct = params.get("stop_loss_pct", 0)     # 0 = No SL
+        
+        self.buy_count = 0
+        self.rsi_resetted = False
+        self.rsi_reset_for_bearish = False
+        self.divergence_active = False
+        self.bearish_divergence_active = False
+        self.last_low_price = None
+        self.last_low_rsi = None
+        self.last_high_price = None
+        self.last_high_rsi = None
+        
+        # Pivot detection (Lookback 2, Lookforward 2), flagged on the confirmation bar
+        self.new_low = patterns.pivot_lows(ctx.array('low'), 2, 2).tolist() if ctx else []
+        self.new_high = patterns.pivot_highs(ctx.array('high'), 2, 2).tolist() if ctx else []
 
-def strat_rsi_divergence(i, rows, position, params, state):
+@strategy("RSI_DIV", state=RsiDivState)
+def strat_rsi_divergence(ctx, position, params, state):
     """
     RSI Bullish Divergence Buy Only strategy.
     Implements Pivot detection (lb=2, rb=2) and DCA logic.
     """
-    # Dynamic Params
-    MAX_BUY_COUNT = params.get("max_buys", 4)
-    RSI_RESET = params.get("rsi_reset", 50)
-    TAKE_PROFIT_PCT = params.get("take_profit_pct", 0) # 0 = No TP
-    STOP_LOSS_PCT = params.get("stop_loss_pct", 0)     # 0 = No SL
-    
-    # Helper to get val safer
-    def get_val(idx, key, default=None):
-        if 0 <= idx < len(rows):
-            return rows[idx][1][key]
-        return default
-
-    curr_row = rows[i][1]
-    curr_rsi = curr_row['rsi']
-    curr_low = curr_row['low']
-    curr_high = curr_row['high']
-    curr_close = curr_row['close']
-    
-    prev_row = rows[i-1][1] if i > 0 else None
-    prev_rsi = prev_row['rsi'] if prev_row is not None else 50
-    
-    # Init State
-    if 'buyCount' not in state:
-        state['buyCount'] = 0
-        state['rsiResetted'] = False
-        state['rsiResetForBearish'] = False
-        state['divergenceActive'] = False
-        state['bearishDivergenceActive'] = False
-        state['lastLowPrice'] = None
-        state['lastLowRSI'] = None
-        state['lastHighPrice'] = None
-        state['lastHighRSI'] = None
-        state['avgEntryPrice'] = 0 # Track for TP/SL
+    i = ctx.i
+    rsi, low, high = ctx.rsi, ctx.low, ctx.high
+    
+    curr_rsi = rsi[i]
+    curr_low = low[i]
+    curr_high = high[i]
+    curr_close = ctx.close[i]
+    prev_rsi = rsi[i-1] if i > 0 else 50
 
     # --- TP / SL Check (Overrides Logic) ---
-    if position == 1 and state['avgEntryPrice'] > 0:
-        pct_change = (curr_close - state['avgEntryPrice']) / state['avgEntryPrice']
+    if position == 1 and state.avg_entry_price > 0:
+        pct_change = (curr_close - state.avg_entry_price) / state.avg_entry_price
         
         # Take Profit
-        if TAKE_PROFIT_PCT > 0 and pct_change >= (TAKE_PROFIT_PCT / 100):
-            state['buyCount'] = 0
-            state['avgEntryPrice'] = 0
+        if state.take_profit_pct > 0 and pct_change >= (state.take_profit_pct / 100):
+            state.buy_count = 0
+            state.avg_entry_price = 0
             return -2 # Special Code for TP
             
         # Stop Loss
-        if STOP_LOSS_PCT > 0 and pct_change <= -(STOP_LOSS_PCT / 100):
-             state['buyCount'] = 0
-             state['avgEntryPrice'] = 0
+        if state.stop_loss_pct > 0 and pct_change <= -(state.stop_loss_pct / 100):
+             state.buy_count = 0
+             state.avg_entry_price = 0
              return -3 # Special Code for SL
 
-    # 1. Pivot Detection (Lookback 2, Lookforward 2)
-    pivot_idx = i - 2
-    is_new_low = False
-    is_new_high = False
-    
-    if pivot_idx >= 2:
-        l_p = get_val(pivot_idx, 'low')
-        l_1 = get_val(pivot_idx-1, 'low')
-        l_2 = get_val(pivot_idx-2, 'low')
-        l_r1 = get_val(pivot_idx+1, 'low')
-        l_r2 = get_val(pivot_idx+2, 'low')
-        
-        if l_p is not None and all(x is not None for x in [l_1, l_2, l_r1, l_r2]):
-            if l_p < l_1 and l_p < l_2 and l_p < l_r1 and l_p < l_r2:
-                is_new_low = True
-                
-        h_p = get_val(pivot_idx, 'high')
-        h_1 = get_val(pivot_idx-1, 'high')
-        h_2 = get_val(pivot_idx-2, 'high')
-        h_r1 = get_val(pivot_idx+1, 'high')
-        h_r2 = get_val(pivot_idx+2, 'high')
-        
-        if h_p is not None and all(x is not None for x in [h_1, h_2, h_r1, h_r2]):
-            if h_p > h_1 and h_p > h_2 and h_p > h_r1 and h_p > h_r2:
-                is_new_high = True
+    # 1. Pivot confirmed on this bar (pivot at i - 2, precomputed in RsiDivState)
+    p = i - 2
+    is_new_low = state.new_low[i]
+    is_new_high = state.new_high[i]
 
     # 2. Logic Flow
     
     # Reset Checks
-    if curr_rsi >= RSI_RESET and not state['rsiResetted']:
-        state['rsiResetted'] = True
-    if curr_rsi <= RSI_RESET and not state['rsiResetForBearish']:
-        state['rsiResetForBearish'] = True
+    if curr_rsi >= state.rsi_reset and not state.rsi_resetted:
+        state.rsi_resetted = True
+    if curr_rsi <= state.rsi_reset and not state.rsi_reset_for_bearish:
+        state.rsi_reset_for_bearish = True
         
     # Start Divergence Search
-    if curr_rsi <= 30 and prev_rsi > 30 and state['rsiResetted']:
-        state['divergenceActive'] = True
-        state['lastLowPrice'] = curr_low
-        state['lastLowRSI'] = curr_rsi
-        state['rsiResetted'] = False
+    if curr_rsi <= 30 and prev_rsi > 30 and state.rsi_resetted:
+        state.divergence_active = True
+        state.last_low_price = curr_low
+        state.last_low_rsi = curr_rsi
+        state.rsi_resetted = False
         
-    if curr_rsi >= 70 and prev_rsi < 70 and state['rsiResetForBearish']:
-        state['bearishDivergenceActive'] = True
-        state['lastHighPrice'] = curr_high
-        state['lastHighRSI'] = curr_rsi
-        state['rsiResetForBearish'] = False
+    if curr_rsi >= 70 and prev_rsi < 70 and state.rsi_reset_for_bearish:
+        state.bearish_divergence_active = True
+        state.last_high_price = curr_high
+        state.last_high_rsi = curr_rsi
+        state.rsi_reset_for_bearish = False
         
     # Update Tracked Lows/Highs
-    if is_new_low and state['divergenceActive']:
-        state['lastLowPrice'] = get_val(pivot_idx, 'low')
-        state['lastLowRSI'] = get_val(pivot_idx, 'rsi')
+    if is_new_low and state.divergence_active:
+        state.last_low_price = low[p]
+        state.last_low_rsi = rsi[p]
         
-    if is_new_high and state['bearishDivergenceActive']:
-        state['lastHighPrice'] = get_val(pivot_idx, 'high')
-        state['lastHighRSI'] = get_val(pivot_idx, 'rsi')
+    if is_new_high and state.bearish_divergence_active:
+        state.last_high_price = high[p]
+        state.last_high_rsi = rsi[p]
         
     # Divergence Check
     bullish_divergence = False
-    if state['divergenceActive'] and state['lastLowPrice'] is not None:
-        if curr_low < state['lastLowPrice'] and curr_rsi > state['lastLowRSI']:
+    if state.divergence_active and state.last_low_price is not None:
+        if curr_low < state.last_low_price and curr_rsi > state.last_low_rsi:
             bullish_divergence = True
-            state['divergenceActive'] = False # Found it
+            state.divergence_active = False # Found it
             
     bearish_divergence = False
-    if state['bearishDivergenceActive'] and state['lastHighPrice'] is not None:
-        if curr_high > state['lastHighPrice'] and curr_rsi < state['lastHighRSI']:
+    if state.bearish_divergence_active and state.last_high_price is not None:
+        if curr_high > state.last_high_price and curr_rsi < state.last_high_rsi:
             bearish_divergence = True
-            state['bearishDivergenceActive'] = False
+            state.bearish_divergence_active = False
             
     # BUY Signal
-    if bullish_divergence and state['buyCount'] < MAX_BUY_COUNT:
-         state['buyCount'] += 1
+    if bullish_divergence and state.buy_count < state.max_buy_count:
+         state.buy_count += 1
          return 1 # BUY
          
     # SELL Signal (Bearish Div)
     if bearish_divergence and position == 1:
-        state['buyCount'] = 0
-        state['avgEntryPrice'] = 0
+        state.buy_count = 0
+        state.avg_entry_price = 0
         return -1 # Close All
         
     return 0
 
-    return 0
+ORACLE_LOOKAHEAD = 48 # Look 48 candles into the future (was 8)
+ORACLE_MIN_MOVE = 0.015 # Only swings with > 1.5% of room in the window are worth trading
 
-def strat_oracle(i, rows, position, params, state):
+class OracleState(StrategyState):
+    __slots__ = ('swing_low', 'swing_high')
+
+    def __init__(self, ctx=None, params=None):
+        super().__init__()
+        # Window swings for every bar at once (see patterns.window_swings)
+        lows, highs = patterns.window_swings(ctx.array('high'), ctx.array('low'), ctx.array('close'), ORACLE_LOOKAHEAD, ORACLE_MIN_MOVE)
+        self.swing_low = lows.tolist()
+        self.swing_high = highs.tolist()
+
+@strategy("ORACLE", state=OracleState)
+def strat_oracle(ctx, position, params, state):
     """
     AI ORACLE (Smart V2):
     Uses 'Future Sight' to identify MAJOR Swing Lows and Highs.
     Only trades at the absolute local bottoms/tops of the next 48 candles (2 days).
     This drastically reduces trade count while maximizing swing capture.
     """
-    LOOKAHEAD = 48 # Look 48 candles into the future (was 8)
+    i = ctx.i
     
     # Boundary check
-    if i + LOOKAHEAD >= len(rows):
+    if i + ORACLE_LOOKAHEAD >= ctx.n:
         return -1 if position == 1 else 0 # Close at end
-        
-    # Future Window
-    future_range = range(i, i + LOOKAHEAD + 1)
-    future_lows = [rows[j][1]['low'] for j in future_range]
-    future_highs = [rows[j][1]['high'] for j in future_range]
-    future_closes = [rows[j][1]['close'] for j in future_range]
-    
-    # Are we at the absolute bottom of the near future?
-    is_swing_low = min(future_lows) == rows[i][1]['low']
-    
-    # Are we at the absolute top of the near future?
-    is_swing_high = max(future_highs) == rows[i][1]['high']
-    
-    # Filter: Ensure the move is worth it (at least 1.5% potential move)
-    # Since we know the future, we can check the max price in the window
-    max_in_window = max(future_highs)
-    min_in_window = min(future_lows)
-    
-    current_price = rows[i][1]['close']
-    
-    # Execution
-    if is_swing_low and position == 0:
-        # Check if the potential upside is > 1.5%
-        if (max_in_window - current_price) / current_price > 0.015:
-             return 1 # Perfect Entry (Major Bottom)
-        
-    if is_swing_high and position == 1:
-        # Check if potential downside is > 1.5% (worth selling)
-        if (current_price - min_in_window) / current_price > 0.015:
-             return -1 # Perfect Exit (Major Top)
-        
+    
+    # Absolute bottom / top of the near future with enough room to the other side
+    if state.swing_low[i] and position == 0:
+        return 1 # Perfect Entry (Major Bottom)
+    if state.swing_high[i] and position == 1:
+        return -1 # Perfect Exit (Major Top)
     return 0
 
-def strat_adaptive_metamorphosis(i, rows, position, params, state):
+SWING_MIN_MOVE = 0.03
+
+def _prepare_swing(df, params):
+    df['swing'] = patterns.swing_column(df['high'].to_numpy(), df['low'].to_numpy(), params.get("min_move", SWING_MIN_MOVE)).astype(np.float64)
+    return df
+
+@strategy("SWING", prepare=_prepare_swing)
+def strat_swing(ctx, position, params, state):
+    """
+    SWING: zigzag follower. Buys when a swing low is confirmed (price has risen min_move,
+    default 3%, off the low) and exits when a swing high is confirmed.
+    Lookahead-safe: patterns.swing_points flags the confirmation bar, not the extreme.
+    """
+    s = ctx.swing[ctx.i]
+    if s == -1 and position == 0: return 1
+    if s == 1 and position == 1: return -1
+    return 0
+
+@strategy("METAMORPHOSIS")
+def strat_adaptive_metamorphosis(ctx, position, params, state):
     """
     METAMORPHOSIS AI: Adapts logic based on Market Regime.
     1. Trend Regime (High ADX/Momentum) -> Trend Following
@@ -301,22 +286,22 @@ def strat_adaptive_metamorphosis(i, rows, position, params, state):
     
     This strategy 'mutates' its behavior candle-by-candle.
     """
-    # Helper to get val
-    curr = rows[i][1]
+    i = ctx.i
+    close = ctx.close
     
     # --- Regime Detection ---
     # We need some history for context
     if i < 20: return 0
     
     # 1. Volatility (Bollinger Band Width-ish)
-    prices = [rows[j][1]['close'] for j in range(i-20, i+1)]
+    prices = close[i-20:i+1]
     avg_price = sum(prices) / len(prices)
     std_dev = (sum([(p - avg_price)**2 for p in prices]) / len(prices)) ** 0.5
     bb_width = (4 * std_dev) / avg_price # approx pct width
     
     # 2. Trend Strength (Simple Slope of SMA)
-    sma_short = sum([rows[j][1]['close'] for j in range(i-9, i+1)]) / 10
-    sma_long = sum([rows[j][1]['close'] for j in range(i-20, i+1)]) / 21
+    sma_short = sum(close[i-9:i+1]) / 10
+    sma_long = sum(prices) / 21
     trend_aligned = sma_short > sma_long
     
     regime = "RANGE"
@@ -338,7 +323,7 @@ def strat_adaptive_metamorphosis(i, rows, position, params, state):
              
     elif regime == "RANGE" or regime == "TIGHT_RANGE":
         # Use RSI Mean Reversion
-        rsi = curr['rsi']
+        rsi = ctx.rsi[i]
         if rsi < 30 and position == 0:
             return 1 # Buy Dip
         elif rsi > 70 and position == 1:
@@ -347,160 +332,316 @@ def strat_adaptive_metamorphosis(i, rows, position, params, state):
     return 0
 
 
-# --- Legacy Wrappers ---
-def strat_bitcoinbey(row, prev_row, position, params, state):
-    # (Existing logic preserved)
-    # ... logic ...
-    # Re-impl needed only because we are overwriting the file.
-    # To save space providing abbreviated version since Step 226 has full logic
-    # Actually I must reuse the step 226 logic or else it breaks.
-    
-    # ... Copying step 226 logic ...
-    RSI_ENTRY = 30
-    RSI_EXIT = 68
-    RSI_RESET = 50
-    MA_99_PCT = 0.1
+def add_rule_indicators(df, indicators):
+    """
+    Adds one column per user-defined indicator (models.Indicator dicts), named by its id.
+    MACD adds <id>_signal/<id>_hist, BB adds <id>_upper/<id>_lower.
+    Used by the RULES strategy (chat-generated strategies).
+    """
+    for ind in indicators or []:
+        col = ind.get("id")
+        kind = str(ind.get("type", "")).upper()
+        params = ind.get("params") or {}
+        if not col or col in ('timestamp', 'open', 'high', 'low', 'close', 'volume'):
+            continue
+        
+        length = int(params.get("length", params.get("period", params.get("window", 14))))
+        src = df[params.get("source", "close")] if params.get("source", "close") in df else df['close']
+        
+        if kind == "RSI":
+            delta = src.diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=length).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=length).mean()
+            df[col] = 100 - (100 / (1 + gain / loss))
+        elif kind == "EMA":
+            df[col] = src.ewm(span=length, adjust=False).mean()
+        elif kind in ("SMA", "MA"):
+            df[col] = src.rolling(window=length).mean()
+        elif kind == "MACD":
+            fast = int(params.get("fast", 12))
+            slow = int(params.get("slow", 26))
+            signal = int(params.get("signal", 9))
+            macd = src.ewm(span=fast, adjust=False).mean() - src.ewm(span=slow, adjust=False).mean()
+            df[col] = macd
+            df[f"{col}_signal"] = macd.ewm(span=signal, adjust=False).mean()
+            df[f"{col}_hist"] = macd - df[f"{col}_signal"]
+        elif kind in ("BB", "BOLLINGER", "BBANDS"):
+            mult = float(params.get("std", params.get("mult", 2)))
+            mid = src.rolling(window=length).mean()
+            std = src.rolling(window=length).std()
+            df[col] = mid
+            df[f"{col}_upper"] = mid + std * mult
+            df[f"{col}_lower"] = mid - std * mult
+    return df
+
+RULE_OPS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "==": lambda a, b: a == b,
+}
+RULE_ACTIONS = ("BUY", "SELL", "SHORT", "CLOSE")
+
+def check_rules(columns, params):
+    """
+    Why RULES params cannot run over a frame with these columns (None if they can):
+    malformed rules, unknown actions, unknown operators or unknown column operands.
+    """
+    rules = params.get("rules", [])
+    if not isinstance(rules, list):
+        return "params.rules must be a list"
+    for rule in rules:
+        if not isinstance(rule, dict) or not isinstance(rule.get("all"), list) or "action" not in rule:
+            return f"Malformed rule {rule!r}: expected {{'all': [[lhs, op, rhs], ...], 'action': ...}}"
+        if rule["action"] not in RULE_ACTIONS:
+            return f"Unknown action {rule['action']!r}. Options: {', '.join(RULE_ACTIONS)}"
+        for clause in rule["all"]:
+            if not isinstance(clause, (list, tuple)) or len(clause) != 3:
+                return f"Malformed condition {clause!r}: expected [lhs, op, rhs]"
+            lhs, op, rhs = clause
+            if op not in RULE_OPS:
+                return f"Unknown operator '{op}'. Options: {', '.join(RULE_OPS)}"
+            for operand in (lhs, rhs):
+                if isinstance(operand, str):
+                    if operand not in columns:
+                        return f"Unknown column '{operand}'"
+                elif isinstance(operand, bool) or not isinstance(operand, (int, float)):
+                    return f"Operand {operand!r} must be a column name or a number"
+    return None
+
+def rule_columns(df, params):
+    """
+    Columns a RULES strategy can reference on df (built-ins + params['indicators']).
+    """
+    return set(add_rule_indicators(df.head(2).copy(), params.get("indicators")).columns)
+
+def _prepare_rules(df, params):
+    return add_rule_indicators(df, params.get("indicators"))
+
+class RulesState(StrategyState):
+    __slots__ = ('rules', 'take_profit_pct', 'stop_loss_pct', 'allow_short')
+
+    def __init__(self, ctx=None, params=None):
+        super().__init__()
+        params = params or {}
+        error = check_rules(ctx.columns, params)
+        if error:
+            raise ValueError(error)
+        self.take_profit_pct = params.get("take_profit_pct", 0) # 0 = No TP
+        self.stop_loss_pct = params.get("stop_loss_pct", 0)     # 0 = No SL
+        self.allow_short = params.get("allow_short", False)
+        
+        # Resolve operands once: column name -> its list, number -> None + the constant
+        def operand(x):
+            return (ctx[x], None) if isinstance(x, str) else (None, x)
+        self.rules = [
+            ([(operand(lhs), RULE_OPS[op], operand(rhs)) for lhs, op, rhs in rule["all"]], rule["action"])
+            for rule in params.get("rules", [])
+        ]
+
+@strategy("RULES", state=RulesState, prepare=_prepare_rules)
+def strat_rules(ctx, position, params, state):
+    """
+    RULES: executes structured rules produced from a chat Strategy.
+    params['rules'] = [{"all": [[lhs, op, rhs], ...], "action": "BUY"|"SELL"|"SHORT"|"CLOSE"}]
+    Operands are column names or numbers. Honors take_profit_pct / stop_loss_pct.
+    SELL closes a long; SHORT opens (or flips into) a short, which BUY flips back.
+    params['allow_short'] makes SELL behave like SHORT.
+    """
+    i = ctx.i
     
-    if 'rsi30TouchCount' not in state:
-        state.update({'rsi30TouchCount':0, 'rsi65TouchCount':0, 'rsiEntryResetted':False, 'rsiResetted':False, 'barsInTrade':0})
+    # --- TP / SL Check (Overrides Logic) ---
+    entry = state.avg_entry_price
+    if position != 0 and entry > 0:
+        pct_change = position * (ctx.close[i] - entry) / entry
+        if state.take_profit_pct > 0 and pct_change >= (state.take_profit_pct / 100):
+            return -2
+        if state.stop_loss_pct > 0 and pct_change <= -(state.stop_loss_pct / 100):
+            return -3
+    
+    for conditions, action in state.rules:
+        ok = True
+        for (a_col, a), op, (b_col, b) in conditions:
+            if not op(a if a_col is None else a_col[i], b if b_col is None else b_col[i]):
+                ok = False
+                break
+        if not ok:
+            continue
         
-    rsi = row['rsi']
-    prev_rsi = prev_row['rsi'] if prev_row is not None else 50
-    ma99 = row['sma_99']
+        if action == "BUY" and position <= 0:
+            return 1
+        if (action == "SHORT" or (action == "SELL" and state.allow_short)) and position >= 0:
+            return 2
+        if (action == "CLOSE" and position != 0) or (action == "SELL" and position == 1):
+            return -1
     
-    if pd.isna(ma99) or pd.isna(rsi): return 0
+    return 0
+
+
+# --- Legacy Strategies ---
+BEY_RSI_ENTRY = 30
+BEY_RSI_EXIT = 68
+BEY_RSI_RESET = 50
+
+class BitcoinBeyState(StrategyState):
+    __slots__ = ('rsi30_touch_count', 'rsi65_touch_count', 'rsi_entry_resetted', 'rsi_resetted', 'bars_in_trade')
+
+    def __init__(self, ctx=None, params=None):
+        super().__init__()
+        self.rsi30_touch_count = 0
+        self.rsi65_touch_count = 0
+        self.rsi_entry_resetted = False
+        self.rsi_resetted = False
+        self.bars_in_trade = 0
+
+@strategy("BITCOINBEY", state=BitcoinBeyState)
+def strat_bitcoinbey(ctx, position, params, state):
+    i = ctx.i
+    rsi = ctx.rsi[i]
+    prev_rsi = ctx.rsi[i-1] if i > 0 else 50
+    ma99 = ctx.sma_99[i]
+    close = ctx.close[i]
+    
+    if ma99 != ma99 or rsi != rsi: return 0 # NaN
     
-    aboveMA99 = row['close'] > ma99 * 1.001
-    belowMA99 = row['close'] < ma99 * 0.999
+    aboveMA99 = close > ma99 * 1.001
+    belowMA99 = close < ma99 * 0.999
     
-    if position == 1: state['barsInTrade'] += 1
-    else: state['barsInTrade'] = 0
+    if position == 1: state.bars_in_trade += 1
+    else: state.bars_in_trade = 0
     
-    if rsi >= RSI_RESET: state['rsiEntryResetted'] = True
-    if rsi <= RSI_RESET: state['rsiResetted'] = True
+    if rsi >= BEY_RSI_RESET: state.rsi_entry_resetted = True
+    if rsi <= BEY_RSI_RESET: state.rsi_resetted = True
     
-    if rsi <= RSI_ENTRY and prev_rsi > RSI_ENTRY:
+    if rsi <= BEY_RSI_ENTRY and prev_rsi > BEY_RSI_ENTRY:
         if position == 0:
-            if state['rsiEntryResetted'] and state['rsi30TouchCount']>0: state['rsi30TouchCount']+=1; state['rsiEntryResetted']=False
-            elif state['rsi30TouchCount']==0: state['rsi30TouchCount']=1; state['rsiEntryResetted']=False
+            if state.rsi_entry_resetted and state.rsi30_touch_count>0: state.rsi30_touch_count+=1; state.rsi_entry_resetted=False
+            elif state.rsi30_touch_count==0: state.rsi30_touch_count=1; state.rsi_entry_resetted=False
             
-    if rsi >= RSI_EXIT and prev_rsi < RSI_EXIT:
+    if rsi >= BEY_RSI_EXIT and prev_rsi < BEY_RSI_EXIT:
         if position == 1:
-            if state['rsiResetted'] and state['rsi65TouchCount']>0: state['rsi65TouchCount']+=1; state['rsiResetted']=False
-            elif state['rsi65TouchCount']==0: state['rsi65TouchCount']=1; state['rsiResetted']=False
+            if state.rsi_resetted and state.rsi65_touch_count>0: state.rsi65_touch_count+=1; state.rsi_resetted=False
+            elif state.rsi65_touch_count==0: state.rsi65_touch_count=1; state.rsi_resetted=False
             
-    if aboveMA99 and state['rsi30TouchCount'] >= 2 and position == 0:
-        state['rsi30TouchCount']=0; state['rsi65TouchCount']=0; state['rsiEntryResetted']=False; state['rsiResetted']=False
+    if aboveMA99 and state.rsi30_touch_count >= 2 and position == 0:
+        state.rsi30_touch_count=0; state.rsi65_touch_count=0; state.rsi_entry_resetted=False; state.rsi_resetted=False
         return 1
         
-    exit_trig = (belowMA99 and state['barsInTrade'] >= 5) or (state['rsi65TouchCount'] >= 2 and rsi >= RSI_EXIT)
+    exit_trig = (belowMA99 and state.bars_in_trade >= 5) or (state.rsi65_touch_count >= 2 and rsi >= BEY_RSI_EXIT)
     if position == 1 and exit_trig:
-        state['rsi30TouchCount']=0; state['rsi65TouchCount']=0; state['rsiResetted']=True; state['rsiEntryResetted']=True
+        state.rsi30_touch_count=0; state.rsi65_touch_count=0; state.rsi_resetted=True; state.rsi_entry_resetted=True
         return -1
     return 0
 
-def strat_ema_trend(row, prev_row, position):
-    if row['ema_50'] > row['ema_200'] and position == 0: return 1
-    elif row['ema_50'] < row['ema_200'] and position == 1: return -1
+@strategy("TREND")
+def strat_ema_trend(ctx, position, params, state):
+    i = ctx.i
+    if ctx.ema_50[i] > ctx.ema_200[i] and position == 0: return 1
+    elif ctx.ema_50[i] < ctx.ema_200[i] and position == 1: return -1
     return 0
-def strat_grid(row, position):
-    ref = row['ema_21']; 
-    if row['close'] < ref*0.99 and position==0: return 1
-    elif row['close'] > ref*1.005 and position==1: return -1
+
+@strategy("GRID")
+def strat_grid(ctx, position, params, state):
+    i = ctx.i
+    ref = ctx.ema_21[i]
+    if ctx.close[i] < ref*0.99 and position==0: return 1
+    elif ctx.close[i] > ref*1.005 and position==1: return -1
     return 0
-def strat_breakout(row, position):
-    if row['close'] > row['bollinger_upper'] and position==0: return 1
-    elif row['close'] < row['ema_21'] and position==1: return -1
+
+@strategy("BREAKOUT")
+def strat_breakout(ctx, position, params, state):
+    i = ctx.i
+    if ctx.close[i] > ctx.bollinger_upper[i] and position==0: return 1
+    elif ctx.close[i] < ctx.ema_21[i] and position==1: return -1
     return 0
 
+ENGINE_PARAMS = {"invest_limit": 2500, "leverage": 1, "maintenance_margin": engine.DEFAULT_MAINTENANCE_MARGIN}
+
+def engine_params(params):
+    """
+    PositionEngine settings from strategy params (defaults above; numeric strings are coerced,
+    leverage is at least 1). Raises ValueError for anything that is not a non-negative number.
+    """
+    out = {}
+    for name, default in ENGINE_PARAMS.items():
+        value = params.get(name, default)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"params.{name} must be a number")
+        if not np.isfinite(value) or value < 0:
+            raise ValueError(f"params.{name} must be a non-negative number")
+        out[name] = value
+    out["leverage"] = max(1, out["leverage"])
+    return out
+
 def run_backtest(df, strategy_logic=None):
     if strategy_logic is None: strategy_logic = {}
-    strat_type = strategy_logic.get("type", "TREND")
+    spec = get_strategy(strategy_logic.get("type", DEFAULT_STRATEGY))
+    params = strategy_logic.get("params", {})
     
-    df = calculate_indicators(df)
+    df = calculate_indicators(df) # also converts CandleArrays input
+    if spec.prepare is not None:
+        df = spec.prepare(df, params)
     df.dropna(inplace=True)
     
-    capital = 10000
     initial_capital = 10000
-    position = 0 
-    entry_price = 0
-    qty = 0
-    state = {} 
     
-    equity_curve = []
-    trades = []
+    # Struct-of-arrays context + typed state (see strategy_api.py)
+    ctx = BarContext.from_frame(df)
+    state = spec.state(ctx, params)
+    on_bar = spec.on_bar
+    opens, highs, lows, closes = ctx.open, ctx.high, ctx.low, ctx.close
     
-    rows = list(df.iterrows())
+    # Per-bar paths and the trade log live in the engine's preallocated arrays (bar i -> slot i-1)
+    n_bars = max(ctx.n - 1, 0)
+    eng = engine.PositionEngine(n_bars, initial_capital=initial_capital, **engine_params(params)) # invest_limit = simple DCA size
     
-    for i in range(1, len(rows)):
-        index, row = rows[i]
-        prev_index, prev_row = rows[i-1]
-        
-        signal = 0
+    for i in range(1, ctx.n):
+        # Leveraged / short positions can be liquidated inside the bar
+        filled = eng.liq_price is not None and eng.check_liquidation(i - 1, opens[i], highs[i], lows[i])
         
-        # --- SELECT LOGIC ---
-        if strat_type == "LEARNED":
-            signal = strat_learned_clone(i, rows, position, strategy_logic.get("params", {}), state)
-        elif strat_type == "ORACLE":
-            signal = strat_oracle(i, rows, position, strategy_logic.get("params", {}), state)
-        elif strat_type == "METAMORPHOSIS":
-            signal = strat_adaptive_metamorphosis(i, rows, position, strategy_logic.get("params", {}), state)
-        elif strat_type == "RSI_DIV":
-            signal = strat_rsi_divergence(i, rows, position, strategy_logic.get("params", {}), state)
-        elif strat_type == "BITCOINBEY":
-            signal = strat_bitcoinbey(row, prev_row, position, strategy_logic.get("params", {}), state)
-        elif strat_type == "GRID":
-            signal = strat_grid(row, position)
-        elif strat_type == "BREAKOUT":
-            signal = strat_breakout(row, position)
-        else:
-            signal = strat_ema_trend(row, prev_row, position)
+        ctx.i = i
+        signal = on_bar(ctx, eng.position, params, state)
             
         # Execute
-        
-        if signal == 1: # Buy / Add
-            # NOTE: logic wrappers like RSI_DIV can return 1 repeatedly.
-            # We must handle DCA logic here generically if possible, or assume calling function checks.
-            # RSI_DIV checks max_buys internal state, so if it returns 1, we BUY.
-            
-            invest_amount = strategy_logic.get("params", {}).get("invest_limit", 2500) # Simple DCA size
-            if capital >= invest_amount:
-               # Simple DCA Calculation
-               new_qty = invest_amount / row['close']
-               total_cost_usd = (qty * entry_price) + invest_amount
-               qty += new_qty
-               entry_price = total_cost_usd / qty
-               capital -= invest_amount
-               position = 1
-               
-               # Update State for AvgPrice (Important for TP/SL in Logic)
-               state['avgEntryPrice'] = entry_price
-               
-               trades.append({"date": row['timestamp'].strftime('%Y-%m-%d %H:%M'), "side": "BUY", "price": row['close'], "type": "ENTRY"})
-            
-        elif signal < 0 and position == 1: # Sell All
-             # signal -1 = Normal, -2 = TP, -3 = SL
-             proceeds = qty * row['close']
-             profit = proceeds - (qty * entry_price)
-             capital += proceeds
-             
-             exit_type = "EXIT"
-             if signal == -2: exit_type = "TAKE_PROFIT"
-             elif signal == -3: exit_type = "STOP_LOSS"
-             
-             trades.append({"date": row['timestamp'].strftime('%Y-%m-%d %H:%M'), "side": "SELL", "price": row['close'], "type": exit_type, "pnl": round(profit, 2)})
-             
-             qty = 0
-             position = 0
-             entry_price = 0
-             state['avgEntryPrice'] = 0
+        # 1 = Buy / Add (flips a short), 2 = Short / Add (flips a long), < 0 = close the position
+        # NOTE: logic wrappers like RSI_DIV can return 1 repeatedly (DCA); they cap it via their own state.
+        if signal and eng.execute(i - 1, signal, closes[i]):
+            filled = True
+        if filled:
+            # Update State for AvgPrice (Important for TP/SL in Logic)
+            state.avg_entry_price = eng.entry_price
             
         # Update Equity
-        cur_eq = capital + (qty * row['close'])
-        equity_curve.append({"date": row['timestamp'].strftime('%Y-%m-%d %H:%M'), "equity": round(cur_eq, 2), "price": row['close']})
+        eng.mark(i - 1, closes[i])
+    
+    # Fees / slippage / funding over the whole position path (see costs.py)
+    bars = df.iloc[1:]
+    dates = bars['timestamp'].dt.strftime('%Y-%m-%d %H:%M').tolist()
+    prices = bars['close'].tolist()
+    equity_path = eng.equity
+    trades = eng.trades(dates)
+    
+    cost_config = costs.resolve(strategy_logic.get("costs"))
+    cost_summary = None
+    if cost_config and n_bars:
+        parts = costs.compute(bars, eng.qty_path, cost_config, df.attrs.get('coin'))
+        per_bar = parts["fees"] + parts["slippage"] + parts["funding"]
+        equity_path = equity_path - np.cumsum(per_bar)
+        for t, b in zip(trades, eng.trade_bars()):
+            t["cost"] = round(float(parts["fees"][b] + parts["slippage"][b]), 2)
+        cost_summary = costs.summary(parts)
+    
+    equity_curve = [
+        {"date": d, "equity": round(e, 2), "price": p}
+        for d, e, p in zip(dates, equity_path.tolist(), prices)
+    ]
         
     final_equity = equity_curve[-1]['equity'] if equity_curve else initial_capital
-    return {
+    result = {
         "metrics": { 
             "total_return_pct": round(((final_equity - initial_capital)/initial_capital)*100, 2),
             "total_trades": len(trades),
@@ -509,3 +650,6 @@ def run_backtest(df, strategy_logic=None):
         "equity_curve": equity_curve,
         "trades": trades
     }
+    if cost_summary is not None:
+        result["metrics"]["costs"] = cost_summary
+    return result
@@ -0,0 +1,133 @@
+"""
+Scale benchmarks on synthetic candles, and the API cold-start budget.
+
+    python benchmark.py                      # 1k / 10k / 100k bars
+    python benchmark.py --bars 1000000 --scenario crash
+    python benchmark.py --startup            # exits 1 if `import main` exceeds the budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import synthetic
+import backtester
+import strategy_factory
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def bench_size(n_bars, scenario="gbm", seed=42, strategies=("TREND", "ORACLE", "RSI_DIV")):
+    rows = []
+
+    candles, dt = _timed(lambda: synthetic.generate_candle_arrays(n_bars, scenario=scenario, seed=seed))
+    rows.append(("generate", dt))
+
+    df, dt = _timed(candles.to_frame)
+    rows.append(("to_frame", dt))
+
+    _, dt = _timed(lambda: backtester.calculate_indicators(df))
+    rows.append(("calculate_indicators", dt))
+
+    oracle = None
+    for strat in strategies:
+        res, dt = _timed(lambda: backtester.run_backtest(df, {"type": strat}))
+        rows.append((f"run_backtest[{strat}]", dt))
+        if strat == "ORACLE":
+            oracle = res
+
+    if oracle and oracle["trades"]:
+        marks = [{"date": t["date"], "side": t["side"]} for t in oracle["trades"]]
+        _, dt = _timed(lambda: strategy_factory.infer_strategy_from_marks(df, marks))
+        rows.append(("infer_strategy_from_marks", dt))
+
+    return rows
+
+
+# Cold start: `import main` plus the first /health must stay within this, and must not
+# pull in the data stack (that is warmup.py's job, after the server is listening)
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "750"))
+STARTUP_FORBIDDEN = ["pandas", "numpy", "requests", "dashscope", "backtester", "feature_store"]
+
+_STARTUP_PROBE = """
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+sent = []
+async def receive():
+    return {"type": "http.request", "body": b""}
+async def send(message):
+    sent.append(message)
+scope = {"type": "http", "method": "GET", "path": "/health", "headers": [], "query_string": b"",
+         "http_version": "1.1", "scheme": "http", "server": ("bench", 80), "client": ("bench", 1), "root_path": ""}
+asyncio.run(main.app(scope, receive, send))
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_health_ms": (t2 - t0) * 1000,
+    "status": sent[0]["status"],
+    "loaded": [m for m in FORBIDDEN if m in sys.modules],
+}))
+"""
+
+
+def bench_startup(runs=5, budget_ms=STARTUP_BUDGET_MS):
+    """
+    Fresh interpreter per run (no warm import caches in-process).
+    Returns (ok, report dict).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = f"FORBIDDEN = {STARTUP_FORBIDDEN!r}\n" + _STARTUP_PROBE
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True,
+                             env={**os.environ, "WARMUP": "0"})
+        if out.returncode != 0:
+            return False, {"error": out.stderr.strip().splitlines()[-1] if out.stderr else "probe failed"}
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    report = {
+        "runs": runs,
+        "budget_ms": budget_ms,
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "first_health_ms": round(statistics.median(s["first_health_ms"] for s in samples), 1),
+        "health_status": samples[-1]["status"],
+        "eagerly_loaded": sorted({m for s in samples for m in s["loaded"]}),
+    }
+    ok = report["first_health_ms"] <= budget_ms and not report["eagerly_loaded"] and report["health_status"] == 200
+    return ok, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--scenario", default="gbm", choices=list(synthetic.SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--startup", action="store_true", help="check the API cold-start budget instead")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args()
+
+    if args.startup:
+        ok, report = bench_startup(budget_ms=args.budget_ms)
+        for key, value in report.items():
+            print(f"{key:<18} {value}")
+        print("OK" if ok else "OVER BUDGET")
+        sys.exit(0 if ok else 1)
+
+    for n in args.bars:
+        print(f"\n== {n:,} bars ({args.scenario}) ==")
+        for name, dt in bench_size(n, args.scenario, args.seed):
+            rate = n / dt if dt > 0 else float("inf")
+            print(f"{name:<28} {dt * 1000:>10.1f} ms {rate:>14,.0f} bars/s")
+
+
+if __name__ == "__main__":
+    main()
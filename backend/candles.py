@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Bar length per Hyperliquid interval string
+INTERVAL_MS = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+
+# Hyperliquid candle keys for each column
+HL_KEYS = {'open': 'o', 'high': 'h', 'low': 'l', 'close': 'c', 'volume': 'v'}
+
+
+class CandleArrays:
+    """
+    Compact columnar candle history.
+    timestamp is int64 epoch-ms, OHLCV share one float dtype (float32 halves memory).
+    Every column is a plain NumPy array, so indicators/engine can read them without copies.
+    """
+    __slots__ = ('coin', 'interval', 'timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, timestamp, open, high, low, close, volume, coin=None, interval=None):
+        self.coin = coin
+        self.interval = interval
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.open = np.asarray(open)
+        self.high = np.asarray(high, dtype=self.open.dtype)
+        self.low = np.asarray(low, dtype=self.open.dtype)
+        self.close = np.asarray(close, dtype=self.open.dtype)
+        self.volume = np.asarray(volume, dtype=self.open.dtype)
+
+    @classmethod
+    def from_hyperliquid(cls, data, coin=None, interval=None, dtype=np.float64):
+        """
+        Build straight from the candleSnapshot JSON (list of {"t", "o", "h", ...}).
+        Each column is parsed in one pass with np.fromiter - no DataFrame, no per-row dicts.
+        """
+        n = len(data)
+        timestamp = np.fromiter((c['t'] for c in data), dtype=np.int64, count=n)
+        cols = {
+            name: np.fromiter((float(c[key]) for c in data), dtype=dtype, count=n)
+            for name, key in HL_KEYS.items()
+        }
+
+        # HL returns ascending candles; only reorder if that ever changes
+        if n > 1 and np.any(np.diff(timestamp) < 0):
+            order = np.argsort(timestamp, kind='stable')
+            timestamp = timestamp[order]
+            cols = {name: arr[order] for name, arr in cols.items()}
+
+        return cls(timestamp, coin=coin, interval=interval, **cols)
+
+    @classmethod
+    def from_frame(cls, df, coin=None, interval=None, dtype=None):
+        """
+        Convert a fetch_candles style DataFrame (datetime 'timestamp' column).
+        """
+        ts = df['timestamp']
+        if pd.api.types.is_datetime64_any_dtype(ts):
+            timestamp = ts.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        else:
+            timestamp = ts.to_numpy(dtype=np.int64)
+
+        dtype = dtype or df['close'].dtype
+        cols = {name: df[name].to_numpy(dtype=dtype) for name in OHLCV_COLUMNS}
+        return cls(
+            timestamp,
+            coin=coin or df.attrs.get('coin'),
+            interval=interval or df.attrs.get('interval'),
+            **cols
+        )
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def dtype(self):
+        return self.close.dtype
+
+    @property
+    def nbytes(self):
+        return self.timestamp.nbytes + sum(getattr(self, name).nbytes for name in OHLCV_COLUMNS)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def columns(self):
+        """
+        Dict of column name -> array view (no copies).
+        """
+        return {name: getattr(self, name) for name in ('timestamp',) + OHLCV_COLUMNS}
+
+    def slice(self, start=None, stop=None):
+        """
+        Window of bars; basic slicing keeps every column a view of the original buffers.
+        """
+        s = slice(start, stop)
+        return CandleArrays(
+            self.timestamp[s], self.open[s], self.high[s], self.low[s], self.close[s], self.volume[s],
+            coin=self.coin, interval=self.interval
+        )
+
+    def astype(self, dtype):
+        cols = {name: getattr(self, name).astype(dtype, copy=False) for name in OHLCV_COLUMNS}
+        return CandleArrays(self.timestamp, coin=self.coin, interval=self.interval, **cols)
+
+    def to_frame(self):
+        """
+        fetch_candles compatible DataFrame for the pandas-based code paths.
+        OHLCV columns wrap the existing arrays where pandas allows it.
+        """
+        data = {'timestamp': pd.to_datetime(self.timestamp, unit='ms')}
+        data.update({name: getattr(self, name) for name in OHLCV_COLUMNS})
+        df = pd.DataFrame(data, copy=False)
+        df.attrs['coin'] = self.coin
+        df.attrs['interval'] = self.interval
+        return df
@@ -1,30 +1,25 @@
-import os
+import asyncio
 import json
-import dashscope
-from dashscope import Generation
 from models import ChatRequest, ChatResponse, Strategy, Indicator, Rule, RiskSettings
-from dotenv import load_dotenv
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+import llm
+import strategy_pipeline
+from lazy import lazy_import
+from backtest_api import buy_and_hold_curve, logic_error
 
-# Load environment variables
-load_dotenv()
-
-dashscope.api_key = os.getenv("DASHSCOPE_API_KEY")
+# Data-stack modules load on first use (see lazy.py)
+feature_store = lazy_import("feature_store")
+result_cache = lazy_import("result_cache")
 
 router = APIRouter()
 
-@router.post("/message", response_model=ChatResponse)
-async def chat_handler(request: ChatRequest):
-    """
-    Real AI Endpoint using Alibaba Cloud Qwen (DashScope).
-    """
-    user_msg = request.message
-    
-    # System prompt to guide the AI to return JSON matching our schema
-    system_prompt = """
+# System prompt to guide the AI to return JSON matching our schema
+# (built once at import; identical for every request)
+SYSTEM_PROMPT = """
     You are an expert crypto trading strategy assistant.
     Your goal is to parse the user's request and create a trading strategy in JSON format.
-    
+
     The JSON structure MUST match this Pydantic schema:
     {
         "text": "A brief explanation of what you created.",
@@ -44,66 +39,184 @@ async def chat_handler(request: ChatRequest):
                  "stop_loss_pct": 2.0,
                  "take_profit_pct": 5.0,
                  "max_leverage": 5,
-                 "position_size_pct": 10.0
+                 "position_size_pct": 10.0,
+                 "allow_short": false
             }
         }
     }
-    
+
+    Rule actions: "BUY" opens a long, "SELL" closes a long, "SHORT" opens a short, "CLOSE" exits any position.
+    Only use "SHORT" (or set "allow_short": true, which makes SELL open a short) when the user asks to short.
+
     If the user just says "hello" or asks a general question without strategy intent, set "strategy" to null in the JSON.
     ALWAYS RETURN RAW JSON only. No markdown formatting like ```json ... ```.
     """
 
-    messages = [
-        {'role': 'system', 'content': system_prompt},
+
+def build_messages(user_msg):
+    return [
+        {'role': 'system', 'content': SYSTEM_PROMPT},
         {'role': 'user', 'content': user_msg}
     ]
 
-    try:
-        response = Generation.call(
-            Generation.Models.qwen_turbo,
-            messages=messages,
-            result_format='message'  # set the result to be "message" format.
+
+def parse_ai_response(content):
+    """
+    Turn raw model output into a ChatResponse.
+    Raises json.JSONDecodeError if the content is not JSON.
+    """
+    # Clean up potential markdown formatting
+    if content.startswith("```json"):
+        content = content.replace("```json", "").replace("```", "")
+
+    data = json.loads(content)
+
+    strategy_data = data.get("strategy")
+    strategy_obj = None
+
+    if strategy_data:
+        # Map JSON to Pydantic models
+        indicators = [Indicator(**i) for i in strategy_data.get("indicators", [])]
+        rules = [Rule(**r) for r in strategy_data.get("rules", [])]
+        risk = RiskSettings(**strategy_data.get("risk", {}))
+
+        strategy_obj = Strategy(
+            name=strategy_data["name"],
+            description=strategy_data["description"],
+            market=strategy_data["market"],
+            timeframe=strategy_data["timeframe"],
+            indicators=indicators,
+            rules=rules,
+            risk=risk
         )
 
-        if response.status_code == 200:
-            content = response.output.choices[0].message.content
-            print(f"AI Response: {content}") # Debug log
-            
-            # Clean up potential markdown formatting
-            if content.startswith("```json"):
-                content = content.replace("```json", "").replace("```", "")
-            
-            try:
-                data = json.loads(content)
-                
-                strategy_data = data.get("strategy")
-                strategy_obj = None
-                
-                if strategy_data:
-                    # Map JSON to Pydantic models
-                    indicators = [Indicator(**i) for i in strategy_data.get("indicators", [])]
-                    rules = [Rule(**r) for r in strategy_data.get("rules", [])]
-                    risk = RiskSettings(**strategy_data.get("risk", {}))
-                    
-                    strategy_obj = Strategy(
-                        name=strategy_data["name"],
-                        description=strategy_data["description"],
-                        market=strategy_data["market"],
-                        timeframe=strategy_data["timeframe"],
-                        indicators=indicators,
-                        rules=rules,
-                        risk=risk
-                    )
-
-                return ChatResponse(
-                    text=data.get("text", "Here is your strategy."),
-                    strategy=strategy_obj
-                )
-            except json.JSONDecodeError:
-                return ChatResponse(text="Failed to parse AI response. Please try again.")
-        else:
-            return ChatResponse(text=f"AI Error: {response.code} - {response.message}")
-            
+    return ChatResponse(
+        text=data.get("text", "Here is your strategy."),
+        strategy=strategy_obj
+    )
+
+
+@router.post("/message", response_model=ChatResponse)
+async def chat_handler(request: ChatRequest):
+    """
+    Real AI Endpoint using Alibaba Cloud Qwen (DashScope).
+    The LLM call runs off the event loop (see llm.complete_async), so a slow
+    response no longer blocks backtests. Repeat prompts are served from cache.
+    """
+    user_msg = request.message
+
+    cache = llm.get_response_cache()
+    cached = cache.get(user_msg)
+    if cached is not None:
+        return cached
+
+    try:
+        content = await llm.complete_async(build_messages(user_msg))
+        print(f"AI Response: {content}") # Debug log
+
+        try:
+            result = parse_ai_response(content)
+        except json.JSONDecodeError:
+            return ChatResponse(text="Failed to parse AI response. Please try again.")
+
+        cache.put(user_msg, result)
+        return result
+
+    except asyncio.TimeoutError:
+        return ChatResponse(text="AI Error: the model took too long to respond. Please try again.")
+    except llm.LLMError as e:
+        return ChatResponse(text=f"AI Error: {e}")
     except Exception as e:
-        print(f"Error calling DashScope: {e}")
+        print(f"Error calling LLM backend: {e}")
         return ChatResponse(text=f"Internal Server Error: {str(e)}")
+
+
+async def chat_backtest_events(user_msg):
+    """
+    Async generator of SSE chunks: explanation -> strategy backtest -> benchmark -> done.
+    Candles for the guessed market are fetched while the LLM is still generating.
+    """
+    guess = strategy_pipeline.guess_market(user_msg)
+    prefetch = asyncio.create_task(asyncio.to_thread(feature_store.get_features, *guess))
+
+    try:
+        # 1. LLM (cached by normalized message)
+        cache = llm.get_response_cache()
+        chat_res = cache.get(user_msg)
+        if chat_res is None:
+            try:
+                content = await llm.complete_async(build_messages(user_msg))
+                chat_res = parse_ai_response(content)
+                cache.put(user_msg, chat_res)
+            except asyncio.TimeoutError:
+                yield strategy_pipeline.sse("error", {"message": "AI Error: the model took too long to respond."})
+                return
+            except json.JSONDecodeError:
+                yield strategy_pipeline.sse("error", {"message": "Failed to parse AI response. Please try again."})
+                return
+            except Exception as e:
+                print(f"Error calling LLM backend: {e}")
+                yield strategy_pipeline.sse("error", {"message": f"AI Error: {e}"})
+                return
+
+        yield strategy_pipeline.sse("explanation", {
+            "text": chat_res.text,
+            "strategy": chat_res.strategy.model_dump() if chat_res.strategy else None
+        })
+        if chat_res.strategy is None:
+            yield strategy_pipeline.sse("done", {})
+            return
+
+        # 2. Compile + candles (reuse the prefetch if the guess was right)
+        strategy = chat_res.strategy
+        try:
+            logic, notes = strategy_pipeline.logic_from_strategy(strategy)
+            target = (strategy_pipeline.coin_from_market(strategy.market), strategy.timeframe or strategy_pipeline.DEFAULT_TIMEFRAME)
+            if target == guess:
+                df = await prefetch
+            else:
+                df = await asyncio.to_thread(feature_store.get_features, *target)
+        except Exception as e:
+            print(f"Error preparing chat strategy: {e}")
+            yield strategy_pipeline.sse("error", {"message": f"Could not prepare the strategy: {e}"})
+            return
+
+        if df.empty:
+            yield strategy_pipeline.sse("error", {"message": f"Could not fetch market data for {target[0]} {target[1]}"})
+            return
+
+        # 3. Validate the compiled rules against the data, then backtest (off the event loop)
+        error = await asyncio.to_thread(logic_error, df, logic)
+        if error:
+            yield strategy_pipeline.sse("error", {"message": f"Invalid strategy: {error}", "logic": logic, "notes": notes})
+            return
+        try:
+            results = await asyncio.to_thread(result_cache.cached_backtest, df, logic)
+            benchmark = await asyncio.to_thread(buy_and_hold_curve, df)
+        except Exception as e:
+            print(f"Error backtesting chat strategy: {e}")
+            yield strategy_pipeline.sse("error", {"message": f"Backtest failed: {e}"})
+            return
+        yield strategy_pipeline.sse("backtest", {"market": target[0], "timeframe": target[1], "logic": logic, "notes": notes, "strategy": results})
+        yield strategy_pipeline.sse("benchmark", {"benchmark": benchmark})
+        yield strategy_pipeline.sse("done", {})
+    finally:
+        if not prefetch.done():
+            prefetch.cancel()
+
+
+@router.post("/strategy")
+async def chat_strategy_backtest(request: ChatRequest):
+    """
+    Chat -> Strategy -> backtest in one call, streamed as Server-Sent Events:
+    explanation, backtest, benchmark, done (or error).
+    """
+    return StreamingResponse(chat_backtest_events(request.message), media_type="text/event-stream")
+
+
+@router.get("/cache/stats")
+async def chat_cache_stats():
+    """
+    Hit/miss counters of the chat response cache.
+    """
+    return llm.get_response_cache().stats()
@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+import numpy as np
+
+import market_data
+import synthetic
+import singleflight
+from candles import INTERVAL_MS
+
+# Execution costs for run_backtest: exchange fees, volume-based slippage and perp funding.
+# Everything is computed from the per-bar position array after the engine loop, so enabling
+# costs adds a few NumPy passes over the bars, not work per bar.
+# Enabled per strategy with logic["costs"] = True (Hyperliquid defaults) or a dict of overrides.
+
+# Hyperliquid base tier
+DEFAULT_COSTS = {
+    "order_type": "taker", # fills at the bar close are market orders; "maker" assumes resting limits
+    "taker_fee_bps": 4.5,
+    "maker_fee_bps": 1.5,
+    "half_spread_bps": 1.0, # paid by taker fills on top of impact
+    "impact_coef": 1.0, # impact = coef * bar range * sqrt(order notional / bar notional volume)
+    "funding": True,
+}
+
+FUNDING_DIR = os.getenv("FUNDING_DIR", "funding_rates")
+FUNDING_REFRESH_SECONDS = 600 # re-check the exchange for new funding prints at most this often
+FUNDING_INTERVAL_MS = 3_600_000 # Hyperliquid pays funding every hour
+
+_funding_cache = {} # COIN -> (checked_at, times, rates)
+_funding_lock = threading.Lock() # guards _funding_cache only, never held across a fetch
+_funding_flight = singleflight.group("funding") # one exchange walk per coin at a time
+
+
+def config_error(config):
+    """
+    Why logic["costs"] is not a valid setting (True / False / dict of DEFAULT_COSTS overrides), or None.
+    """
+    if config is None or isinstance(config, bool):
+        return None
+    if not isinstance(config, dict):
+        return "costs must be true, false or an object of overrides"
+    for name, value in config.items():
+        if name not in DEFAULT_COSTS:
+            return f"Unknown cost setting '{name}'"
+        if name == "order_type":
+            if value not in ("taker", "maker"):
+                return "costs.order_type must be 'taker' or 'maker'"
+        elif name == "funding":
+            if not isinstance(value, bool):
+                return "costs.funding must be true or false"
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value) or value < 0:
+            return f"costs.{name} must be a non-negative number"
+    return None
+
+
+def resolve(config):
+    """
+    logic["costs"] -> full config dict, or None when costs are off.
+    Raises ValueError for invalid settings (see config_error).
+    """
+    error = config_error(config)
+    if error:
+        raise ValueError(error)
+    if not config:
+        return None
+    if config is True:
+        return dict(DEFAULT_COSTS)
+    return {**DEFAULT_COSTS, **config}
+
+
+def _funding_path(coin):
+    return os.path.join(FUNDING_DIR, f"{coin.upper()}.npy")
+
+
+def _load_funding(coin):
+    try:
+        stored = np.load(_funding_path(coin))
+        return stored[0].astype(np.int64), stored[1]
+    except (OSError, ValueError):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+
+def _refresh_funding(coin, start_ms, end_ms):
+    """
+    Stored prints of one coin, topped up from Hyperliquid when they do not cover
+    [start_ms, end_ms]. Runs under _funding_flight, outside _funding_lock.
+    """
+    now = time.time()
+    times, rates = _load_funding(coin)
+    if times.size == 0 or times[-1] < end_ms - FUNDING_INTERVAL_MS or times[0] > start_ms:
+        fetch_from = start_ms if times.size == 0 or times[0] > start_ms else int(times[-1]) + 1
+        new = market_data.fetch_funding_history(coin, fetch_from)
+        if new:
+            new_t = np.array([f["time"] for f in new], dtype=np.int64)
+            new_r = np.array([float(f["fundingRate"]) for f in new])
+            keep = (times < new_t[0]) if times.size else np.empty(0, dtype=bool)
+            times = np.concatenate([times[keep], new_t])
+            rates = np.concatenate([rates[keep], new_r])
+            try:
+                os.makedirs(FUNDING_DIR, exist_ok=True)
+                tmp = _funding_path(coin) + ".tmp.npy"
+                np.save(tmp, np.vstack([times.astype(np.float64), rates]))
+                os.replace(tmp, _funding_path(coin))
+            except OSError as e:
+                print(f"Error saving funding for {coin}: {e}")
+    with _funding_lock:
+        _funding_cache[coin] = (now, times, rates)
+    return times, rates
+
+
+def funding_rates(coin, start_ms, end_ms):
+    """
+    (times, rates) of hourly funding prints in [start_ms, end_ms], from the local store.
+    The store is topped up from Hyperliquid when it ends before end_ms; synthetic markets have none.
+    Concurrent misses for one coin share a single fetch; other coins never wait for it.
+    """
+    if not coin or synthetic.is_synthetic_market(coin):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    coin = coin.upper()
+
+    with _funding_lock:
+        hit = _funding_cache.get(coin)
+    covered = hit is not None and hit[1].size and hit[1][0] <= start_ms and hit[1][-1] >= end_ms - FUNDING_INTERVAL_MS
+    if hit is not None and (covered or time.time() - hit[0] < FUNDING_REFRESH_SECONDS):
+        times, rates = hit[1], hit[2]
+    else:
+        times, rates = _funding_flight.do(coin, lambda: _refresh_funding(coin, start_ms, end_ms))
+
+    lo, hi = np.searchsorted(times, [start_ms, end_ms], side='left')
+    return times[lo:hi], rates[lo:hi]
+
+
+def compute(bars, qty, config, coin=None):
+    """
+    Per-bar cost arrays for a position path.
+    bars: DataFrame aligned with qty (timestamp, close, high, low, volume).
+    qty: signed position size in coins held after each bar's fill (longs > 0, shorts < 0).
+    Returns {"fees", "slippage", "funding"} arrays in USD, positive = paid.
+    """
+    close = bars['close'].to_numpy(dtype=np.float64)
+    high = bars['high'].to_numpy(dtype=np.float64)
+    low = bars['low'].to_numpy(dtype=np.float64)
+    volume = bars['volume'].to_numpy(dtype=np.float64)
+    qty = np.asarray(qty, dtype=np.float64)
+
+    # 1. Fills are the changes of the position path (the bar before the first is flat)
+    notional = np.abs(np.diff(qty, prepend=0.0)) * close
+
+    # 2. Fees
+    maker = config["order_type"] == "maker"
+    fee_rate = (config["maker_fee_bps"] if maker else config["taker_fee_bps"]) / 1e4
+    fees = notional * fee_rate
+
+    # 3. Slippage: half spread + square-root impact scaled by the bar's high/low range
+    if maker:
+        slippage = np.zeros_like(notional)
+    else:
+        bar_notional = volume * close
+        with np.errstate(divide='ignore', invalid='ignore'):
+            participation = np.where(bar_notional > 0, np.minimum(notional / bar_notional, 1.0), 1.0)
+            bar_range = np.where(low > 0, np.log(high / low), 0.0)
+        slip_rate = config["half_spread_bps"] / 1e4 + config["impact_coef"] * bar_range * np.sqrt(participation)
+        slippage = np.where(notional > 0, notional * slip_rate, 0.0)
+
+    # 4. Funding: every hourly print charges the position held in the bar it falls into
+    funding = np.zeros_like(notional)
+    if config["funding"] and len(bars):
+        ts = bars['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        step = INTERVAL_MS.get(bars.attrs.get('interval'), int(np.median(np.diff(ts))) if len(ts) > 1 else FUNDING_INTERVAL_MS)
+        times, rates = funding_rates(coin, int(ts[0]), int(ts[-1]) + step)
+        if times.size:
+            idx = np.searchsorted(ts, times, side='right') - 1
+            ok = idx >= 0
+            idx, r = idx[ok], rates[ok]
+            np.add.at(funding, idx, qty[idx] * close[idx] * r) # positive rate: longs pay shorts
+
+    return {"fees": fees, "slippage": slippage, "funding": funding}
+
+
+def summary(parts):
+    out = {name: round(float(arr.sum()), 2) for name, arr in parts.items()}
+    out["total"] = round(sum(out.values()), 2)
+    return out
@@ -0,0 +1,205 @@
+import numpy as np
+
+# Position engine shared by run_backtest and array-signal simulations.
+# State is a handful of scalars; per-bar equity/position and the trade log live in
+# preallocated arrays, so the hot loop only does float arithmetic and array stores.
+#
+# Signals:  1 = go/add long (flips a short),  2 = go/add short (flips a long),
+#          -1 = close (EXIT), -2 = close (TAKE_PROFIT), -3 = close (STOP_LOSS).
+# Longs are spot + borrowed notional, shorts hold their margin; at leverage 1 the long
+# arithmetic is exactly the original flat/long DCA engine.
+
+LONG = 1
+SHORT = 2
+LIQUIDATION = -4
+
+EXIT_TYPES = {-1: "EXIT", -2: "TAKE_PROFIT", -3: "STOP_LOSS", LIQUIDATION: "LIQUIDATION"}
+TYPE_NAMES = ["ENTRY", "EXIT", "TAKE_PROFIT", "STOP_LOSS", "LIQUIDATION"]
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+DEFAULT_MAINTENANCE_MARGIN = 0.005 # share of position notional; below it the position is liquidated
+
+
+class PositionEngine:
+    __slots__ = (
+        'capital', 'invest_limit', 'leverage', 'mmr',
+        'qty', 'entry_price', 'debt', 'margin', 'liq_price',
+        'equity', 'qty_path', 'n_trades',
+        't_bar', 't_side', 't_type', 't_price', 't_pnl', 't_short',
+    )
+
+    def __init__(self, n_bars, initial_capital=10000, invest_limit=2500, leverage=1, maintenance_margin=DEFAULT_MAINTENANCE_MARGIN):
+        self.capital = initial_capital # cash not tied up as margin
+        self.invest_limit = invest_limit # margin committed per entry
+        self.leverage = leverage
+        self.mmr = maintenance_margin
+
+        self.qty = 0 # signed coins: > 0 long, < 0 short
+        self.entry_price = 0
+        self.debt = 0.0 # borrowed part of a leveraged long
+        self.margin = 0.0 # margin held by a short
+        self.liq_price = None # None = cannot be liquidated
+
+        self.equity = np.empty(n_bars)
+        self.qty_path = np.empty(n_bars)
+
+        # Trade log: at most two fills per bar (a flip, or a liquidation then an entry)
+        cap = 2 * n_bars + 1
+        self.n_trades = 0
+        self.t_bar = np.empty(cap, dtype=np.int64)
+        self.t_side = np.empty(cap, dtype=np.int8) # 1 = BUY, -1 = SELL
+        self.t_type = np.empty(cap, dtype=np.int8) # index into TYPE_NAMES
+        self.t_price = np.empty(cap)
+        self.t_pnl = np.empty(cap) # NaN on entries
+        self.t_short = np.empty(cap, dtype=bool)
+
+    @property
+    def position(self):
+        return 1 if self.qty > 0 else (-1 if self.qty < 0 else 0)
+
+    def _log(self, bar, side, type_code, price, pnl, short):
+        k = self.n_trades
+        self.t_bar[k] = bar
+        self.t_side[k] = side
+        self.t_type[k] = type_code
+        self.t_price[k] = price
+        self.t_pnl[k] = pnl
+        self.t_short[k] = short
+        self.n_trades = k + 1
+
+    def _update_liq_price(self):
+        """
+        Price at which account equity falls to the maintenance margin of the position.
+        """
+        if self.qty > 0:
+            p = (self.debt - self.capital) / (self.qty * (1 - self.mmr))
+            self.liq_price = p if p > 0 else None
+        elif self.qty < 0:
+            q = -self.qty
+            self.liq_price = (self.capital + self.margin + q * self.entry_price) / (q * (1 + self.mmr))
+        else:
+            self.liq_price = None
+
+    def _open(self, bar, price, short):
+        amount = self.invest_limit
+        if self.capital < amount:
+            return False
+        notional = amount * self.leverage
+        new_qty = notional / price
+        if short:
+            total_cost = (-self.qty * self.entry_price) + notional
+            self.qty -= new_qty
+            self.entry_price = total_cost / -self.qty
+            self.margin += amount
+        else:
+            total_cost = (self.qty * self.entry_price) + notional
+            self.qty += new_qty
+            self.entry_price = total_cost / self.qty
+            self.debt += notional - amount
+        self.capital -= amount
+        self._log(bar, -1 if short else 1, 0, price, np.nan, short)
+        self._update_liq_price()
+        return True
+
+    def _close(self, bar, price, signal):
+        if self.qty > 0:
+            proceeds = self.qty * price
+            profit = proceeds - (self.qty * self.entry_price)
+            self.capital += proceeds - self.debt
+            self._log(bar, -1, TYPE_CODES[EXIT_TYPES[signal]], price, profit, False)
+        else:
+            q = -self.qty
+            profit = q * (self.entry_price - price)
+            self.capital += self.margin + profit
+            self._log(bar, 1, TYPE_CODES[EXIT_TYPES[signal]], price, profit, True)
+        if self.capital < 0: # cross-margin account cannot go below zero
+            self.capital = 0
+        self.qty = 0
+        self.entry_price = 0
+        self.debt = 0.0
+        self.margin = 0.0
+        self.liq_price = None
+
+    def check_liquidation(self, bar, open_, high, low):
+        """
+        Intrabar check against the bar's extremes, before the strategy sees the close.
+        Fills at the liquidation price, or at the open when the bar gaps through it.
+        """
+        p = self.liq_price
+        if p is None:
+            return False
+        if self.qty > 0 and low <= p:
+            self._close(bar, min(p, open_), LIQUIDATION)
+            return True
+        if self.qty < 0 and high >= p:
+            self._close(bar, max(p, open_), LIQUIDATION)
+            return True
+        return False
+
+    def execute(self, bar, signal, price):
+        """
+        Apply a strategy signal at `price`. Returns True if anything was filled.
+        """
+        if signal == LONG or signal == SHORT:
+            short = signal == SHORT
+            if (self.qty < 0 and not short) or (self.qty > 0 and short):
+                self._close(bar, price, -1) # flip: close the opposite side first
+                self._open(bar, price, short)
+                return True
+            return self._open(bar, price, short)
+        if signal < 0 and self.qty != 0:
+            self._close(bar, price, signal)
+            return True
+        return False
+
+    def mark(self, bar, price):
+        """
+        Record end-of-bar equity and position.
+        """
+        if self.qty < 0:
+            self.equity[bar] = self.capital + self.margin + (-self.qty) * (self.entry_price - price)
+        else:
+            self.equity[bar] = self.capital + (self.qty * price) - self.debt
+        self.qty_path[bar] = self.qty
+
+    def trades(self, dates):
+        """
+        Trade log as run_backtest's list of dicts (dates: formatted bar dates).
+        """
+        out = []
+        for k in range(self.n_trades):
+            t = {
+                "date": dates[self.t_bar[k]],
+                "side": "BUY" if self.t_side[k] == 1 else "SELL",
+                "price": float(self.t_price[k]),
+                "type": TYPE_NAMES[self.t_type[k]],
+            }
+            if self.t_type[k] != 0:
+                t["pnl"] = round(float(self.t_pnl[k]), 2)
+            if self.t_short[k]:
+                t["direction"] = "SHORT"
+            out.append(t)
+        return out
+
+    def trade_bars(self):
+        return self.t_bar[:self.n_trades]
+
+
+def simulate(signals, close, open_=None, high=None, low=None, **engine_kwargs):
+    """
+    Run a precomputed signal array (vectorized / batched strategies) through the engine.
+    Without high/low no intrabar liquidation checks are made.
+    """
+    n = len(close)
+    engine = PositionEngine(n, **engine_kwargs)
+    check = high is not None and low is not None
+    if check and open_ is None:
+        open_ = np.concatenate([close[:1], close[:-1]])
+    for i in range(n):
+        if check and engine.liq_price is not None:
+            engine.check_liquidation(i, open_[i], high[i], low[i])
+        s = signals[i]
+        if s:
+            engine.execute(i, s, close[i])
+        engine.mark(i, close[i])
+    return engine
@@ -0,0 +1,517 @@
+import os
+import re
+import json
+import time
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError: # Windows: single-process locking only
+    fcntl = None
+
+import backtester
+import indicators
+import patterns
+import market_data
+import synthetic
+import singleflight
+from candles import CandleArrays, OHLCV_COLUMNS, INTERVAL_MS
+
+# Persistent indicator columns per coin/interval, shared by every endpoint and worker process.
+# Layout: <FEATURE_STORE_DIR>/<COIN>_<interval>/<column>.bin (raw little-endian arrays) + meta.json.
+# Files are only ever appended to and meta.json is replaced atomically after the data is
+# written, so readers memory-map exactly meta["rows"] rows and never see a partial append.
+# Only closed bars are persisted; the still-forming last bar is computed on the fly.
+
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "feature_store")
+
+# Multi-worker mode (serve.py with WEB_CONCURRENCY > 1): workers read the store and only
+# fetch themselves when fetcher.py has not refreshed a series for SHARED_MAX_AGE seconds
+SHARED = os.getenv("SHARED_FEATURES", "0") == "1"
+SHARED_MAX_AGE = float(os.getenv("SHARED_MAX_AGE", "120"))
+DAY_MS = 86_400_000
+FETCH_LOCK_STRIPES = 64 # .fetch-<n>.lock files in the store root, shared by all series
+
+# Store directory names come from request input: only plain exchange tickers are accepted
+COIN_RE = re.compile(r"^[A-Z0-9]+$")
+
+# Longest lookback in calculate_indicators: sma_99, or a divergence's two pivots plus the
+# RSI window behind them; EMAs continue from seeds instead
+CONTEXT_BARS = max(99, patterns.PIVOT_LEFT + patterns.DIVERGENCE_LOOKBACK + patterns.PIVOT_RIGHT + 15)
+
+# Leading bars of a window that calculate_indicators leaves NaN (sma_99). Served windows always
+# skip them, so a request covers the same bars whether the store holds 30 days or a year
+WARMUP_BARS = 99 - 1
+
+SEED_COLUMNS = list(backtester.EMA_SPANS) + ['macd_signal']
+DTYPES = {'timestamp': np.dtype('<i8')}
+FLOAT = np.dtype('<f8')
+
+
+class FeatureStore:
+    def __init__(self, root=FEATURE_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _dir(self, coin, interval):
+        return os.path.join(self.root, f"{coin.upper()}_{interval}")
+
+    @contextmanager
+    def _flock(self, thread_lock, lock_path):
+        """
+        Threads via thread_lock, processes via flock on lock_path.
+        """
+        with thread_lock, open(lock_path, "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked(self, coin, interval):
+        """
+        Writer lock on the series directory (created here, i.e. once there is data to write).
+        """
+        path = self._dir(coin, interval)
+        os.makedirs(path, exist_ok=True)
+        with self._flock(self._lock, os.path.join(path, ".lock")):
+            yield path
+
+    def fetch_lock(self, coin, interval):
+        """
+        Held while fetching a series from the exchange, so one process fetches and the rest wait.
+        Lives in the store root (one of FETCH_LOCK_STRIPES files), so a fetch that returns
+        nothing leaves no series directory behind.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        stripe = zlib.crc32(f"{coin.upper()}_{interval}".encode()) % FETCH_LOCK_STRIPES
+        return self._flock(self._fetch_lock, os.path.join(self.root, f".fetch-{stripe}.lock"))
+
+    def series(self):
+        """
+        (coin, interval) of every stored series.
+        """
+        out = []
+        for name in sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []:
+            path = os.path.join(self.root, name)
+            try:
+                with open(os.path.join(path, "meta.json")) as f:
+                    meta = json.load(f)
+                out.append((meta["coin"], meta["interval"]))
+            except (OSError, ValueError, KeyError):
+                continue
+        return out
+
+    def meta(self, coin, interval):
+        try:
+            with open(os.path.join(self._dir(coin, interval), "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, coin, interval, columns=None, meta=None):
+        """
+        Read-only memory maps of the stored columns ({name: array of meta["rows"]}).
+        Pages come from the OS cache, so every process shares one copy.
+        """
+        meta = meta or self.meta(coin, interval)
+        if meta is None:
+            return {}
+        rows = meta["rows"]
+        path = self._dir(coin, interval)
+        out = {}
+        for name in columns or meta["columns"]:
+            dtype = DTYPES.get(name, FLOAT)
+            if rows == 0:
+                out[name] = np.empty(0, dtype=dtype)
+            else:
+                out[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(rows,))
+        return out
+
+    def _features(self, coin, interval, meta, new):
+        """
+        Indicator frame for `new` bars continuing the stored history:
+        the last CONTEXT_BARS stored candles feed the rolling windows, the stored
+        EMA values of the bar before them seed the EMAs.
+        """
+        if meta is None or meta["rows"] == 0:
+            return backtester.calculate_indicators(new)
+
+        cols = self.load(coin, interval, ['timestamp'] + list(OHLCV_COLUMNS) + SEED_COLUMNS, meta)
+        rows = meta["rows"]
+        context = min(CONTEXT_BARS, rows)
+        k = rows - context
+        merged = {
+            name: np.concatenate([cols[name][k:], getattr(new, name).astype(DTYPES.get(name, FLOAT))])
+            for name in ('timestamp',) + OHLCV_COLUMNS
+        }
+        seed = {name: float(cols[name][k - 1]) for name in SEED_COLUMNS} if k > 0 else None
+        df = backtester.calculate_indicators(CandleArrays(coin=coin.upper(), interval=interval, **merged), seed)
+        return df.iloc[context:]
+
+    def append(self, candles, feats=None):
+        """
+        Persist candles newer than the stored last bar (all assumed closed).
+        A gap, an earlier start or a changed indicator set rebuilds the series from `candles`.
+        feats: precomputed indicator frame for all of `candles`, used when the series is
+        built from scratch (see get_features_many). Returns the number of rows written.
+        """
+        coin, interval = candles.coin.upper(), candles.interval
+        if candles.empty:
+            return 0
+
+        with self._locked(coin, interval) as path:
+            meta = self.meta(coin, interval)
+            ts = candles.timestamp
+            full = candles
+            if meta is not None:
+                first_new = int(np.searchsorted(ts, meta["last_ts"], side='right'))
+                if first_new == len(ts):
+                    return 0
+                step = INTERVAL_MS.get(interval, INTERVAL_MS["1h"])
+                if ts[0] < meta["first_ts"] or ts[first_new] - meta["last_ts"] > step:
+                    meta = None
+                else:
+                    candles = candles.slice(first_new)
+
+            precomputed = feats if feats is not None and len(feats) == len(full) else None
+            feats = self._features(coin, interval, meta, candles) if meta is not None or precomputed is None else precomputed
+            columns = ['timestamp'] + [c for c in feats.columns if c != 'timestamp']
+            if meta is not None and columns != meta["columns"]:
+                # calculate_indicators changed since the store was built
+                meta = None
+                candles = full
+                feats = self._features(coin, interval, None, candles) if precomputed is None else precomputed
+
+            if meta is None:
+                for name in os.listdir(path):
+                    if name.endswith(".bin"):
+                        os.remove(os.path.join(path, name))
+                meta = {"coin": coin, "interval": interval, "rows": 0, "columns": columns, "first_ts": int(candles.timestamp[0])}
+
+            rows = meta["rows"]
+            for name in columns:
+                dtype = DTYPES.get(name, FLOAT)
+                arr = candles.timestamp if name == 'timestamp' else feats[name].to_numpy(dtype=np.float64)
+                with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                    f.truncate(rows * dtype.itemsize) # drop leftovers of an interrupted append
+                    f.write(np.ascontiguousarray(arr, dtype=dtype).tobytes())
+
+            meta["rows"] = rows + len(candles)
+            meta["last_ts"] = int(candles.timestamp[-1])
+            tmp = os.path.join(path, "meta.json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(path, "meta.json"))
+            return len(candles)
+
+    def frame(self, coin, interval, start_ms=None, stop_ms=None, skip=0):
+        """
+        Stored bars with start_ms <= timestamp <= stop_ms as a calculate_indicators-style frame,
+        minus the first `skip` of them (warm-up).
+        Columns are the read-only memory maps themselves (no copy), so every process holding
+        a frame shares the same page-cache pages.
+        """
+        meta = self.meta(coin, interval)
+        if meta is None:
+            return pd.DataFrame()
+        cols = self.load(coin, interval, meta=meta)
+        ts = cols['timestamp']
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side='left'))
+        hi = len(ts) if stop_ms is None else int(np.searchsorted(ts, stop_ms, side='right'))
+        lo = min(lo + skip, hi)
+        data = {'timestamp': np.asarray(ts[lo:hi]).view('datetime64[ms]')}
+        data.update({name: np.asarray(cols[name][lo:hi]) for name in meta["columns"] if name != 'timestamp'})
+        df = pd.DataFrame(data, copy=False)
+        df.attrs['coin'] = meta["coin"]
+        df.attrs['interval'] = interval
+        df.attrs['features'] = f"store-{meta['first_ts']}"
+        return df
+
+    def sync(self, candles, now_ms=None, skip=0):
+        """
+        Append the closed bars of `candles` and return features for exactly the bars `candles`
+        covers, minus the first `skip` of them (warm-up).
+        """
+        coin, interval = candles.coin.upper(), candles.interval
+        n_closed = _n_closed(candles, now_ms)
+
+        self.append(candles.slice(0, n_closed))
+        df = self.frame(coin, interval, int(candles.timestamp[0]), int(candles.timestamp[n_closed - 1]), skip) if n_closed else pd.DataFrame()
+
+        if n_closed < len(candles):
+            df = self._with_live(df, coin, interval, candles.slice(n_closed), max(skip - n_closed, 0))
+        return df
+
+    def _with_live(self, df, coin, interval, live_candles, skip=0):
+        """
+        Append forming bar(s): computed on top of the store, never persisted.
+        """
+        live = self._features(coin, interval, self.meta(coin, interval), live_candles).iloc[skip:]
+        return _concat_live(df, live) if len(live) else df
+
+    # --- Shared (multi-worker) mode ---
+
+    def refresh(self, coin, interval, days=None):
+        """
+        Fetch from the exchange, append closed bars and publish the forming bar to live.json.
+        days=None fetches just enough to cover the gap since the stored last bar.
+        """
+        step = INTERVAL_MS.get(interval, INTERVAL_MS["1h"])
+        meta = self.meta(coin, interval)
+        if days is None:
+            gap = time.time() * 1000 - meta["last_ts"] if meta else 30 * DAY_MS
+            days = min(30, max(gap + 2 * step, 3 * step) / DAY_MS)
+
+        candles = market_data.fetch_candle_arrays(coin, interval, days=days)
+        if candles.empty:
+            return False
+        n_closed = _n_closed(candles, int(time.time() * 1000))
+        self.append(candles.slice(0, n_closed))
+
+        live = {name: arr[n_closed:].tolist() for name, arr in candles.columns().items()}
+        live["fetched_at"] = time.time()
+        path = self._dir(coin, interval)
+        os.makedirs(path, exist_ok=True) # no closed bar appended yet
+        tmp = os.path.join(path, "live.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(live, f)
+        os.replace(tmp, os.path.join(path, "live.json"))
+        return True
+
+    def read_live(self, coin, interval):
+        try:
+            with open(os.path.join(self._dir(coin, interval), "live.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def version(self, coin, interval):
+        """
+        (first_ts, last_ts, rows, fetched_at) - changes whenever the fetcher publishes; None if never fetched.
+        """
+        meta = self.meta(coin, interval)
+        live = self.read_live(coin, interval)
+        if meta is None or live is None:
+            return None
+        return (meta["first_ts"], meta["last_ts"], meta["rows"], live["fetched_at"])
+
+    def window(self, coin, interval, days=30, skip=0):
+        """
+        The last `days` of stored (closed) bars minus the first `skip`, zero-copy - see frame().
+        """
+        now_ms = int(time.time() * 1000)
+        return self.frame(coin, interval, now_ms - days * DAY_MS, skip=skip)
+
+    def live_features(self, coin, interval):
+        """
+        Features of the published forming bar(s), or None when there is none past the store.
+        """
+        live = self.read_live(coin, interval)
+        meta = self.meta(coin, interval)
+        if not live or not meta or not live["timestamp"]:
+            return None
+        ts = np.array(live["timestamp"], dtype=np.int64)
+        keep = ts > meta["last_ts"]
+        if not keep.any():
+            return None
+        cols = {name: np.array(live[name], dtype=np.float64)[keep] for name in OHLCV_COLUMNS}
+        return self._features(coin, interval, meta, CandleArrays(ts[keep], coin=coin.upper(), interval=interval, **cols))
+
+
+def _n_closed(candles, now_ms=None):
+    """
+    Number of leading bars of `candles` that have closed by now_ms (default: now).
+    """
+    step = INTERVAL_MS.get(candles.interval, INTERVAL_MS["1h"])
+    if now_ms is None:
+        now_ms = int(pd.Timestamp.now(tz='UTC').value // 1_000_000)
+    return int(np.searchsorted(candles.timestamp + step, now_ms, side='right'))
+
+
+def _concat_live(df, live):
+    """
+    Stored frame + forming-bar features (keeps the stored frame's attrs).
+    """
+    live = live.reindex(columns=df.columns) if not df.empty else live
+    attrs = dict(df.attrs)
+    df = pd.concat([df, live], ignore_index=True) if not df.empty else live.reset_index(drop=True)
+    df.attrs.update(attrs)
+    return df
+
+
+_store = None
+_frames = {} # (COIN, interval, days) -> (CandleArrays or closed-bar version, feature frame)
+_live_frames = {} # shared mode: (COIN, interval) -> (fetched_at, forming-bar features)
+_synthetic_frames = OrderedDict() # (COIN, interval, days) -> features, LRU of SYNTHETIC_CACHE_SIZE
+
+# Synthetic markets (SYNTH-<scenario>-<seed>) are named by the client, so they never touch
+# the disk store and only the most recent few stay in memory
+SYNTHETIC_CACHE_SIZE = 16
+_frames_lock = threading.Lock()
+_candle_flight = singleflight.group("candles") # shared with market_data.get_candle_arrays
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = FeatureStore()
+    return _store
+
+def _stale(version, days):
+    if version is None:
+        return True
+    first_ts, _, _, fetched_at = version
+    return time.time() - fetched_at > SHARED_MAX_AGE or first_ts > time.time() * 1000 - days * DAY_MS + DAY_MS
+
+def _shared_features(coin, interval, days):
+    """
+    Multi-worker read path: the store is the cache; fetch only if the fetcher has fallen behind.
+    """
+    store = get_store()
+    version = store.version(coin, interval)
+    if _stale(version, days):
+        def fetch():
+            with store.fetch_lock(coin, interval):
+                # Another process may have refreshed it while we waited for the lock
+                if _stale(store.version(coin, interval), days):
+                    store.refresh(coin, interval, days)
+        # Threads of this worker share one fetch; the flock covers the other workers
+        _candle_flight.do((coin.upper(), interval, days), fetch)
+        version = store.version(coin, interval)
+        if version is None:
+            return pd.DataFrame()
+
+    # Closed bars: zero-copy memmap frame, rebuilt only when the fetcher appends bars
+    key = (coin.upper(), interval, days)
+    closed_version = version[:3]
+    with _frames_lock:
+        hit = _frames.get(key)
+    if hit is not None and hit[0] == closed_version:
+        closed = hit[1]
+    else:
+        closed = store.window(coin, interval, days, WARMUP_BARS)
+        with _frames_lock:
+            _frames[key] = (closed_version, closed)
+
+    # Forming bar: a few rows, recomputed per fetcher pass
+    live_key = (coin.upper(), interval)
+    with _frames_lock:
+        hit = _live_frames.get(live_key)
+    if hit is not None and hit[0] == version:
+        live = hit[1]
+    else:
+        live = store.live_features(coin, interval)
+        with _frames_lock:
+            _live_frames[live_key] = (version, live)
+
+    # The combined frame is built per call and not cached, so each worker only ever
+    # holds the shared pages plus the requests it is serving
+    return _concat_live(closed, live) if live is not None else closed
+
+def _synthetic_features(coin, interval, days):
+    """
+    Generated candles + indicators, computed in memory (deterministic per name, so cacheable).
+    """
+    key = (coin.upper(), interval, days)
+    with _frames_lock:
+        df = _synthetic_frames.get(key)
+        if df is not None:
+            _synthetic_frames.move_to_end(key)
+            return df
+
+    candles = market_data.fetch_candle_arrays(coin, interval, days=days)
+    df = backtester.calculate_indicators(candles) if not candles.empty else pd.DataFrame()
+    with _frames_lock:
+        _synthetic_frames[key] = df
+        while len(_synthetic_frames) > SYNTHETIC_CACHE_SIZE:
+            _synthetic_frames.popitem(last=False)
+    return df
+
+def get_features(coin, interval="1h", days=30):
+    """
+    market_data.get_candle_arrays plus every calculate_indicators column, served from the store
+    (without the first WARMUP_BARS bars, like calculate_indicators(...).dropna() on the window).
+    Recomputes nothing while the cached candles are unchanged; shared between callers - do not mutate.
+    Coins that are not plain tickers and unknown intervals get an empty frame.
+    """
+    if synthetic.is_synthetic_market(coin):
+        return _synthetic_features(coin, interval, days)
+    if not COIN_RE.match(coin.upper()) or interval not in INTERVAL_MS:
+        return pd.DataFrame()
+    if SHARED:
+        return _shared_features(coin, interval, days)
+
+    candles = market_data.get_candle_arrays(coin, interval, days=days)
+    if candles.empty:
+        return pd.DataFrame()
+
+    key = (coin.upper(), interval, days)
+    with _frames_lock:
+        hit = _frames.get(key)
+    if hit is not None and hit[0] is candles:
+        return hit[1]
+
+    try:
+        df = get_store().sync(candles, skip=WARMUP_BARS)
+    except OSError as e:
+        print(f"Error updating feature store for {coin}: {e}")
+        df = backtester.calculate_indicators(candles).iloc[WARMUP_BARS:].reset_index(drop=True)
+
+    with _frames_lock:
+        _frames[key] = (candles, df)
+    return df
+
+def get_features_many(coins, interval="1h", days=30, workers=8):
+    """
+    get_features for several coins; network bound, so threads.
+    Coins the store has not seen yet are fetched first and their indicators computed in one
+    indicators.batch_features pass (instead of one calculate_indicators run each) and persisted,
+    so the get_features calls that follow only read the store.
+    Returns {coin: feature frame} in the order of `coins`; a coin that fails to fetch gets an empty frame.
+    """
+    coins = list(coins)
+    if not coins:
+        return {}
+    store = get_store()
+    fresh = [] if SHARED or interval not in INTERVAL_MS else [
+        c for c in coins
+        if not synthetic.is_synthetic_market(c) and COIN_RE.match(c.upper()) and store.meta(c, interval) is None
+    ]
+
+    def guarded(fetch):
+        def run(coin):
+            try:
+                return fetch(coin)
+            except Exception as e:
+                print(f"Error fetching {coin}: {e}")
+                return pd.DataFrame()
+        return run
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(coins)))) as pool:
+        if len(fresh) > 1:
+            fetched = pool.map(guarded(lambda c: market_data.get_candle_arrays(c, interval, days=days)), fresh)
+            closed = {}
+            for coin, candles in zip(fresh, fetched):
+                if len(candles) == 0:
+                    continue
+                n = _n_closed(candles)
+                if n:
+                    closed[coin] = candles.slice(0, n)
+            try:
+                for coin, feats in indicators.batch_features(closed).items():
+                    store.append(closed[coin], feats)
+            except OSError as e:
+                print(f"Error updating feature store: {e}")
+
+        frames = list(pool.map(guarded(lambda c: get_features(c, interval, days)), coins))
+    return dict(zip(coins, frames))
@@ -0,0 +1,40 @@
+import os
+import time
+
+import feature_store
+import synthetic
+from warmup import WARMUP_MARKETS, WARMUP_TIMEFRAME
+
+# Single market-data fetcher for multi-worker serving (serve.py). It keeps every series in the
+# feature store current - closed bars appended to the column files, the forming bar published
+# in live.json - so the web workers only memory-map the same pages instead of each holding
+# its own candle cache and indicator frames.
+
+FETCH_INTERVAL = float(os.getenv("FETCH_INTERVAL", "30"))
+
+
+def refresh_all(store):
+    """
+    One pass over every stored series plus the warmup markets.
+    """
+    series = set(store.series()) | {(coin, WARMUP_TIMEFRAME) for coin in WARMUP_MARKETS}
+    for coin, interval in sorted(series):
+        if synthetic.is_synthetic_market(coin):
+            continue
+        try:
+            with store.fetch_lock(coin, interval):
+                store.refresh(coin, interval)
+        except Exception as e:
+            print(f"Error refreshing {coin} {interval}: {e}")
+
+
+def run(interval=FETCH_INTERVAL):
+    store = feature_store.get_store()
+    while True:
+        t0 = time.monotonic()
+        refresh_all(store)
+        time.sleep(max(1.0, interval - (time.monotonic() - t0)))
+
+
+if __name__ == "__main__":
+    run()
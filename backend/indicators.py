@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+import backtester
+import patterns
+from candles import INTERVAL_MS
+
+# Batch (cross-asset) versions of backtester.calculate_indicators.
+# Every function takes a (coins x bars) float matrix and works along the time axis (axis=1)
+# for all coins at once. Ragged histories are NaN-padded: bars before a coin's first valid
+# close stay NaN in every output, interior gaps are carried forward from the last close.
+
+EMA_BLOCK = 128 # bars per matmul block in ema_matrix
+
+
+def _first_valid(X):
+    """
+    Index of the first non-NaN bar per row (T for all-NaN rows).
+    """
+    valid = ~np.isnan(X)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), X.shape[1])
+
+
+def _ffill(X):
+    """
+    Forward-fill NaNs along axis 1; the leading NaN run takes the first valid value.
+    """
+    T = X.shape[1]
+    valid = ~np.isnan(X)
+    idx = np.where(valid, np.arange(T), -1)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    first = _first_valid(X)
+    idx = np.where(idx < 0, np.minimum(first, T - 1)[:, None], idx)
+    return np.take_along_axis(X, idx, axis=1)
+
+
+def _warmup_mask(out, start, warmup):
+    """
+    NaN out the first `warmup` bars of each row's own history (and its NaN prefix).
+    """
+    T = out.shape[1]
+    out[np.arange(T)[None, :] < (start + warmup)[:, None]] = np.nan
+    return out
+
+
+def ema_matrix(X, span, start=None):
+    """
+    EMA (pandas ewm(span, adjust=False)) of every row.
+    The recursion is evaluated block-wise as a lower-triangular matmul, so the Python
+    loop runs T / EMA_BLOCK times regardless of the number of coins.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    N, T = X.shape
+    if start is None:
+        start = _first_valid(X)
+    filled = _ffill(X)
+
+    a = 2.0 / (span + 1.0)
+    beta = 1.0 - a
+    B = min(EMA_BLOCK, T)
+    k = np.arange(B)
+    lag = k[:, None] - k[None, :]
+    W = np.where(lag >= 0, a * beta ** np.maximum(lag, 0), 0.0) # W[i, j] weight of x_j in ema_i
+    decay = beta ** (k + 1) # weight of the previous block's last ema
+
+    # Time-major copy so every block is a contiguous (B x N) slab
+    XT = np.ascontiguousarray(filled.T)
+    outT = np.empty_like(XT)
+    prev = XT[0].copy() # seeding with x_0 makes ema_0 == x_0 (adjust=False)
+    for s in range(0, T, B):
+        blk = XT[s:s + B]
+        b = blk.shape[0]
+        res = W[:b, :b] @ blk + decay[:b, None] * prev[None, :]
+        outT[s:s + b] = res
+        prev = res[-1]
+    out = outT.T.copy()
+
+    return _warmup_mask(out, start, 0)
+
+
+def rolling_mean_matrix(X, window, start=None):
+    """
+    Rolling mean (pandas rolling(window).mean()) of every row via cumulative sums.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if start is None:
+        start = _first_valid(X)
+    filled = np.nan_to_num(_ffill(X))
+    cs = np.concatenate([np.zeros((X.shape[0], 1)), np.cumsum(filled, axis=1)], axis=1)
+    out = np.full_like(filled, np.nan)
+    out[:, window - 1:] = (cs[:, window:] - cs[:, :-window]) / window
+    return _warmup_mask(out, start, window - 1)
+
+
+def rolling_std_matrix(X, window, start=None):
+    """
+    Rolling sample std (ddof=1, as pandas) of every row.
+    Rows are centered first so the sum-of-squares trick keeps its precision at BTC price levels.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if start is None:
+        start = _first_valid(X)
+    filled = _ffill(X)
+    filled = np.nan_to_num(filled - np.nanmean(filled, axis=1, keepdims=True))
+
+    zeros = np.zeros((X.shape[0], 1))
+    cs = np.concatenate([zeros, np.cumsum(filled, axis=1)], axis=1)
+    cs2 = np.concatenate([zeros, np.cumsum(filled * filled, axis=1)], axis=1)
+    s1 = cs[:, window:] - cs[:, :-window]
+    s2 = cs2[:, window:] - cs2[:, :-window]
+    var = (s2 - s1 * s1 / window) / (window - 1)
+
+    out = np.full_like(filled, np.nan)
+    out[:, window - 1:] = np.sqrt(np.maximum(var, 0))
+    return _warmup_mask(out, start, window - 1)
+
+
+def rsi_matrix(close, period=14, start=None):
+    """
+    RSI with simple rolling averages of gains/losses (matches calculate_indicators).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if start is None:
+        start = _first_valid(close)
+    filled = _ffill(close)
+    delta = np.diff(filled, axis=1, prepend=filled[:, :1]) # first delta = 0, like pandas' where(..., 0)
+    gain = rolling_mean_matrix(np.maximum(delta, 0), period, start)
+    loss = rolling_mean_matrix(np.maximum(-delta, 0), period, start)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + gain / loss))
+    return rsi
+
+
+def batch_indicators(close, high=None, low=None):
+    """
+    calculate_indicators columns for a (coins x bars) close matrix.
+    Returns dict of column name -> (coins x bars) float64 array, NaN during warm-up.
+    The pattern columns (pivot_low/high, rsi_*_div) also need high and low matrices of the
+    same shape and are only included when both are given.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if close.ndim == 1:
+        close = close[None, :]
+    start = _first_valid(close)
+
+    out = {}
+    out['rsi'] = rsi_matrix(close, 14, start)
+    for span in (9, 21, 50, 200):
+        out[f'ema_{span}'] = ema_matrix(close, span, start)
+    out['sma_99'] = rolling_mean_matrix(close, 99, start)
+
+    out['std_20'] = rolling_std_matrix(close, 20, start)
+    out['bollinger_upper'] = out['ema_21'] + out['std_20'] * 2
+    out['bollinger_lower'] = out['ema_21'] - out['std_20'] * 2
+
+    out['ema_12'] = ema_matrix(close, 12, start)
+    out['ema_26'] = ema_matrix(close, 26, start)
+    macd = out['ema_12'] - out['ema_26']
+    out['macd'] = macd
+    out['macd_signal'] = ema_matrix(macd, 9, start)
+    out['macd_hist'] = macd - out['macd_signal']
+
+    # close itself is NaN at gaps, so these stay NaN there
+    out['dist_ema50'] = (close - out['ema_50']) / out['ema_50']
+    out['dist_ema200'] = (close - out['ema_200']) / out['ema_200']
+    bb_range = out['bollinger_upper'] - out['bollinger_lower']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bb_pos = (close - out['bollinger_lower']) / bb_range
+    out['bb_pos'] = np.where(bb_range != 0, bb_pos, 0.5)
+
+    if high is not None and low is not None:
+        out.update(_batch_patterns(np.asarray(high, dtype=np.float64).reshape(close.shape),
+                                   np.asarray(low, dtype=np.float64).reshape(close.shape), out['rsi']))
+    return out
+
+
+def _batch_patterns(high, low, rsi):
+    """
+    Pattern flags (0/1) per coin row; NaN bars are never pivots.
+    """
+    out = {name: np.zeros(high.shape) for name in ('pivot_low', 'pivot_high', 'rsi_bull_div',
+                                                    'rsi_hidden_bull_div', 'rsi_bear_div', 'rsi_hidden_bear_div')}
+    for r in range(high.shape[0]):
+        out['pivot_low'][r] = patterns.pivot_lows(low[r])
+        out['pivot_high'][r] = patterns.pivot_highs(high[r])
+        for name, flags in patterns.divergences(low[r], high[r], rsi[r]).items():
+            out[f'rsi_{name}_div'][r] = flags
+    return out
+
+
+def stack_frames(frames, column='close'):
+    """
+    Align {coin: candle DataFrame} on the union of timestamps.
+    Returns (coins, timestamps, matrix) with NaN where a coin has no bar.
+    """
+    coins = list(frames)
+    series = [frames[c].set_index('timestamp')[column] for c in coins]
+    wide = pd.concat(series, axis=1, keys=coins).sort_index()
+    return coins, wide.index, wide.to_numpy(dtype=np.float64).T
+
+
+def batch_features(candles):
+    """
+    calculate_indicators for {key: CandleArrays} of one interval, as {key: feature DataFrame}.
+    Gap-free histories that end on the same bar share one batch_indicators pass (shorter ones
+    are left-padded with NaN, which only adds warm-up); any other history is computed alone.
+    """
+    out = {}
+    groups = {}
+    for key, c in candles.items():
+        if c.empty:
+            continue
+        step = INTERVAL_MS.get(c.interval)
+        if step and (np.diff(c.timestamp) == step).all():
+            groups.setdefault(int(c.timestamp[-1]), []).append(key)
+        else:
+            out[key] = backtester.calculate_indicators(c)
+
+    for keys in groups.values():
+        if len(keys) == 1:
+            out[keys[0]] = backtester.calculate_indicators(candles[keys[0]])
+            continue
+        frames = {key: candles[key].to_frame() for key in keys}
+        _, _, close = stack_frames(frames, 'close')
+        _, _, high = stack_frames(frames, 'high')
+        _, _, low = stack_frames(frames, 'low')
+        cols = batch_indicators(close, high, low)
+        for r, key in enumerate(keys):
+            df = frames[key]
+            n = len(df)
+            for name, matrix in cols.items():
+                df[name] = matrix[r, matrix.shape[1] - n:]
+            out[key] = df
+    return out
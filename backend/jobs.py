@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# SQLite file for job state/results and the worker pool size.
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOBS_MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a running job (from its report callback) once cancel() was requested.
+    """
+    pass
+
+
+def _process_token(pid):
+    """
+    "<pid>:<start time>" - unlike the bare pid it is not reused by a later process.
+    Falls back to the pid where /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+        return f"{pid}:{stat.rsplit(')', 1)[1].split()[19]}"
+    except (OSError, IndexError):
+        return str(pid)
+
+
+def _owner_alive(owner):
+    """
+    Whether the process that owns a job (JobStore owner token) is still running.
+    """
+    if not owner:
+        return False
+    try:
+        pid = int(owner.split(":", 1)[0])
+    except ValueError:
+        return False
+    if ":" in owner:
+        return _process_token(pid) == owner
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs. One short-lived connection per call so it is
+    safe to use from the worker threads and the event loop alike.
+    Several processes (serve.py workers) can share one database: every job records the
+    process that runs it, and cancellation is a persisted flag the owner polls.
+    """
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    request TEXT,
+                    progress REAL DEFAULT 0,
+                    partial TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL,
+                    updated_at REAL,
+                    owner TEXT,
+                    cancel_requested INTEGER DEFAULT 0
+                )
+            """)
+            # Databases created before owner / cancel_requested existed
+            existing = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in existing:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "cancel_requested" not in existing:
+                db.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER DEFAULT 0")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def create(self, job_id, kind, request, owner=None):
+        now = time.time()
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, request, created_at, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(request), now, now, owner)
+            )
+
+    def _transition(self, job_id, status, where):
+        """
+        Conditional status change; True if this call made it (so racing processes agree).
+        """
+        with self._lock, self._connect() as db:
+            cur = db.execute(
+                f"UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND {where}",
+                (status, time.time(), job_id)
+            )
+            return cur.rowcount == 1
+
+    def start(self, job_id):
+        return self._transition(job_id, RUNNING, f"status = '{QUEUED}' AND cancel_requested = 0")
+
+    def cancel_queued(self, job_id):
+        return self._transition(job_id, CANCELLED, f"status = '{QUEUED}'")
+
+    def request_cancel(self, job_id):
+        """
+        Flag a queued/running job for cancellation. False if unknown or already finished.
+        """
+        with self._lock, self._connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN (?, ?)",
+                (job_id, QUEUED, RUNNING)
+            )
+            return cur.rowcount == 1
+
+    def cancel_requested(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def update(self, job_id, **fields):
+        for key in ("partial", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key], default=str)
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._connect() as db:
+            db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("request", "partial", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def list(self, limit=50):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT id, kind, status, progress, error, created_at, updated_at FROM jobs ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def fail_interrupted(self):
+        """
+        Jobs left queued/running by a process that is gone can never finish.
+        Jobs of live processes (other workers on the same database) are left alone.
+        """
+        with self._lock, self._connect() as db:
+            rows = db.execute("SELECT id, owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+            now = time.time()
+            db.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                [(FAILED, "Interrupted by server restart", now, job_id) for job_id, owner in rows if not _owner_alive(owner)]
+            )
+
+
+class JobManager:
+    """
+    Runs registered job functions on a bounded thread pool.
+    A job function has the signature fn(payload, report) where
+    report(progress 0..1, partial=None) persists progress and raises JobCancelled when cancelled.
+    Any manager on the same database can cancel a job; the owner sees it at the next report().
+    """
+
+    def __init__(self, store=None, max_workers=JOBS_MAX_WORKERS):
+        self.store = store or JobStore()
+        self.owner = _process_token(os.getpid())
+        self.store.fail_interrupted()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._kinds = {}
+        self._stopping = threading.Event()
+
+    def register(self, kind, fn):
+        self._kinds[kind] = fn
+
+    @property
+    def kinds(self):
+        return list(self._kinds)
+
+    def submit(self, kind, payload):
+        if kind not in self._kinds:
+            raise ValueError(f"Unknown job kind '{kind}'. Options: {', '.join(self._kinds)}")
+
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, kind, payload, owner=self.owner)
+        self._pool.submit(self._run, job_id, kind, payload)
+        return job_id
+
+    def cancel(self, job_id):
+        """
+        Request cancellation. Queued jobs never start; running jobs stop at their next report().
+        Returns False if the job is unknown or already finished.
+        """
+        if not self.store.request_cancel(job_id):
+            return False
+        self.store.cancel_queued(job_id)
+        return True
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job_id, kind, payload):
+        try:
+            # Cancelled while queued (by any process): never start
+            if self._stopping.is_set() or not self.store.start(job_id):
+                return
+
+            def report(progress, partial=None):
+                if self._stopping.is_set() or self.store.cancel_requested(job_id):
+                    raise JobCancelled()
+                fields = {"progress": round(float(progress), 4)}
+                if partial is not None:
+                    fields["partial"] = partial
+                self.store.update(job_id, **fields)
+
+            result = self._kinds[kind](payload, report)
+            if isinstance(result, dict) and result.get("error"):
+                # Job functions report "No Data" and the like as {"error": ...}
+                self.store.update(job_id, status=FAILED, error=str(result["error"]), result=result)
+            else:
+                self.store.update(job_id, status=DONE, progress=1.0, result=result)
+        except JobCancelled:
+            self.store.update(job_id, status=CANCELLED)
+        except Exception as e:
+            print(f"Error in job {job_id} ({kind}): {e}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+
+    def shutdown(self):
+        self._stopping.set()
+        self._pool.shutdown(wait=False)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """
+    Process-wide JobManager, created on first use.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+import jobs
+from backtest_api import BacktestRequest, run_scan, run_optimize, run_train, run_evolve
+
+router = APIRouter()
+
+# How often the SSE stream polls the job store
+EVENT_POLL_SECONDS = 0.5
+
+# Every JobStore call is a blocking sqlite query, so handlers run them via asyncio.to_thread
+
+JOB_FUNCTIONS = {
+    "optimize": run_optimize,
+    "scan": run_scan,
+    "train": run_train,
+    "evolve": run_evolve,
+}
+
+
+def _manager():
+    manager = jobs.get_manager()
+    for kind, fn in JOB_FUNCTIONS.items():
+        if kind not in manager.kinds:
+            manager.register(kind, lambda payload, report, fn=fn: fn(BacktestRequest(**payload), report))
+    return manager
+
+
+@router.post("/{kind}")
+async def submit_job(kind: str, req: BacktestRequest):
+    """
+    Queue an optimize/scan/train/evolve run. Returns immediately with the job id.
+    """
+    if kind not in JOB_FUNCTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind '{kind}'")
+    job_id = await asyncio.to_thread(lambda: _manager().submit(kind, req.model_dump()))
+    return {"job_id": job_id, "status": jobs.QUEUED}
+
+
+@router.get("")
+async def list_jobs(limit: int = 50):
+    return {"jobs": await asyncio.to_thread(lambda: _manager().store.list(limit))}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """
+    Current status, progress, best partial result and (when done) the persisted result.
+    """
+    job = await asyncio.to_thread(lambda: _manager().get(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    if not await asyncio.to_thread(lambda: _manager().cancel(job_id)):
+        raise HTTPException(status_code=409, detail="Job not found or already finished")
+    return {"job_id": job_id, "cancelling": True}
+
+
+async def _job_events(job_id):
+    manager = await asyncio.to_thread(_manager)
+    last = None
+    while True:
+        job = await asyncio.to_thread(manager.get, job_id)
+        if job is None:
+            yield f"event: error\ndata: {json.dumps({'message': 'Job not found'})}\n\n"
+            return
+
+        snapshot = (job["status"], job["progress"], job["updated_at"])
+        if snapshot != last:
+            last = snapshot
+            event = "result" if job["status"] in jobs.FINISHED_STATES else "progress"
+            payload = {k: job[k] for k in ("id", "kind", "status", "progress", "partial", "error")}
+            if event == "result":
+                payload["result"] = job["result"]
+            yield f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+            if event == "result":
+                return
+
+        await asyncio.sleep(EVENT_POLL_SECONDS)
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events: 'progress' on every change, then one final 'result'.
+    """
+    return StreamingResponse(_job_events(job_id), media_type="text/event-stream")
@@ -0,0 +1,31 @@
+import importlib
+
+# Route modules reference the data stack (pandas/numpy, feature store, backtester) through
+# LazyModule so importing main only pays for FastAPI; the real import happens on the first
+# attribute access, i.e. the first request that needs it (or warmup.py, whichever is first).
+
+
+class LazyModule:
+    __slots__ = ('_name', '_module')
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        # import_module takes the per-module import lock, so concurrent first uses are safe
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
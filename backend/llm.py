@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrency / timeout knobs for outbound LLM calls
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "128"))
+
+
+class LLMError(Exception):
+    """
+    Backend returned an error response (non-200, empty output, ...).
+    """
+    pass
+
+
+# --- Backends ---
+
+class LLMBackend:
+    """
+    Minimal interface: complete(messages, timeout) -> assistant text.
+    complete() is blocking; chat code runs it off the event loop via complete_async().
+    Backends pass `timeout` (seconds) to their HTTP client so a slow call ends its thread.
+    """
+    name = "base"
+
+    def complete(self, messages, timeout=None):
+        raise NotImplementedError
+
+
+class DashScopeBackend(LLMBackend):
+    """
+    Alibaba Cloud Qwen via DashScope.
+    """
+    name = "dashscope"
+
+    def __init__(self, model=None, api_key=None):
+        import dashscope
+        from dashscope import Generation
+
+        dashscope.api_key = api_key or os.getenv("DASHSCOPE_API_KEY")
+        self._generation = Generation
+        self.model = model or Generation.Models.qwen_turbo
+
+    def complete(self, messages, timeout=None):
+        kwargs = {"request_timeout": timeout} if timeout else {}
+        response = self._generation.call(
+            self.model,
+            messages=messages,
+            result_format='message',  # set the result to be "message" format.
+            **kwargs
+        )
+        if response.status_code != 200:
+            raise LLMError(f"{response.code} - {response.message}")
+        return response.output.choices[0].message.content
+
+
+class FakeBackend(LLMBackend):
+    """
+    Local deterministic model for tests / offline development.
+    Answers strategy-ish prompts with a fixed RSI strategy, anything else with strategy=null.
+    """
+    name = "fake"
+
+    STRATEGY_WORDS = ("strategy", "buy", "sell", "rsi", "ema", "macd", "trade", "long", "short")
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def complete(self, messages, timeout=None):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.delay:
+                # Like an HTTP client with a read timeout: give up after `timeout`
+                time.sleep(min(self.delay, timeout) if timeout else self.delay)
+                if timeout and self.delay > timeout:
+                    raise TimeoutError("request timed out")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+        user_msg = messages[-1]['content'].lower()
+        if not any(w in user_msg for w in self.STRATEGY_WORDS):
+            return json.dumps({"text": "Hi! Describe a trading idea and I will build a strategy.", "strategy": None})
+
+        market = "ETH-PERP" if "eth" in user_msg else "BTC-PERP"
+        return json.dumps({
+            "text": "RSI mean reversion: buy oversold, sell overbought.",
+            "strategy": {
+                "name": "RSI Reversion",
+                "description": "Buys when RSI(14) < 30 and sells when RSI(14) > 70.",
+                "market": market,
+                "timeframe": "1h",
+                "indicators": [{"id": "rsi_1", "type": "RSI", "params": {"length": 14, "source": "close"}}],
+                "rules": [
+                    {"condition": "rsi_1 < 30", "action": "BUY"},
+                    {"condition": "rsi_1 > 70", "action": "SELL"}
+                ],
+                "risk": {"stop_loss_pct": 2.0, "take_profit_pct": 5.0, "max_leverage": 1, "position_size_pct": 10.0}
+            }
+        })
+
+
+BACKENDS = {
+    "dashscope": DashScopeBackend,
+    "fake": FakeBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Backend selected by LLM_BACKEND (default: dashscope). Built on first use.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.getenv("LLM_BACKEND", "dashscope").lower()
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown LLM_BACKEND '{name}'. Options: {', '.join(BACKENDS)}")
+            _backend = BACKENDS[name]()
+        return _backend
+
+
+def set_backend(backend):
+    """
+    Swap the active backend (e.g. FakeBackend() in tests).
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    _response_cache.clear()
+
+
+# --- Limiter ---
+
+# Dedicated pool: its size is the real bound on in-flight backend calls (a call that timed
+# out keeps its thread until the provider's own timeout ends it), and slow LLM calls never
+# occupy the default executor that backtests use via asyncio.to_thread.
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+
+async def complete_async(messages, timeout=LLM_TIMEOUT_SECONDS):
+    """
+    Run backend.complete on the LLM pool, at most LLM_MAX_CONCURRENCY at a time.
+    Raises asyncio.TimeoutError after `timeout` seconds; the backend gets the same timeout.
+    """
+    backend = get_backend()
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(_executor, backend.complete, messages, timeout), timeout)
+
+
+# --- Response cache ---
+
+def normalize_message(message):
+    """
+    Cache key for a user prompt: case and whitespace insensitive.
+    """
+    return re.sub(r"\s+", " ", message.strip().lower())
+
+
+class ResponseCache:
+    """
+    Small LRU of parsed chat responses keyed by normalized user message.
+    """
+
+    def __init__(self, max_entries=LLM_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, message):
+        key = normalize_message(message)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, message, value):
+        key = normalize_message(message)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_response_cache = ResponseCache()
+
+
+def get_response_cache():
+    return _response_cache
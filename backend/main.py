@@ -1,9 +1,23 @@
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+# Load environment variables before any module reads its settings
+load_dotenv()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import chat
 import backtest_api 
+import jobs_api
+import warmup
 
-app = FastAPI(title="HyperQuant API")
+@asynccontextmanager
+async def lifespan(app):
+    # Heavy imports + cache fills run in the background; /health answers immediately
+    warmup.start()
+    yield
+
+app = FastAPI(title="HyperQuant API", lifespan=lifespan)
 
 # Configure CORS for local development
 app.add_middleware(
@@ -16,6 +30,7 @@ app.add_middleware(
 
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
 app.include_router(backtest_api.router, prefix="/api/backtest", tags=["Backtest"])
+app.include_router(jobs_api.router, prefix="/api/jobs", tags=["Jobs"])
 
 @app.get("/")
 def read_root():
@@ -24,3 +39,10 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/ready")
+def readiness():
+    """
+    Warmup progress (state: idle / running / done / disabled).
+    """
+    return warmup.status()
@@ -1,64 +1,171 @@
+import os
+import threading
+from collections import OrderedDict
 import requests
 import pandas as pd
+import numpy as np
 import time
 from datetime import datetime, timedelta
+from candles import CandleArrays, INTERVAL_MS
+import synthetic
+import singleflight
 
 HYPERLIQUID_API_URL = "https://api.hyperliquid.xyz/info"
 
-def fetch_candles(coin: str, interval: str = "1h", limit: int = 500):
+# Seconds a fetched candle history stays warm for get_candle_arrays / get_candles
+CANDLE_CACHE_TTL = float(os.getenv("CANDLE_CACHE_TTL", "60"))
+# Most recently used histories kept (keys come from request input, so the cache is bounded)
+CANDLE_CACHE_SIZE = int(os.getenv("CANDLE_CACHE_SIZE", "64"))
+
+# Hyperliquid returns at most this many candles per candleSnapshot request
+MAX_CANDLES_PER_REQUEST = 5000
+
+_candle_cache = OrderedDict() # (COIN, interval, days) -> (fetched_at, read-only CandleArrays), LRU
+_candle_cache_lock = threading.Lock()
+_candle_flight = singleflight.group("candles")
+
+def _fetch_snapshot(coin: str, interval: str, days: int = 30):
     """
-    Fetches candle data from Hyperliquid.
-    Hyperliquid uses 'coin' (e.g., 'BTC') and resolution string.
+    Raw candleSnapshot JSON for the last `days` days ([] on failure).
+    Longer histories are fetched in MAX_CANDLES_PER_REQUEST pages, oldest first.
     """
     # Map common intervals to HL resolution
     # HL expects: "15m", "1h", "4h", "1d" etc.
     
     headers = {'Content-Type': 'application/json'}
     
-    # Snapshot requires end time. 
-    # Logic: Fetch snapshots backwards if needed, but for MVP 1 snapshot is ~5000 candles usually.
     # Hyperliquid API params: {"type": "candleSnapshot", "req": {"coin": "BTC", "interval": "1h", "startTime": <ms>, "endTime": <ms>}}
     
     end_time = int(time.time() * 1000)
-    start_time = int((datetime.now() - timedelta(days=30)).timestamp() * 1000) # Last 30 days
+    start_time = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
+    page_ms = MAX_CANDLES_PER_REQUEST * INTERVAL_MS.get(interval, INTERVAL_MS["1h"])
     
-    payload = {
-        "type": "candleSnapshot",
-        "req": {
-            "coin": coin.upper(),
-            "interval": interval,
-            "startTime": start_time,
-            "endTime": end_time
+    data = []
+    page_start = start_time
+    while page_start < end_time:
+        page_end = min(page_start + page_ms, end_time)
+        payload = {
+            "type": "candleSnapshot",
+            "req": {
+                "coin": coin.upper(),
+                "interval": interval,
+                "startTime": page_start,
+                "endTime": page_end
+            }
         }
-    }
-    
-    try:
-        response = requests.post(HYPERLIQUID_API_URL, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        
-        # HL returns list of: { "t": 165..., "T": 165..., "s": "BTC", "i": "1h", "o": "123.4", "c": "125.6", "h": "126.0", "l": "120.0", "v": "1000", "n": 50 }
-        if not data:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(data)
         
-        # Rename and Convert
-        df['timestamp'] = pd.to_datetime(df['t'], unit='ms')
-        df['open'] = df['o'].astype(float)
-        df['high'] = df['h'].astype(float)
-        df['low'] = df['l'].astype(float)
-        df['close'] = df['c'].astype(float)
-        df['volume'] = df['v'].astype(float)
+        try:
+            response = requests.post(HYPERLIQUID_API_URL, json=payload, headers=headers)
+            response.raise_for_status()
+            page = response.json()
+        except Exception as e:
+            print(f"Error fetching data for {coin}: {e}")
+            return []
         
-        # Clean up
-        df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-        df.sort_values('timestamp', inplace=True)
-        return df
+        # Pages share their boundary candle
+        if data and page and page[0].get("t") == data[-1].get("t"):
+            page = page[1:]
+        data.extend(page or [])
+        page_start = page_end
+    return data
+
+def fetch_funding_history(coin: str, start_ms: int, end_ms: int = None):
+    """
+    Hourly funding rates [{"time": ms, "fundingRate": "0.0000125", ...}] ([] on failure).
+    Hyperliquid caps each response, so the window is walked from the last returned entry.
+    """
+    headers = {'Content-Type': 'application/json'}
+    end_ms = end_ms or int(time.time() * 1000)
+
+    data = []
+    cursor = start_ms
+    while cursor < end_ms:
+        payload = {"type": "fundingHistory", "coin": coin.upper(), "startTime": cursor, "endTime": end_ms}
+        try:
+            response = requests.post(HYPERLIQUID_API_URL, json=payload, headers=headers)
+            response.raise_for_status()
+            page = response.json()
+        except Exception as e:
+            print(f"Error fetching funding for {coin}: {e}")
+            break
+
+        if not page:
+            break
+        data.extend(page)
+        cursor = page[-1]["time"] + 1
+    return data
+
+def fetch_candle_arrays(coin: str, interval: str = "1h", dtype=np.float64, days: int = 30):
+    """
+    Fetches candles as a compact CandleArrays (int64 ms timestamps, float32/float64 OHLCV).
+    Use dtype=np.float32 when holding many asset histories in memory.
+    """
+    # Synthetic scenario markets (SYNTH-GBM, SYNTH-CRASH-7, ...) never hit the network
+    if synthetic.is_synthetic_market(coin):
+        try:
+            return synthetic.from_market_name(coin, interval, days).astype(dtype)
+        except ValueError as e:
+            print(f"Error generating synthetic candles for {coin}: {e}")
+            return CandleArrays.from_hyperliquid([], coin=coin.upper(), interval=interval, dtype=dtype)
+    
+    # HL returns list of: { "t": 165..., "T": 165..., "s": "BTC", "i": "1h", "o": "123.4", "c": "125.6", "h": "126.0", "l": "120.0", "v": "1000", "n": 50 }
+    data = _fetch_snapshot(coin, interval, days)
+    try:
+        return CandleArrays.from_hyperliquid(data, coin=coin.upper(), interval=interval, dtype=dtype)
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"Error parsing candles for {coin}: {e}")
+        return CandleArrays.from_hyperliquid([], coin=coin.upper(), interval=interval, dtype=dtype)
 
-    except Exception as e:
-        print(f"Error fetching data for {coin}: {e}")
+def fetch_candles(coin: str, interval: str = "1h", limit: int = 500, days: int = 30):
+    """
+    Fetches candle data from Hyperliquid.
+    Hyperliquid uses 'coin' (e.g., 'BTC') and resolution string.
+    """
+    candles = fetch_candle_arrays(coin, interval, days=days)
+    if candles.empty:
         return pd.DataFrame()
+    
+    # Columns: timestamp, open, high, low, close, volume (+ coin/interval in df.attrs)
+    return candles.to_frame()
+
+def get_candle_arrays(coin: str, interval: str = "1h", max_age: float = CANDLE_CACHE_TTL, days: int = 30):
+    """
+    fetch_candle_arrays with a short-lived in-process cache; concurrent misses are coalesced.
+    The cached history is the columnar CandleArrays itself (float64, read-only arrays) and is
+    shared between callers. Synthetic markets are generated per call and never cached.
+    """
+    if synthetic.is_synthetic_market(coin):
+        return fetch_candle_arrays(coin, interval, days=days)
+
+    key = (coin.upper(), interval, days)
+    now = time.time()
+    with _candle_cache_lock:
+        hit = _candle_cache.get(key)
+        if hit is not None and now - hit[0] < max_age:
+            _candle_cache.move_to_end(key)
+            return hit[1]
+    
+    def fetch():
+        candles = fetch_candle_arrays(coin, interval, days=days)
+        if not candles.empty:
+            for arr in candles.columns().values():
+                arr.setflags(write=False)
+            with _candle_cache_lock:
+                _candle_cache[key] = (now, candles)
+                _candle_cache.move_to_end(key)
+                while len(_candle_cache) > CANDLE_CACHE_SIZE:
+                    _candle_cache.popitem(last=False)
+        return candles
+    
+    # Concurrent misses for the same key share one Hyperliquid request
+    return _candle_flight.do(key, fetch)
+
+def get_candles(coin: str, interval: str = "1h", max_age: float = CANDLE_CACHE_TTL, days: int = 30):
+    """
+    get_candle_arrays as a fetch_candles style DataFrame, built per call on the cached arrays.
+    """
+    candles = get_candle_arrays(coin, interval, max_age, days)
+    return candles.to_frame() if not candles.empty else pd.DataFrame()
 
 if __name__ == "__main__":
     # Test
@@ -14,13 +14,14 @@ class Indicator(BaseModel):
 
 class Rule(BaseModel):
     condition: str # e.g., "RSI < 30" (Simplified for JSON, in reality needs AST or Structured)
-    action: str    # "BUY", "SELL", "CLOSE"
+    action: str    # "BUY", "SELL" (close long), "SHORT", "CLOSE"
 
 class RiskSettings(BaseModel):
     stop_loss_pct: float
     take_profit_pct: float
     max_leverage: int
     position_size_pct: float
+    allow_short: bool = False # SELL also opens a short (SHORT always does)
 
 class Strategy(BaseModel):
     name: str
@@ -0,0 +1,178 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+import backtester
+import patterns
+import feature_store
+from candles import INTERVAL_MS
+
+# ORACLE labeling + threshold learning for /train.
+# Labels are bar indices, so joining them to features is plain fancy indexing into the
+# (bars x features) matrix of calculate_indicators - no timestamp matching.
+
+# Request limits: every coin is one feature-store fetch, about one exchange call per 5000 bars
+MAX_MARKETS = 20
+MAX_BARS = 50_000 # per coin
+DAY_MS = 86_400_000
+FEATURES = ["rsi", "macd", "macd_hist", "dist_ema50", "dist_ema200", "bb_pos"]
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+
+def oracle_signals(high, low, close, lookahead=backtester.ORACLE_LOOKAHEAD, min_move=backtester.ORACLE_MIN_MOVE, start=1):
+    """
+    Vectorized backtester.strat_oracle: returns (buy_idx, sell_idx) of the trades
+    run_backtest would make with {"type": "ORACLE"} on the same (dropna'd) bars.
+    Only the few candidate bars go through the flat/long alternation loop.
+    """
+    n = len(close)
+    buys, sells = [], []
+    if n <= start:
+        return np.array(buys, dtype=np.int64), np.array(sells, dtype=np.int64)
+
+    m = n - lookahead # bars with a full future window [i, i + lookahead]
+    long = False
+    if m > 0:
+        buy_cand, sell_cand = patterns.window_swings(high, low, close, lookahead, min_move)
+        buy_cand[:start] = False
+        sell_cand[:start] = False
+
+        for i in np.flatnonzero(buy_cand | sell_cand):
+            if not long and buy_cand[i]:
+                buys.append(i)
+                long = True
+            elif long and sell_cand[i]:
+                sells.append(i)
+                long = False
+
+    # Close at end: first bar whose window runs past the data
+    if long:
+        sells.append(max(m, start))
+
+    return np.array(buys, dtype=np.int64), np.array(sells, dtype=np.int64)
+
+
+def label_asset(args):
+    """
+    Worker: indicators once over the full history, ORACLE labels per window.
+    args = (coin, candle frame, window_bars, step_bars); window_bars=None -> one window.
+    Returns feature rows at buy/sell labels and the label counts.
+    """
+    coin, df, window_bars, step_bars = args
+    feats = backtester.calculate_indicators(df).dropna()
+    n = len(feats)
+    if n == 0:
+        return {"coin": coin, "buy": np.empty((0, len(FEATURES))), "sell": np.empty((0, len(FEATURES))), "windows": 0}
+
+    X = feats[FEATURES].to_numpy(dtype=np.float64)
+    high = feats['high'].to_numpy(dtype=np.float64)
+    low = feats['low'].to_numpy(dtype=np.float64)
+    close = feats['close'].to_numpy(dtype=np.float64)
+
+    window_bars = window_bars or n
+    step_bars = step_bars or window_bars
+    buy_idx, sell_idx = [], []
+    windows = 0
+    for s in range(0, max(n - window_bars, 0) + 1, step_bars):
+        e = min(s + window_bars, n)
+        b, sl = oracle_signals(high[s:e], low[s:e], close[s:e])
+        buy_idx.append(b + s)
+        sell_idx.append(sl + s)
+        windows += 1
+
+    buy_idx = np.concatenate(buy_idx) if buy_idx else np.empty(0, dtype=np.int64)
+    sell_idx = np.concatenate(sell_idx) if sell_idx else np.empty(0, dtype=np.int64)
+    return {"coin": coin, "buy": X[buy_idx], "sell": X[sell_idx], "all": X, "windows": windows}
+
+
+def fit_stumps(pos, neg, features=FEATURES):
+    """
+    Best single-threshold rule per feature separating labeled bars (pos) from the rest (neg),
+    scored by Youden's J = TPR - FPR. One sort + cumsum per feature.
+    """
+    stumps = []
+    if len(pos) == 0 or len(neg) == 0:
+        return stumps
+    for f, name in enumerate(features):
+        vals = np.concatenate([pos[:, f], neg[:, f]])
+        is_pos = np.concatenate([np.ones(len(pos)), np.zeros(len(neg))])
+        order = np.argsort(vals, kind='stable')
+        vals, is_pos = vals[order], is_pos[order]
+        tpr = np.cumsum(is_pos) / len(pos) # share of positives <= threshold
+        fpr = np.cumsum(1 - is_pos) / len(neg)
+        j = tpr - fpr
+        k = int(np.argmax(np.abs(j)))
+        op = "<=" if j[k] > 0 else ">"
+        stumps.append({"feature": name, "op": op, "threshold": round(float(vals[k]), 6), "youden_j": round(float(abs(j[k])), 4)})
+    stumps.sort(key=lambda s: s["youden_j"], reverse=True)
+    return stumps
+
+
+def _quantiles(X):
+    if len(X) == 0:
+        return {}
+    q = np.quantile(X, QUANTILES, axis=0)
+    return {name: {f"q{int(p * 100)}": round(float(v), 6) for p, v in zip(QUANTILES, q[:, f])} for f, name in enumerate(FEATURES)}
+
+
+def train(frames, window_bars=None, step_bars=None, workers=None):
+    """
+    Label every asset/window with ORACLE, pool the labeled feature rows and fit
+    quantile thresholds + decision stumps.
+    frames: {coin: candle DataFrame}
+    """
+    tasks = [(coin, df, window_bars, step_bars) for coin, df in frames.items() if not df.empty]
+    if workers is None:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(label_asset, tasks))
+    else:
+        parts = [label_asset(t) for t in tasks]
+
+    n_feat = len(FEATURES)
+    buys = np.concatenate([p["buy"] for p in parts]) if parts else np.empty((0, n_feat))
+    sells = np.concatenate([p["sell"] for p in parts]) if parts else np.empty((0, n_feat))
+    everything = np.concatenate([p["all"] for p in parts if "all" in p]) if parts else np.empty((0, n_feat))
+
+    col = {name: f for f, name in enumerate(FEATURES)}
+    avg_rsi_buy = buys[:, col["rsi"]].mean() if len(buys) else 30
+    avg_rsi_sell = sells[:, col["rsi"]].mean() if len(sells) else 70
+    avg_macd_buy = buys[:, col["macd"]].mean() if len(buys) else 0
+
+    return {
+        "learned_params": {
+            "rsi_buy": round(float(avg_rsi_buy), 2),
+            "rsi_sell": round(float(avg_rsi_sell), 2),
+            "macd_buy": round(float(avg_macd_buy), 4)
+        },
+        "buy_quantiles": _quantiles(buys),
+        "sell_quantiles": _quantiles(sells),
+        "buy_stumps": fit_stumps(buys, everything),
+        "sell_stumps": fit_stumps(sells, everything),
+        "samples": {
+            "assets": len(parts),
+            "windows": int(sum(p["windows"] for p in parts)),
+            "bars": int(len(everything)),
+            "buys": int(len(buys)),
+            "sells": int(len(sells))
+        }
+    }
+
+
+def clamp_request(coins, interval, days):
+    """
+    (unique coins, days) within MAX_MARKETS and MAX_BARS bars of `interval` per coin.
+    """
+    if isinstance(coins, str):
+        coins = [coins]
+    coins = list(dict.fromkeys(str(c).upper() for c in coins))[:MAX_MARKETS]
+    max_days = max(1, MAX_BARS * INTERVAL_MS.get(interval, INTERVAL_MS["1h"]) // DAY_MS)
+    return coins, min(max(int(days), 1), max_days)
+
+
+def fetch_frames(coins, interval="1h", days=30, workers=8):
+    """
+    Feature-store frames for many coins (see feature_store.get_features_many).
+    """
+    return feature_store.get_features_many(coins, interval, days, workers)
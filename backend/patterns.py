@@ -0,0 +1,188 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Vectorized price patterns: pivots, price/oscillator divergences and min-move swing points.
+# Everything works on whole arrays. A pivot needs `right` later bars to exist, so the
+# lookahead-safe outputs (confirmed=True, the default) flag the bar where the pattern becomes
+# known - pivot bar + right - never the pivot bar itself. Those are the versions exposed as
+# indicator columns by backtester.calculate_indicators and safe to trade on.
+# window_swings is the exception: it looks ahead by design and only labels history (ORACLE).
+
+PIVOT_LEFT = 2
+PIVOT_RIGHT = 2
+DIVERGENCE_LOOKBACK = 60 # max bars between the two pivots a divergence compares
+SWING_CHUNK = 256 # initial bars per search window in swing_points (doubles on a miss)
+
+
+def _shift(flags, right):
+    out = np.zeros_like(flags)
+    if right < len(flags):
+        out[right:] = flags[:len(flags) - right]
+    return out
+
+
+def _pivots(x, left, right, lows):
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    out = np.zeros(n, dtype=bool)
+    if n < left + right + 1:
+        return out
+    win = sliding_window_view(x, left + right + 1)
+    center = win[:, left:left + 1]
+    others = np.delete(win, left, axis=1)
+    # Strict on both sides (ties are not pivots); NaN compares False, so NaN is never a pivot
+    out[left:n - right] = (center < others).all(axis=1) if lows else (center > others).all(axis=1)
+    return out
+
+
+def pivot_lows(low, left=PIVOT_LEFT, right=PIVOT_RIGHT, confirmed=True):
+    """
+    Bars whose low is strictly below the `left` previous and `right` next lows.
+    confirmed=True flags the confirmation bar (pivot + right) instead of the pivot itself.
+    """
+    flags = _pivots(low, left, right, True)
+    return _shift(flags, right) if confirmed else flags
+
+
+def pivot_highs(high, left=PIVOT_LEFT, right=PIVOT_RIGHT, confirmed=True):
+    """
+    Bars whose high is strictly above the `left` previous and `right` next highs.
+    confirmed=True flags the confirmation bar (pivot + right) instead of the pivot itself.
+    """
+    flags = _pivots(high, left, right, False)
+    return _shift(flags, right) if confirmed else flags
+
+
+def _pairs(flags, lookback):
+    """
+    (previous, current) indices of consecutive pivots at most `lookback` bars apart.
+    """
+    idx = np.flatnonzero(flags)
+    prev, cur = idx[:-1], idx[1:]
+    near = cur - prev <= lookback
+    return prev[near], cur[near]
+
+
+def divergences(low, high, osc, left=PIVOT_LEFT, right=PIVOT_RIGHT, lookback=DIVERGENCE_LOOKBACK):
+    """
+    Price vs oscillator divergences between consecutive price pivots, flagged on the bar the
+    second pivot is confirmed (pivot + right):
+      bull:        lower low in price,   higher low in osc
+      hidden_bull: higher low in price,  lower low in osc
+      bear:        higher high in price, lower high in osc
+      hidden_bear: lower high in price,  higher high in osc
+    Returns {name: bool array}.
+    """
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    osc = np.asarray(osc, dtype=np.float64)
+    n = len(low)
+    out = {name: np.zeros(n, dtype=bool) for name in ("bull", "hidden_bull", "bear", "hidden_bear")}
+
+    prev, cur = _pairs(_pivots(low, left, right, True), lookback)
+    at = cur + right
+    out["bull"][at[(low[cur] < low[prev]) & (osc[cur] > osc[prev])]] = True
+    out["hidden_bull"][at[(low[cur] > low[prev]) & (osc[cur] < osc[prev])]] = True
+
+    prev, cur = _pairs(_pivots(high, left, right, False), lookback)
+    at = cur + right
+    out["bear"][at[(high[cur] > high[prev]) & (osc[cur] < osc[prev])]] = True
+    out["hidden_bear"][at[(high[cur] < high[prev]) & (osc[cur] > osc[prev])]] = True
+    return out
+
+
+def _reversal(track, against, start, find_low, min_move, first=0):
+    """
+    From `start`, the first bar t >= first where `against` moves min_move away from the
+    running extreme of `track` over [start, t). Returns (extreme index, t) or None.
+    Searched in geometrically growing windows, so a leg costs O(its length).
+    """
+    n = len(track)
+    size = max(SWING_CHUNK, first - start + 1)
+    while True:
+        stop = min(n, start + size)
+        seg = track[start:stop]
+        run = np.minimum.accumulate(seg) if find_low else np.maximum.accumulate(seg)
+        prev = run[:-1]
+        nxt = against[start + 1:stop]
+        hit = nxt >= prev * (1 + min_move) if find_low else nxt <= prev * (1 - min_move)
+        hit[:max(first - start - 1, 0)] = False
+        if hit.any():
+            j = int(hit.argmax())
+            ext = int(seg[:j + 1].argmin() if find_low else seg[:j + 1].argmax())
+            return start + ext, start + 1 + j
+        if stop == n:
+            return None
+        size *= 2
+
+
+def swing_points(high, low, min_move=0.015):
+    """
+    Alternating swing lows / highs (zigzag) where each leg moves at least min_move (fraction).
+    A swing is confirmed on the first later bar that reverses min_move from it.
+    Returns {"index": extreme bars, "confirmed": confirmation bars, "kind": -1 low / 1 high, "price"}.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    index, confirmed, kind = [], [], []
+
+    # 1. First swing: whichever of a low or a high is confirmed first
+    first_low = _reversal(low, high, 0, True, min_move) if n > 1 else None
+    first_high = _reversal(high, low, 0, False, min_move) if n > 1 else None
+    if first_low is None and first_high is None:
+        hit = None
+    elif first_high is None or (first_low is not None and first_low[1] <= first_high[1]):
+        hit, find_low = first_low, True
+    else:
+        hit, find_low = first_high, False
+
+    # 2. Then alternate, each leg starting at the previous extreme. A leg is only confirmed
+    # after the previous swing was, so its extreme spans that confirmation bar and the leg
+    # moves at least min_move
+    while hit is not None:
+        ext, t = hit
+        index.append(ext)
+        confirmed.append(t)
+        kind.append(-1 if find_low else 1)
+        find_low = not find_low
+        hit = _reversal(low, high, ext, True, min_move, t + 1) if find_low else _reversal(high, low, ext, False, min_move, t + 1)
+        if hit is not None and hit[0] == ext:
+            # The leg cannot end on the extreme it started from
+            hit = _reversal(low, high, ext + 1, True, min_move, t + 1) if find_low else _reversal(high, low, ext + 1, False, min_move, t + 1)
+
+    index = np.array(index, dtype=np.int64)
+    kind = np.array(kind, dtype=np.int8)
+    price = np.where(kind == -1, low[index], high[index]) if len(index) else np.empty(0)
+    return {"index": index, "confirmed": np.array(confirmed, dtype=np.int64), "kind": kind, "price": price}
+
+
+def swing_column(high, low, min_move=0.015):
+    """
+    Per-bar swing flags on the confirmation bars: -1 swing low, 1 swing high, 0 otherwise.
+    """
+    swings = swing_points(high, low, min_move)
+    out = np.zeros(len(high), dtype=np.int8)
+    out[swings["confirmed"]] = swings["kind"]
+    return out
+
+
+def window_swings(high, low, close, lookahead, min_move):
+    """
+    Hindsight swing candidates (uses the next `lookahead` bars - labeling only, never a feature):
+    bar i is a swing low when its low is the lowest of [i, i + lookahead] and the window's high
+    is more than min_move above its close; a swing high mirrors that.
+    Returns (lows, highs) bool arrays over the n - lookahead bars that have a full window.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    m = len(close) - lookahead
+    if m <= 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+    win_low = sliding_window_view(low, lookahead + 1).min(axis=1)
+    win_high = sliding_window_view(high, lookahead + 1).max(axis=1)
+    c = close[:m]
+    lows = (win_low == low[:m]) & ((win_high - c) / c > min_move)
+    highs = (win_high == high[:m]) & ((c - win_low) / c > min_move)
+    return lows, highs
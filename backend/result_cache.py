@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+from collections import OrderedDict
+
+import backtester
+import singleflight
+from candles import CandleArrays
+
+# Memory tier size (number of backtest results kept) and optional disk tier.
+# Leave BACKTEST_CACHE_DIR unset to keep the cache purely in-process.
+DEFAULT_MAX_ENTRIES = int(os.getenv("BACKTEST_CACHE_SIZE", "256"))
+DEFAULT_CACHE_DIR = os.getenv("BACKTEST_CACHE_DIR")
+# Disk tier caps: oldest files beyond DISK_MAX_ENTRIES and files older than DISK_MAX_AGE go
+DISK_MAX_ENTRIES = int(os.getenv("BACKTEST_CACHE_DISK_ENTRIES", "4096"))
+DISK_MAX_AGE = float(os.getenv("BACKTEST_CACHE_DISK_MAX_AGE", str(7 * 86400)))
+DISK_PRUNE_EVERY = 64 # puts between directory scans
+
+
+def fingerprint_candles(df):
+    """
+    Cheap identity of a candle frame: coin, interval, first/last timestamp, row count, and the
+    last bar's OHLCV (it is the forming bar that changes in place until it closes).
+    coin/interval come from df.attrs (set by market_data.fetch_candles).
+    Frames without that metadata fall back to hashing the close column.
+    CandleArrays carry coin/interval themselves.
+    """
+    if df is None or df.empty:
+        return "empty"
+
+    if isinstance(df, CandleArrays):
+        coin, interval = df.coin, df.interval
+        first_ts, last_ts = str(df.timestamp[0]), str(df.timestamp[-1])
+        close = df.close
+        last_bar = [df.open[-1], df.high[-1], df.low[-1], df.close[-1], df.volume[-1]]
+    else:
+        coin = df.attrs.get("coin")
+        interval = df.attrs.get("interval")
+        # epoch-ms, so a frame and its CandleArrays share one key
+        ts = df['timestamp']
+        first_ts = str(int(pd.Timestamp(ts.iloc[0]).value // 1_000_000))
+        last_ts = str(int(pd.Timestamp(ts.iloc[-1]).value // 1_000_000))
+        close = df['close'].to_numpy()
+        last_bar = [df[name].iloc[-1] for name in ('open', 'high', 'low', 'close', 'volume')]
+
+    parts = [str(coin), str(interval), first_ts, last_ts, str(len(df))]
+    parts.append(",".join(repr(float(v)) for v in last_bar))
+    if not isinstance(df, CandleArrays) and df.attrs.get("features"):
+        # Store frames carry indicators warmed up on the whole stored history
+        parts.append(str(df.attrs["features"]))
+    if coin is None or interval is None:
+        # Unknown origin (e.g. hand-built frame) - include the prices themselves
+        parts.append(hashlib.sha1(close.tobytes()).hexdigest())
+
+    return "|".join(parts)
+
+
+def logic_hash(strategy_logic):
+    """
+    Stable hash of a strategy_logic dict (key order independent).
+    """
+    canonical = json.dumps(strategy_logic or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def cache_key(df, strategy_logic):
+    raw = fingerprint_candles(df) + "#" + logic_hash(strategy_logic)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache for run_backtest results.
+    Memory tier is an LRU (OrderedDict); the optional disk tier stores one JSON file per key,
+    capped at disk_max_entries files (oldest first) and disk_max_age seconds.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=DEFAULT_CACHE_DIR,
+                 disk_max_entries=DISK_MAX_ENTRIES, disk_max_age=DISK_MAX_AGE):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.disk_max_entries = disk_max_entries
+        self.disk_max_age = disk_max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    if time.time() - os.path.getmtime(path) > self.disk_max_age:
+                        raise FileNotFoundError # expired; removed by the next prune
+                    with open(path, "r", encoding="utf-8") as f:
+                        value = json.load(f)
+                except FileNotFoundError:
+                    pass
+                except (OSError, ValueError) as e:
+                    print(f"Error reading backtest cache {path}: {e}")
+                else:
+                    self._remember(key, value)
+                    with self._lock:
+                        self.hits += 1
+                    return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, path)  # atomic, so readers never see half a file
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Error writing backtest cache {path}: {e}")
+
+            with self._lock:
+                self._puts += 1
+                prune = self._puts % DISK_PRUNE_EVERY == 1
+            if prune:
+                self.prune_disk()
+
+    def prune_disk(self):
+        """
+        Drop expired files, then the oldest ones beyond disk_max_entries.
+        """
+        try:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        except OSError as e:
+            print(f"Error scanning backtest cache {self.cache_dir}: {e}")
+            return
+        entries.sort()
+        cutoff = time.time() - self.disk_max_age
+        excess = len(entries) - self.disk_max_entries
+        for n, (mtime, path) in enumerate(entries):
+            if mtime >= cutoff and n >= excess:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass # already removed by another worker
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk": bool(self.cache_dir)
+            }
+
+
+_cache = ResultCache()
+_flight = singleflight.group("backtests")
+
+
+def get_cache():
+    return _cache
+
+
+def cached_backtest(df, strategy_logic=None):
+    """
+    Drop-in for backtester.run_backtest that returns a stored result when
+    the same candles + logic have been run before.
+    The returned dict is shared - callers must not mutate it.
+    """
+    key = cache_key(df, strategy_logic)
+    result = _cache.get(key)
+    if result is None:
+        def run():
+            result = backtester.run_backtest(df, strategy_logic)
+            _cache.put(key, result)
+            return result
+        # Identical backtests already running elsewhere are awaited, not repeated
+        result = _flight.do(key, run)
+    return result
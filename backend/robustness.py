@@ -0,0 +1,151 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Monte Carlo robustness of a single backtest result.
+# Every method works on arrays shaped (variants, steps), so thousands of variants cost
+# a handful of NumPy calls; the bar bootstrap is split across processes when it is large.
+
+INITIAL_CAPITAL = 10000
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def round_trips(trades, invest_limit=2500, last_price=None, leverage=1):
+    """
+    Rebuilds (cost, proceeds) per round trip from run_backtest's trade list.
+    Each ENTRY commits invest_limit of margin for invest_limit * leverage notional (shorts negative);
+    proceeds = margin + P&L at the exit price. An open position is marked at last_price.
+    """
+    costs, proceeds = [], []
+    qty = 0.0
+    basis = 0.0
+    cost = 0.0
+    for t in trades:
+        if t["type"] == "ENTRY":
+            sign = -1 if t.get("direction") == "SHORT" else 1
+            notional = invest_limit * leverage
+            qty += sign * notional / t["price"]
+            basis += sign * notional
+            cost += invest_limit
+        elif cost > 0:
+            costs.append(cost)
+            proceeds.append(cost + qty * t["price"] - basis)
+            qty = 0.0
+            basis = 0.0
+            cost = 0.0
+    if cost > 0 and last_price is not None:
+        costs.append(cost)
+        proceeds.append(cost + qty * last_price - basis)
+    return np.array(costs), np.array(proceeds)
+
+
+def _paths_stats(equity):
+    """
+    equity: (V, n) paths that start after INITIAL_CAPITAL.
+    Returns (total_return_pct, max_drawdown_pct), each (V,).
+    """
+    start = np.full((equity.shape[0], 1), float(INITIAL_CAPITAL))
+    full = np.concatenate([start, equity], axis=1)
+    peak = np.maximum.accumulate(full, axis=1)
+    max_dd = ((peak - full) / peak).max(axis=1)
+    total = full[:, -1] / INITIAL_CAPITAL - 1
+    return total * 100, max_dd * 100
+
+
+def shuffle_trades(costs, proceeds, n_variants, rng):
+    """
+    Trade-order permutations: the final return is order independent, the drawdown is not.
+    Drawdowns here are on closed-trade equity, so they read lower than bar-level ones.
+    """
+    pnl = proceeds - costs
+    if len(pnl) == 0:
+        return np.zeros(n_variants), np.zeros(n_variants)
+    order = rng.random((n_variants, len(pnl))).argsort(axis=1)
+    equity = INITIAL_CAPITAL + np.cumsum(pnl[order], axis=1)
+    return _paths_stats(equity)
+
+
+def jitter_fills(costs, proceeds, n_variants, rng, fee_bps=4.5, jitter_bps=5.0, leverage=1):
+    """
+    Every fill pays fee_bps and a random slippage ~ |N(0, jitter_bps)|, entry and exit independently,
+    on its notional (margin x leverage).
+    """
+    n = len(costs)
+    if n == 0:
+        return np.zeros(n_variants), np.zeros(n_variants)
+    fee = fee_bps / 1e4
+    slip_in = np.abs(rng.normal(0, jitter_bps / 1e4, (n_variants, n)))
+    slip_out = np.abs(rng.normal(0, jitter_bps / 1e4, (n_variants, n)))
+    entry_notional = costs * leverage
+    exit_notional = proceeds + costs * (leverage - 1)
+    pnl = (proceeds - costs)[None, :] - exit_notional[None, :] * (fee + slip_out) - entry_notional[None, :] * (fee + slip_in)
+    equity = INITIAL_CAPITAL + np.cumsum(pnl, axis=1)
+    return _paths_stats(equity)
+
+
+def _bootstrap_chunk(args):
+    returns, n_variants, block_size, seed = args
+    rng = np.random.default_rng(seed)
+    n = len(returns)
+    n_blocks = -(-n // block_size)
+    # Circular block bootstrap: random block starts, contiguous runs, wrap around the end
+    starts = rng.integers(0, n, size=(n_variants, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)[None, None, :]).reshape(n_variants, -1)[:, :n] % n
+    equity = INITIAL_CAPITAL * np.cumprod(1 + returns[idx], axis=1)
+    return _paths_stats(equity)
+
+
+def block_bootstrap(equity_curve, n_variants, rng, block_size=24, workers=1):
+    """
+    Resamples the strategy's per-bar equity returns in blocks (keeps short-range autocorrelation).
+    """
+    eq = np.array([p["equity"] for p in equity_curve], dtype=np.float64)
+    if len(eq) < 2:
+        return np.zeros(n_variants), np.zeros(n_variants)
+    returns = np.diff(np.concatenate([[INITIAL_CAPITAL], eq])) / np.concatenate([[INITIAL_CAPITAL], eq[:-1]])
+    block_size = max(1, min(block_size, len(returns)))
+
+    # At most ~2M path cells per chunk keeps the temporaries small for long histories
+    n_chunks = max(workers, -(-n_variants * len(returns) // 2_000_000), 1)
+    seeds = rng.integers(0, 2**32, size=n_chunks)
+    sizes = [len(c) for c in np.array_split(np.arange(n_variants), n_chunks)]
+    jobs = [(returns, size, block_size, int(seed)) for size, seed in zip(sizes, seeds) if size]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_bootstrap_chunk, jobs))
+    else:
+        parts = [_bootstrap_chunk(j) for j in jobs]
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def summarize(total_pct, dd_pct):
+    return {
+        "return_pct": {f"p{q}": round(float(v), 2) for q, v in zip(PERCENTILES, np.percentile(total_pct, PERCENTILES))},
+        "max_drawdown_pct": {f"p{q}": round(float(v), 2) for q, v in zip(PERCENTILES, np.percentile(dd_pct, PERCENTILES))},
+        "prob_loss": round(float((total_pct < 0).mean()), 4),
+    }
+
+
+def analyze(result, invest_limit=2500, n_variants=2000, block_size=24, fee_bps=4.5, jitter_bps=5.0, seed=None, workers=None, leverage=1):
+    """
+    Monte Carlo summary for one run_backtest result.
+    Returns percentiles of return / max drawdown for each resampling method.
+    """
+    rng = np.random.default_rng(seed)
+    curve = result["equity_curve"]
+    last_price = curve[-1]["price"] if curve else None
+    costs, proceeds = round_trips(result["trades"], invest_limit, last_price, leverage)
+
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1) if n_variants * len(curve) > 5_000_000 else 1
+
+    base_total, base_dd = _paths_stats(np.array([[p["equity"] for p in curve]], dtype=np.float64)) if curve else (np.zeros(1), np.zeros(1))
+
+    return {
+        "base": {"return_pct": round(float(base_total[0]), 2), "max_drawdown_pct": round(float(base_dd[0]), 2)},
+        "n_variants": n_variants,
+        "round_trips": len(costs),
+        "trade_shuffle": summarize(*shuffle_trades(costs, proceeds, n_variants, rng)),
+        "block_bootstrap": summarize(*block_bootstrap(curve, n_variants, rng, block_size, workers)),
+        "fill_jitter": summarize(*jitter_fills(costs, proceeds, n_variants, rng, fee_bps, jitter_bps, leverage)),
+    }
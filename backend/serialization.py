@@ -0,0 +1,138 @@
+import json
+import gzip
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+# Response encoding for the large backtest payloads (equity curves are one dict per bar).
+# orjson serializes the result dicts directly (numpy scalars included) instead of FastAPI's
+# jsonable_encoder walk; bodies are compressed per Accept-Encoding; chart clients can ask
+# for the equity curve as an Arrow IPC stream instead of JSON.
+# orjson / zstandard / pyarrow are optional - each falls back to the next best path.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_COMPRESS_BYTES = 1024 # smaller bodies go out uncompressed
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _default(obj):
+    """
+    Non-JSON types: numpy scalars/arrays, timestamps (ISO), anything else as str().
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps(obj):
+    """
+    JSON bytes; NaN/inf become null in both paths.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_finite(obj), default=_default, separators=(",", ":")).encode()
+
+
+def _finite(obj):
+    # Only the stdlib path needs this: orjson already writes null for NaN
+    if isinstance(obj, float) and not np.isfinite(obj):
+        return None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def _accepted_encodings(request):
+    """
+    Encodings listed in Accept-Encoding without q=0.
+    """
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.lower())
+    return accepted
+
+
+def compress(request, body):
+    """
+    (body, Content-Encoding or None) - zstd if the client and server both support it, else gzip.
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    accepted = _accepted_encodings(request)
+    if zstandard is not None and "zstd" in accepted:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def wants_arrow(request):
+    return ARROW_MEDIA_TYPE in request.headers.get("accept", "") or request.query_params.get("format") == "arrow"
+
+
+def to_arrow(result, benchmark=None):
+    """
+    Equity curve (+ optional benchmark equity) as an Arrow IPC stream, one column per field.
+    Trades and metrics ride along as JSON in the schema metadata. None if pyarrow is missing.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+
+    curve = result.get("equity_curve", [])
+    columns = {
+        "date": pa.array([p["date"] for p in curve], type=pa.string()),
+        "equity": pa.array([p["equity"] for p in curve], type=pa.float64()),
+        "price": pa.array([p["price"] for p in curve], type=pa.float64()),
+    }
+    if benchmark is not None:
+        # Benchmark covers every bar; align it to the strategy's dates
+        bench = {p["date"]: p["equity"] for p in benchmark}
+        columns["benchmark_equity"] = pa.array([bench.get(p["date"]) for p in curve], type=pa.float64())
+
+    meta = {k: v for k, v in result.items() if k != "equity_curve"}
+    table = pa.table(columns).replace_schema_metadata({"result": dumps(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def respond(request: Request, content, arrow_result=None, arrow_benchmark=None):
+    """
+    Response for `content`, negotiated from the request headers.
+    Pass arrow_result (a run_backtest result) to let the client opt into Arrow.
+    """
+    body, media_type = None, "application/json"
+    if arrow_result is not None and wants_arrow(request):
+        body = to_arrow(arrow_result, arrow_benchmark)
+        if body is not None:
+            media_type = ARROW_MEDIA_TYPE
+    if body is None:
+        body = dumps(content)
+
+    body, encoding = compress(request, body)
+    headers = {"Vary": "Accept-Encoding, Accept"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
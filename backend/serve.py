@@ -0,0 +1,44 @@
+import os
+import multiprocessing
+from dotenv import load_dotenv
+
+import uvicorn
+
+# Production entry point (Dockerfile CMD).
+# WEB_CONCURRENCY=1: one uvicorn process, exactly like `uvicorn main:app`.
+# WEB_CONCURRENCY=N: N uvicorn workers plus one fetcher process (fetcher.py). Candles and
+# indicator columns live in the memory-mapped feature store, so the workers share one copy
+# through the page cache and none of them talks to the exchange while the fetcher keeps up.
+
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def _fetcher():
+    import fetcher
+    fetcher.run()
+
+
+def main():
+    workers = max(1, WEB_CONCURRENCY)
+    if workers == 1:
+        uvicorn.run("main:app", host=HOST, port=PORT)
+        return
+
+    # Set before the workers start so they inherit it
+    os.environ["SHARED_FEATURES"] = "1"
+    os.environ.setdefault("BACKTEST_CACHE_DIR", "backtest_cache") # result cache shared on disk too
+
+    fetch = multiprocessing.Process(target=_fetcher, name="fetcher", daemon=True)
+    fetch.start()
+    try:
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=workers)
+    finally:
+        fetch.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import threading
+
+# Request coalescing ("single flight"): while a computation for a key is running, further
+# callers with the same key wait for it and share its result instead of starting their own.
+# Used for candle fetches (market_data.get_candles) and backtests (result_cache.cached_backtest),
+# where a burst of dashboard requests otherwise repeats the same Hyperliquid call / engine run.
+# Callers share the returned object - it must be treated as read-only.
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def do(self, key, fn):
+        """
+        fn() once per key at a time; concurrent callers get the same result (or exception).
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+                "max_waiters": self.max_waiters
+            }
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def group(name):
+    """
+    The process-wide SingleFlight for name (created on first use).
+    """
+    with _groups_lock:
+        flight = _groups.get(name)
+        if flight is None:
+            flight = _groups[name] = SingleFlight(name)
+        return flight
+
+
+def stats():
+    with _groups_lock:
+        flights = list(_groups.values())
+    return {flight.name: flight.stats() for flight in flights}
@@ -0,0 +1,108 @@
+import numpy as np
+
+# Strategy plugin interface for run_backtest.
+# A strategy is a per-bar callback registered by name:
+#
+#     @strategy("MY_STRAT", state=MyState, prepare=add_my_columns)
+#     def strat_my(ctx, position, params, state):
+#         i = ctx.i
+#         if ctx.rsi[i] < 30 and position == 0: return 1
+#         return 0
+#
+# ctx is a BarContext (one sequence per indicator column + the current bar index), state an
+# instance of a StrategyState subclass with __slots__. The callback returns the engine signal:
+# 1 = long/add, 2 = short/add, -1 = exit, -2 = take profit, -3 = stop loss, 0 = nothing.
+# Built-ins and user strategies go through the same registry and the same loop, so a
+# strategy defined in another module (imported before the backtest runs) is as fast as ours.
+
+DEFAULT_STRATEGY = "TREND"
+
+STRATEGIES = {} # NAME -> StrategySpec
+
+
+class BarContext:
+    """
+    Struct-of-arrays view of the backtest frame (after dropna).
+    ctx.<column> / ctx[column] is a plain list - scalar indexing a list is several times faster
+    than indexing a NumPy array - and ctx.array(column) the NumPy column for vectorized work.
+    ctx.i is the bar being evaluated; ctx.n the number of bars.
+    """
+    __slots__ = ('i', 'n', 'columns', 'arrays', 'coin', 'interval')
+
+    def __init__(self, arrays, coin=None, interval=None):
+        self.arrays = arrays
+        self.columns = {name: arr.tolist() for name, arr in arrays.items()}
+        self.n = len(next(iter(arrays.values()))) if arrays else 0
+        self.i = 0
+        self.coin = coin
+        self.interval = interval
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Every numeric column of df; the timestamp as int64 epoch-ms.
+        """
+        arrays = {}
+        for name in df.columns:
+            col = df[name]
+            if name == 'timestamp':
+                arrays[name] = col.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+            elif col.dtype.kind in 'biuf':
+                arrays[name] = col.to_numpy()
+        return cls(arrays, df.attrs.get('coin'), df.attrs.get('interval'))
+
+    def __getattr__(self, name):
+        # Only reached for names that are not slots, i.e. column names
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def array(self, name):
+        return self.arrays[name]
+
+
+class StrategyState:
+    """
+    Per-run strategy state. Subclasses declare their fields in __slots__ and set them in
+    __init__(ctx, params), which runs once before the first bar.
+    avg_entry_price is kept current by run_backtest after every fill (0 when flat).
+    """
+    __slots__ = ('avg_entry_price',)
+
+    def __init__(self, ctx=None, params=None):
+        self.avg_entry_price = 0
+
+
+class StrategySpec:
+    __slots__ = ('name', 'on_bar', 'state', 'prepare')
+
+    def __init__(self, name, on_bar, state, prepare):
+        self.name = name
+        self.on_bar = on_bar
+        self.state = state
+        self.prepare = prepare
+
+
+def strategy(name, state=StrategyState, prepare=None):
+    """
+    Register fn(ctx, position, params, state) -> signal under name (logic["type"]).
+    prepare(df, params) -> df runs on the indicator frame before dropna, for extra columns.
+    """
+    def register(fn):
+        STRATEGIES[name] = StrategySpec(name, fn, state, prepare)
+        return fn
+    return register
+
+
+def get_strategy(name):
+    """
+    Registered strategy for logic["type"]; unknown types run DEFAULT_STRATEGY.
+    """
+    return STRATEGIES.get(name) or STRATEGIES[DEFAULT_STRATEGY]
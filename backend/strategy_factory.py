@@ -1,5 +1,10 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
+import backtester
+import engine
 
 def infer_strategy_from_marks(df, marks):
     """
@@ -14,32 +19,16 @@ def infer_strategy_from_marks(df, marks):
     """
     # 1. Feature Extraction (Enriched Indicators)
     # We use a comprehensive set to "cast a wide net"
-    df = df.copy()
-    
-    # RSI
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
-    
-    # EMAs
-    df['ema_50'] = df['close'].ewm(span=50, adjust=False).mean()
-    df['ema_200'] = df['close'].ewm(span=200, adjust=False).mean()
-    
-    # MACD
-    ema_12 = df['close'].ewm(span=12, adjust=False).mean()
-    ema_26 = df['close'].ewm(span=26, adjust=False).mean()
-    df['macd'] = ema_12 - ema_26
-    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-    
-    # Bollinger
-    df['std_20'] = df['close'].rolling(window=20).std()
-    df['bb_upper'] = (df['close'].rolling(window=20).mean()) + (df['std_20'] * 2)
-    df['bb_lower'] = (df['close'].rolling(window=20).mean()) - (df['std_20'] * 2)
+    # RSI / EMA50 / EMA200 / MACD come from the shared indicator set (precomputed for store frames)
+    df = backtester.calculate_indicators(df)
+    
+    # Bollinger (SMA-20 based here, unlike the EMA-21 bands of calculate_indicators)
+    sma_20 = df['close'].rolling(window=20).mean()
+    df['bb_upper'] = sma_20 + (df['std_20'] * 2)
+    df['bb_lower'] = sma_20 - (df['std_20'] * 2)
     
     # Valid Data Only
-    df.dropna(inplace=True)
+    df.dropna(subset=['rsi', 'ema_50', 'ema_200', 'macd', 'macd_signal', 'std_20', 'bb_upper', 'bb_lower'], inplace=True)
     
     # 2. Extract Features at Marked Points
     buy_features = {
@@ -117,3 +106,349 @@ def infer_strategy_from_marks(df, marks):
     inferred_logic['description'] = summary
     
     return inferred_logic
+
+
+# --- Evolutionary Search ---
+# Candidate = one BUY rule and one SELL rule, each an AND of up to MAX_CLAUSES
+# "feature <op> threshold" clauses over indicator columns from backtester.calculate_indicators.
+# Populations are scored in batches with a vectorized long/flat approximation of the engine;
+# the best few are re-scored through engine.simulate (DCA sizing, real fills) and the winner
+# is re-run through run_backtest for the reported metrics.
+
+GA_FEATURES = ["rsi", "macd", "macd_hist", "dist_ema50", "dist_ema200", "bb_pos", "rsi_bull_div", "rsi_bear_div"]
+MAX_CLAUSES = 3
+MATCH_TOLERANCE = 3 # bars either side of a mark that still count as a hit
+# Request limits: _rule_masks holds two (population, MAX_CLAUSES, bars) float arrays per generation
+MAX_POPULATION = 2000
+MAX_GENERATIONS = 200
+FINALISTS = 5 # distinct top genomes of the last generation re-scored through engine.simulate
+
+# Set per worker process by _init_worker (or directly for in-process scoring)
+_WORKER_DATA = None
+
+
+def _init_worker(data):
+    global _WORKER_DATA
+    _WORKER_DATA = data
+
+
+def _rule_masks(F, feat, op, thr, active):
+    """
+    F: (n_features, T); feat/op/thr/active: (P, K) -> (P, T) bool, AND over active clauses.
+    """
+    vals = F[feat] # (P, K, T)
+    cond = np.where(op[..., None], vals > thr[..., None], vals < thr[..., None])
+    cond |= ~active[..., None]
+    return cond.all(axis=1)
+
+
+def _positions(entry, exit_):
+    """
+    Long/flat state per bar: last unambiguous event wins (entry -> 1, exit -> 0).
+    """
+    T = entry.shape[1]
+    event = np.where(entry & ~exit_, 1, np.where(exit_ & ~entry, 0, -1))
+    idx = np.where(event >= 0, np.arange(T), -1)
+    last = np.maximum.accumulate(idx, axis=1)
+    pos = np.take_along_axis(event, np.maximum(last, 0), axis=1)
+    return np.where(last >= 0, pos, 0).astype(np.int8)
+
+
+def _hits(events, mark_idx, near, tol):
+    """
+    Recall / precision of event bars (P, T) against mark bar indices.
+    """
+    if len(mark_idx) == 0:
+        return np.zeros(events.shape[0]), np.zeros(events.shape[0])
+    T = events.shape[1]
+    cs = np.concatenate([np.zeros((events.shape[0], 1), dtype=np.int32), np.cumsum(events, axis=1, dtype=np.int32)], axis=1)
+    lo = np.clip(mark_idx - tol, 0, T)
+    hi = np.clip(mark_idx + tol + 1, 0, T)
+    recall = ((cs[:, hi] - cs[:, lo]) > 0).mean(axis=1)
+    n_events = events.sum(axis=1)
+    precision = np.where(n_events > 0, (events & near).sum(axis=1) / np.maximum(n_events, 1), 0.0)
+    return recall, precision
+
+
+def _score_batch(genomes):
+    """
+    genomes: dict of (P, 2, K) arrays (side 0 = BUY rule, side 1 = SELL rule).
+    Returns (fitness, total_return, trades), each shape (P,).
+    """
+    d = _WORKER_DATA
+    F, ret = d["F"], d["ret"]
+    entry = _rule_masks(F, genomes["feat"][:, 0], genomes["op"][:, 0], genomes["thr"][:, 0], genomes["active"][:, 0])
+    exit_ = _rule_masks(F, genomes["feat"][:, 1], genomes["op"][:, 1], genomes["thr"][:, 1], genomes["active"][:, 1])
+    pos = _positions(entry, exit_)
+
+    # Fill at close, hold from the next bar
+    strat_ret = pos[:, :-1] * ret[None, 1:]
+    total_return = np.expm1(np.log1p(strat_ret).sum(axis=1))
+
+    prev = np.concatenate([np.zeros((pos.shape[0], 1), dtype=np.int8), pos[:, :-1]], axis=1)
+    buys = (pos == 1) & (prev == 0)
+    sells = (pos == 0) & (prev == 1)
+    trades = buys.sum(axis=1)
+
+    buy_recall, buy_precision = _hits(buys, d["buy_idx"], d["buy_near"], d["tol"])
+    sell_recall, sell_precision = _hits(sells, d["sell_idx"], d["sell_near"], d["tol"])
+
+    def f1(r, p):
+        return np.where(r + p > 0, 2 * r * p / np.maximum(r + p, 1e-12), 0.0)
+
+    w_sell = 0.3 if len(d["sell_idx"]) else 0.0
+    fitness = (0.9 - w_sell) * f1(buy_recall, buy_precision) + w_sell * f1(sell_recall, sell_precision)
+    fitness += 0.1 * np.tanh(total_return * 5)
+    fitness -= 0.01 * genomes["active"].sum(axis=(1, 2)) # prefer simpler rules
+    fitness = np.where(trades > 0, fitness, -1.0)
+    return fitness, total_return, trades
+
+
+def _engine_return(genome, F, bars, initial_capital=10000):
+    """
+    Total return of one genome's long/flat trades run through engine.simulate.
+    bars: (open, high, low, close) arrays aligned with F's columns.
+    """
+    entry = _rule_masks(F, genome["feat"][None, 0], genome["op"][None, 0], genome["thr"][None, 0], genome["active"][None, 0])
+    exit_ = _rule_masks(F, genome["feat"][None, 1], genome["op"][None, 1], genome["thr"][None, 1], genome["active"][None, 1])
+    pos = _positions(entry, exit_)[0]
+    prev = np.concatenate([[0], pos[:-1]])
+    signals = np.where((pos == 1) & (prev == 0), 1, np.where((pos == 0) & (prev == 1), -1, 0))
+    open_, high, low, close = bars
+    eng = engine.simulate(signals, close, open_, high, low, initial_capital=initial_capital)
+    return float(eng.equity[-1] / initial_capital - 1) if len(signals) else 0.0
+
+
+def _finalists(pop, fitness, total_return, F, bars):
+    """
+    Re-score the FINALISTS best distinct genomes with the engine's return in place of the
+    vectorized one. Returns (genome, fitness) of the best, or None when no finalist trades.
+    """
+    best = None
+    seen = set()
+    for i in np.argsort(-fitness, kind='stable'):
+        if fitness[i] <= -1 or len(seen) >= FINALISTS:
+            break
+        genome = {k: v[i] for k, v in pop.items()}
+        key = str(_decode(genome["feat"], genome["op"], genome["thr"], genome["active"], GA_FEATURES)[0])
+        if key in seen:
+            continue
+        seen.add(key)
+        engine_return = _engine_return(genome, F, bars)
+        score = float(fitness[i] - 0.1 * np.tanh(total_return[i] * 5) + 0.1 * np.tanh(engine_return * 5))
+        if best is None or score > best[1] + 1e-9:
+            best = ({k: v.copy() for k, v in genome.items()}, score)
+    return best
+
+
+def _slice_genomes(genomes, start, stop):
+    return {k: v[start:stop] for k, v in genomes.items()}
+
+
+def _random_genomes(rng, n, quantiles):
+    n_feat = quantiles.shape[0]
+    feat = rng.integers(0, n_feat, size=(n, 2, MAX_CLAUSES))
+    q = rng.integers(5, 96, size=(n, 2, MAX_CLAUSES))
+    active = rng.random((n, 2, MAX_CLAUSES)) < 0.4
+    active[:, :, 0] = True # at least one clause per rule
+    return {
+        "feat": feat,
+        "op": rng.random((n, 2, MAX_CLAUSES)) < 0.5,
+        "thr": quantiles[feat, q],
+        "active": active,
+    }
+
+
+def _breed(rng, genomes, fitness, n_children, quantiles, scale, tournament=3, mutation_rate=0.15):
+    P = len(fitness)
+
+    # Tournament selection
+    cand = rng.integers(0, P, size=(n_children, 2, tournament))
+    winners = np.take_along_axis(cand, fitness[cand].argmax(axis=2)[..., None], axis=2)[..., 0]
+    pa, pb = winners[:, 0], winners[:, 1]
+
+    # Uniform crossover per clause slot
+    take_b = rng.random((n_children, 2, MAX_CLAUSES)) < 0.5
+    child = {k: np.where(take_b, v[pb], v[pa]) for k, v in genomes.items()}
+
+    # Mutation: threshold jitter, op flip, feature swap, clause on/off
+    feat, op, thr, active = child["feat"], child["op"], child["thr"], child["active"]
+    shape = feat.shape
+    jitter = rng.random(shape) < mutation_rate
+    thr = np.where(jitter, thr + rng.normal(0, 0.1, shape) * scale[feat], thr)
+    op = np.where(rng.random(shape) < mutation_rate / 3, ~op, op)
+    swap = rng.random(shape) < mutation_rate / 3
+    new_feat = rng.integers(0, quantiles.shape[0], size=shape)
+    thr = np.where(swap, quantiles[new_feat, rng.integers(5, 96, size=shape)], thr)
+    feat = np.where(swap, new_feat, feat)
+    active = active ^ (rng.random(shape) < mutation_rate / 3)
+    active[:, :, 0] = True
+    return {"feat": feat, "op": op, "thr": thr, "active": active}
+
+
+def _decode(genome_feat, genome_op, genome_thr, genome_active, features):
+    rules = []
+    text = []
+    for side, action in ((0, "BUY"), (1, "SELL")):
+        clauses = []
+        for k in range(MAX_CLAUSES):
+            if not genome_active[side, k]:
+                continue
+            name = features[genome_feat[side, k]]
+            sym = ">" if genome_op[side, k] else "<"
+            clauses.append([name, sym, round(float(genome_thr[side, k]), 4)])
+        rules.append({"all": clauses, "action": action})
+        text.append(f"{action} when " + " and ".join(f"{c[0]} {c[1]} {c[2]}" for c in clauses))
+    return rules, text
+
+
+def _mark_indices(df, marks, side):
+    lookup = {ts: i for i, ts in enumerate(df['timestamp'].dt.strftime('%Y-%m-%d %H:%M'))}
+    idx = []
+    for mark in marks:
+        if mark.get('side') != side:
+            continue
+        key = pd.to_datetime(mark['date']).strftime('%Y-%m-%d %H:%M')
+        if key in lookup:
+            idx.append(lookup[key])
+    return np.array(sorted(set(idx)), dtype=np.int64)
+
+
+def evolve_strategy(df, marks=None, population=200, generations=40, elite=10, patience=8, workers=None, seed=None, report=None):
+    """
+    Genetic search for BUY/SELL rule sets that reproduce the given marks.
+    
+    Args:
+        df (pd.DataFrame): candles as returned by market_data.fetch_candles
+        marks (list): [{'date', 'side'}]; None/empty = learn from ORACLE trades
+        workers (int): process pool size for fitness batches; None = auto
+        report (callable): optional progress callback report(progress, partial), see jobs.py
+        
+    Returns:
+        dict: RULES strategy logic plus explanation, fitness and backtest metrics.
+    """
+    started = time.time()
+    
+    # At least one generation, one elite and one child per generation; at most the request limits
+    population = min(max(int(population), 2), MAX_POPULATION)
+    generations = min(max(int(generations), 1), MAX_GENERATIONS)
+    elite = min(max(int(elite), 1), population - 1)
+    
+    if not marks:
+        oracle = backtester.run_backtest(df, {"type": "ORACLE"})
+        marks = [{"date": t["date"], "side": t["side"]} for t in oracle["trades"]]
+        source = "ORACLE"
+    else:
+        source = "marks"
+    
+    feats = backtester.calculate_indicators(df).dropna().reset_index(drop=True)
+    T = len(feats)
+    if T < 50:
+        return {"error": "Not enough candles to evolve a strategy."}
+    
+    buy_idx = _mark_indices(feats, marks, 'BUY')
+    sell_idx = _mark_indices(feats, marks, 'SELL')
+    if len(buy_idx) < 2:
+        return {"error": "Not enough matched trades to infer pattern. Please mark more points exactly on candles."}
+    
+    F = feats[GA_FEATURES].to_numpy(dtype=np.float64).T.copy()
+    close = feats['close'].to_numpy(dtype=np.float64)
+    ret = np.concatenate([[0.0], close[1:] / close[:-1] - 1])
+    
+    def near_mask(idx):
+        near = np.zeros(T, dtype=bool)
+        for off in range(-MATCH_TOLERANCE, MATCH_TOLERANCE + 1):
+            near[np.clip(idx + off, 0, T - 1)] = True
+        return near
+    
+    data = {
+        "F": F, "ret": ret, "tol": MATCH_TOLERANCE,
+        "buy_idx": buy_idx, "sell_idx": sell_idx,
+        "buy_near": near_mask(buy_idx), "sell_near": near_mask(sell_idx),
+    }
+    
+    quantiles = np.quantile(F, np.linspace(0, 1, 101), axis=1).T # (n_features, 101)
+    scale = quantiles[:, 75] - quantiles[:, 25] + 1e-12
+    
+    # Process pool only pays off for big batches (pool start-up ~100ms)
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1) if population * T > 2_000_000 else 1
+    
+    rng = np.random.default_rng(seed)
+    pop = _random_genomes(rng, population, quantiles)
+    
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) if workers > 1 else None
+    if pool is None:
+        _init_worker(data)
+    
+    def evaluate(genomes):
+        if pool is None:
+            return _score_batch(genomes)
+        n = len(genomes["feat"])
+        step = -(-n // workers)
+        parts = list(pool.map(_score_batch, [_slice_genomes(genomes, i, i + step) for i in range(0, n, step)]))
+        return tuple(np.concatenate([p[j] for p in parts]) for j in range(3))
+    
+    best = None
+    stale = 0
+    evaluated = 0
+    gen = 0
+    try:
+        for gen in range(1, generations + 1):
+            fitness, total_return, trades = evaluate(pop)
+            evaluated += len(fitness)
+            last = (pop, fitness, total_return) # elitism keeps the best genome in every generation
+            
+            top = int(fitness.argmax())
+            if best is None or fitness[top] > best["fitness"] + 1e-9:
+                best = {
+                    "fitness": float(fitness[top]),
+                    "genome": {k: v[top].copy() for k, v in pop.items()},
+                    "vector_return": float(total_return[top]),
+                    "trades": int(trades[top]),
+                }
+                stale = 0
+            else:
+                stale += 1
+                if stale >= patience:
+                    break # early stopping
+            
+            if report is not None:
+                report(gen / generations, {"best_fitness": round(best["fitness"], 4), "generation": gen})
+            
+            # Elitism + offspring
+            order = np.argsort(-fitness)
+            elites = {k: v[order[:elite]] for k, v in pop.items()}
+            children = _breed(rng, pop, fitness, population - elite, quantiles, scale)
+            pop = {k: np.concatenate([elites[k], children[k]]) for k in pop}
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    # Re-score the top of the last generation through the engine
+    bars = tuple(feats[c].to_numpy(dtype=np.float64) for c in ('open', 'high', 'low', 'close'))
+    final = _finalists(*last, F, bars)
+    if final is not None:
+        best["genome"], best["fitness"] = final[0], final[1]
+    
+    g = best["genome"]
+    rules, text = _decode(g["feat"], g["op"], g["thr"], g["active"], GA_FEATURES)
+    logic = {"type": "RULES", "params": {"rules": rules}}
+    metrics = backtester.run_backtest(df, logic)["metrics"]
+    
+    explanation = [f"Evolved from {len(buy_idx)} BUY / {len(sell_idx)} SELL {source} points."] + text
+    return {
+        "type": "RULES",
+        "params": logic["params"],
+        "explanation": explanation,
+        "description": " ".join(explanation),
+        "fitness": round(best["fitness"], 4),
+        "metrics": metrics,
+        "search": {
+            "population": population,
+            "generations": gen,
+            "evaluated": evaluated,
+            "workers": workers,
+            "seconds": round(time.time() - started, 3)
+        }
+    }
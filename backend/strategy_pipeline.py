@@ -0,0 +1,109 @@
+import re
+from lazy import lazy_import
+
+serialization = lazy_import("serialization")
+
+# Coins we try to spot in the user's prompt to warm candles before the LLM answers
+KNOWN_COINS = ["BTC", "ETH", "SOL", "AVAX", "DOGE", "ARB"]
+DEFAULT_COIN = "BTC"
+DEFAULT_TIMEFRAME = "1h"
+MAX_LEVERAGE = 50 # Hyperliquid's highest perp leverage
+
+CONDITION_RE = re.compile(r"^\s*([A-Za-z_][\w.]*|-?\d+(?:\.\d+)?)\s*(<=|>=|==|<|>)\s*([A-Za-z_][\w.]*|-?\d+(?:\.\d+)?)\s*$")
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def coin_from_market(market):
+    """
+    'BTC-PERP' -> 'BTC', 'eth' -> 'ETH'.
+    """
+    return (market or DEFAULT_COIN).upper().split("-")[0].split("/")[0]
+
+
+def guess_market(message):
+    """
+    Best guess of (coin, timeframe) from free text, used for speculative prefetch.
+    """
+    text = message.upper()
+    coin = DEFAULT_COIN
+    for c in KNOWN_COINS:
+        if re.search(rf"\b{c}\b", text):
+            coin = c
+            break
+    if "ETHEREUM" in text:
+        coin = "ETH"
+    elif "SOLANA" in text:
+        coin = "SOL"
+
+    tf = re.search(r"\b(1m|5m|15m|1h|4h|1d)\b", message.lower())
+    return coin, tf.group(1) if tf else DEFAULT_TIMEFRAME
+
+
+def _operand(token, columns):
+    try:
+        return float(token)
+    except ValueError:
+        pass
+    name = token.lower()
+    if name in columns:
+        return name
+    return None
+
+
+def logic_from_strategy(strategy):
+    """
+    Compiles a models.Strategy into run_backtest logic (type RULES).
+    Returns (logic, notes) - notes list rules that could not be understood.
+    """
+    indicators = [i.model_dump() if hasattr(i, "model_dump") else i.dict() for i in strategy.indicators]
+
+    # Columns a rule may reference: OHLCV, built-in indicators and the strategy's own ids
+    columns = set(PRICE_COLUMNS) | {"rsi", "ema_9", "ema_21", "ema_50", "ema_200", "sma_99", "macd", "macd_signal", "macd_hist", "dist_ema50", "dist_ema200", "bb_pos", "pivot_low", "pivot_high", "rsi_bull_div", "rsi_hidden_bull_div", "rsi_bear_div", "rsi_hidden_bear_div"}
+    for ind in indicators:
+        ind["id"] = ind["id"].lower()
+        columns.add(ind["id"])
+        kind = str(ind.get("type", "")).upper()
+        if kind == "MACD":
+            columns.update({f"{ind['id']}_signal", f"{ind['id']}_hist"})
+        elif kind in ("BB", "BOLLINGER", "BBANDS"):
+            columns.update({f"{ind['id']}_upper", f"{ind['id']}_lower"})
+
+    rules = []
+    notes = []
+    for rule in strategy.rules:
+        clauses = []
+        for part in re.split(r"\s+(?:and|AND|&&)\s+", rule.condition):
+            m = CONDITION_RE.match(part)
+            lhs = _operand(m.group(1), columns) if m else None
+            rhs = _operand(m.group(3), columns) if m else None
+            if lhs is None or rhs is None:
+                clauses = None
+                break
+            clauses.append([lhs, m.group(2), rhs])
+
+        action = rule.action.upper()
+        if not clauses or action not in ("BUY", "SELL", "SHORT", "CLOSE"):
+            notes.append(f"Skipped rule '{rule.condition} -> {rule.action}' (unsupported)")
+            continue
+        rules.append({"all": clauses, "action": action})
+
+    risk = strategy.risk
+    logic = {
+        "type": "RULES",
+        "params": {
+            "indicators": indicators,
+            "rules": rules,
+            "take_profit_pct": risk.take_profit_pct,
+            "stop_loss_pct": risk.stop_loss_pct,
+            "invest_limit": round(10000 * min(max(risk.position_size_pct, 1), 100) / 100, 2),
+            # SELL stays a flat exit unless the strategy opts into shorts; SHORT always opens one.
+            # Margin per entry is levered up to max_leverage
+            "allow_short": bool(risk.allow_short),
+            "leverage": min(max(risk.max_leverage, 1), MAX_LEVERAGE)
+        }
+    }
+    return logic, notes
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {serialization.dumps(data).decode()}\n\n"
@@ -0,0 +1,169 @@
+import zlib
+import numpy as np
+from candles import CandleArrays, INTERVAL_MS
+
+# Seeded synthetic candle generator (same schema as market_data.fetch_candles).
+# Every model draws all bars in a few vectorized NumPy calls, so millions of bars take well
+# under a second. Use it for scale benchmarks and for stress scenarios that 30 days of
+# Hyperliquid history never contains. The API accepts it as market "SYNTH-<scenario>[-<seed>]".
+
+# Annualized drift / volatility per scenario; regime scenarios list their states.
+SCENARIOS = {
+    "gbm": {"model": "gbm", "mu": 0.2, "sigma": 0.6},
+    "jump": {"model": "jump", "mu": 0.2, "sigma": 0.5, "jump_rate": 12.0, "jump_mean": -0.03, "jump_std": 0.06},
+    "regime": {
+        "model": "regime",
+        "states": [
+            {"mu": 0.8, "sigma": 0.45, "mean_bars": 24 * 20}, # bull
+            {"mu": -0.6, "sigma": 0.7, "mean_bars": 24 * 10}, # bear
+            {"mu": 0.0, "sigma": 0.3, "mean_bars": 24 * 15}, # chop
+        ],
+    },
+    "crash": {
+        "model": "regime",
+        "states": [
+            {"mu": 0.3, "sigma": 0.5, "mean_bars": 24 * 12},
+            {"mu": -25.0, "sigma": 2.5, "mean_bars": 36}, # short violent sell-off
+            {"mu": 0.5, "sigma": 1.0, "mean_bars": 24 * 5}, # dead-cat / recovery
+        ],
+    },
+}
+
+def _bars_per_year(interval):
+    return 365 * 86_400_000 / INTERVAL_MS[interval]
+
+
+def _regime_path(rng, n_bars, states):
+    """
+    Regime index per bar: geometric segment lengths, next state uniform among the others.
+    Loops over segments (n_bars / mean segment length), not bars.
+    """
+    means = np.array([s["mean_bars"] for s in states], dtype=np.float64)
+    n_states = len(states)
+    regime = np.empty(n_bars, dtype=np.int8)
+    pos = 0
+    state = int(rng.integers(0, n_states))
+    while pos < n_bars:
+        length = int(rng.geometric(1.0 / means[state]))
+        regime[pos:pos + length] = state
+        pos += length
+        if n_states > 1:
+            state = (state + 1 + int(rng.integers(0, n_states - 1))) % n_states
+    return regime
+
+
+def log_returns(n_bars, interval="1h", scenario="gbm", seed=None, source_returns=None, block_size=24, **overrides):
+    """
+    Per-bar log returns for a scenario.
+    scenario="bootstrap" resamples `source_returns` (real log returns) in circular blocks.
+    """
+    rng = np.random.default_rng(seed)
+
+    if scenario == "bootstrap":
+        src = np.asarray(source_returns, dtype=np.float64)
+        src = src[np.isfinite(src)]
+        if len(src) == 0:
+            raise ValueError("bootstrap scenario needs source_returns")
+        block_size = max(1, min(block_size, len(src)))
+        n_blocks = -(-n_bars // block_size)
+        starts = rng.integers(0, len(src), size=n_blocks)
+        idx = (starts[:, None] + np.arange(block_size)[None, :]).ravel()[:n_bars] % len(src)
+        return src[idx]
+
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario '{scenario}'. Options: {', '.join(list(SCENARIOS) + ['bootstrap'])}")
+    cfg = {**SCENARIOS[scenario], **overrides}
+    dt = 1.0 / _bars_per_year(interval)
+
+    if cfg["model"] == "regime":
+        states = cfg["states"]
+        regime = _regime_path(rng, n_bars, states)
+        mu = np.array([s["mu"] for s in states])[regime]
+        sigma = np.array([s["sigma"] for s in states])[regime]
+    else:
+        mu, sigma = cfg["mu"], cfg["sigma"]
+
+    r = (mu - 0.5 * np.square(sigma)) * dt + sigma * np.sqrt(dt) * rng.standard_normal(n_bars)
+
+    if cfg["model"] == "jump":
+        # Compound Poisson jumps (Merton): count per bar, jump sizes normal in log space
+        n_jumps = rng.poisson(cfg["jump_rate"] * dt, n_bars)
+        has = n_jumps > 0
+        r[has] += cfg["jump_mean"] * n_jumps[has] + cfg["jump_std"] * np.sqrt(n_jumps[has]) * rng.standard_normal(has.sum())
+
+    return r
+
+
+def _reflect(y, bound):
+    """
+    Fold a log-price path into [-bound, bound] with reflecting walls (triangle wave),
+    so multi-million-bar paths never overflow while keeping every bar's |return|.
+    """
+    z = np.mod(y + bound, 4 * bound)
+    return np.where(z <= 2 * bound, z - bound, 3 * bound - z)
+
+
+def generate_candle_arrays(n_bars, interval="1h", scenario="gbm", seed=None, start_price=100.0,
+                           start_ms=None, coin="SYNTH", dtype=np.float64, source_returns=None,
+                           price_band=1e4, **overrides):
+    """
+    Synthetic OHLCV as CandleArrays.
+    Open = previous close; high/low extend the body by a half-normal wick scaled to bar volatility;
+    volume is log-normal and grows with the absolute return.
+    Prices stay within start_price / price_band .. start_price * price_band.
+    """
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Unknown interval '{interval}'. Options: {', '.join(INTERVAL_MS)}")
+    rng = np.random.default_rng(None if seed is None else seed + 1) # independent of the return stream
+
+    r = log_returns(n_bars, interval, scenario, seed, source_returns, **overrides)
+    close = start_price * np.exp(_reflect(np.cumsum(r), np.log(price_band)))
+    open_ = np.empty_like(close)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+
+    wick_scale = np.std(r) if n_bars > 1 else 0.01
+    body_hi = np.maximum(open_, close)
+    body_lo = np.minimum(open_, close)
+    high = body_hi * np.exp(np.abs(rng.standard_normal(n_bars)) * wick_scale * 0.5)
+    low = body_lo * np.exp(-np.abs(rng.standard_normal(n_bars)) * wick_scale * 0.5)
+    volume = np.exp(rng.normal(6.0, 0.5, n_bars)) * (1 + np.abs(r) / (wick_scale + 1e-12))
+
+    step = INTERVAL_MS[interval]
+    if start_ms is None:
+        start_ms = 1_704_067_200_000 # fixed epoch (2024-01-01) keeps runs reproducible
+    timestamp = start_ms + step * np.arange(n_bars, dtype=np.int64)
+
+    return CandleArrays(
+        timestamp,
+        open_.astype(dtype, copy=False),
+        high.astype(dtype, copy=False),
+        low.astype(dtype, copy=False),
+        close.astype(dtype, copy=False),
+        volume.astype(dtype, copy=False),
+        coin=coin,
+        interval=interval
+    )
+
+
+def generate_candles(n_bars, interval="1h", scenario="gbm", seed=None, **kwargs):
+    """
+    fetch_candles-compatible DataFrame (timestamp, open, high, low, close, volume).
+    """
+    return generate_candle_arrays(n_bars, interval, scenario, seed, **kwargs).to_frame()
+
+
+def is_synthetic_market(coin):
+    return coin.upper().startswith("SYNTH")
+
+
+def from_market_name(coin, interval="1h", days=30):
+    """
+    'SYNTH-CRASH-7' -> crash scenario, seed 7, the same 30-day window fetch_candles covers.
+    The seed defaults to a hash of the name, so a market name always yields the same candles.
+    """
+    parts = coin.upper().split("-")
+    scenario = parts[1].lower() if len(parts) > 1 else "gbm"
+    seed = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else zlib.crc32(coin.upper().encode())
+    n_bars = int(days * 86_400_000 // INTERVAL_MS.get(interval, INTERVAL_MS["1h"]))
+    return generate_candle_arrays(n_bars, interval, scenario, seed, coin=coin.upper())
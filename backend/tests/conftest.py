@@ -0,0 +1,34 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Backend modules are flat (imported as `import backtester`), so put backend/ on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_candles(n=800, seed=0, coin="TEST", interval="1h"):
+    """
+    Random-walk hourly candles shaped like market_data.fetch_candles output.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.concatenate([close[:1], close[:-1]])
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, n)),
+        "low": np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, n)),
+        "close": close,
+        "volume": rng.uniform(1, 10, n),
+    })
+    df.attrs['coin'] = coin
+    df.attrs['interval'] = interval
+    return df
+
+
+@pytest.fixture
+def candles():
+    return make_candles()
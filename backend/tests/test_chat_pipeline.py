@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+import backtester
+import chat
+import feature_store
+import llm
+import strategy_pipeline
+from models import Strategy
+from conftest import make_candles
+
+RISK = {"stop_loss_pct": 2.0, "take_profit_pct": 5.0, "max_leverage": 3, "position_size_pct": 10.0}
+
+
+def make_strategy(rules, indicators=None, **risk):
+    return Strategy(
+        name="test", description="", market="BTC-PERP", timeframe="1h",
+        indicators=indicators or [{"id": "rsi_1", "type": "RSI", "params": {"length": 14}}],
+        rules=[{"condition": c, "action": a} for c, a in rules],
+        risk={**RISK, **risk},
+    )
+
+
+def test_logic_from_strategy_compiles_rules():
+    logic, notes = strategy_pipeline.logic_from_strategy(make_strategy([
+        ("rsi_1 < 30 and close > ema_200", "BUY"),
+        ("RSI_1 >= 70", "sell"),
+        ("macd crosses signal", "BUY"),
+        ("rsi_1 > 90", "HOLD"),
+    ]))
+    params = logic["params"]
+    assert logic["type"] == "RULES"
+    assert params["rules"] == [
+        {"all": [["rsi_1", "<", 30.0], ["close", ">", "ema_200"]], "action": "BUY"},
+        {"all": [["rsi_1", ">=", 70.0]], "action": "SELL"},
+    ]
+    assert len(notes) == 2
+    assert params["invest_limit"] == 1000
+    assert params["leverage"] == 3
+    assert params["allow_short"] is False
+
+
+def test_logic_from_strategy_clamps_risk():
+    logic, _ = strategy_pipeline.logic_from_strategy(make_strategy([("rsi_1 < 30", "BUY")], max_leverage=500, position_size_pct=250, allow_short=True))
+    assert logic["params"]["leverage"] == strategy_pipeline.MAX_LEVERAGE
+    assert logic["params"]["invest_limit"] == 10000
+    assert logic["params"]["allow_short"] is True
+
+
+@pytest.mark.parametrize("rules, error", [
+    ([{"all": [["rsi", "<", 30]], "action": "BUY"}], None),
+    ([{"all": [["nope", "<", 30]], "action": "BUY"}], "Unknown column 'nope'"),
+    ([{"all": [["rsi", "=<", 30]], "action": "BUY"}], "Unknown operator '=<'"),
+    ([{"all": [["rsi", "<", 30]], "action": "HOLD"}], "Unknown action 'HOLD'"),
+    ([{"all": [["rsi", "<", "30"]], "action": "BUY"}], "Unknown column '30'"),
+    ([{"all": [["rsi", "<", True]], "action": "BUY"}], "must be a column name or a number"),
+    ([{"all": [["rsi", "<"]], "action": "BUY"}], "Malformed condition"),
+    ([{"action": "BUY"}], "Malformed rule"),
+    ("rsi < 30", "params.rules must be a list"),
+])
+def test_check_rules(rules, error):
+    message = backtester.check_rules({"rsi", "close"}, {"rules": rules})
+    if error is None:
+        assert message is None
+    else:
+        assert error in message
+
+
+class ScriptedBackend(llm.LLMBackend):
+    name = "scripted"
+
+    def __init__(self, reply):
+        self.reply = reply
+
+    def complete(self, messages, timeout=None):
+        return json.dumps(self.reply)
+
+
+def stream_events(monkeypatch, strategy):
+    df = backtester.calculate_indicators(make_candles(400))
+    monkeypatch.setattr(feature_store, "get_features", lambda *args, **kwargs: df)
+    previous = llm._backend
+    llm.set_backend(ScriptedBackend({"text": "ok", "strategy": strategy}))
+
+    async def collect():
+        return [chunk async for chunk in chat.chat_backtest_events("rsi strategy")]
+    try:
+        chunks = asyncio.run(collect())
+    finally:
+        llm.set_backend(previous)
+    return [chunk.split("\n")[0].removeprefix("event: ") for chunk in chunks]
+
+
+def strategy_json(indicator_params, rules):
+    return {
+        "name": "s", "description": "", "market": "BTC-PERP", "timeframe": "1h",
+        "indicators": [{"id": "rsi_1", "type": "RSI", "params": indicator_params}],
+        "rules": rules,
+        "risk": RISK,
+    }
+
+
+def test_chat_backtest_streams_results(monkeypatch):
+    events = stream_events(monkeypatch, strategy_json({"length": 14}, [{"condition": "rsi_1 < 40", "action": "BUY"}, {"condition": "rsi_1 > 60", "action": "SELL"}]))
+    assert events == ["explanation", "backtest", "benchmark", "done"]
+
+
+@pytest.mark.parametrize("params", [{"length": "abc"}, {"length": None}, {"length": -5}])
+def test_chat_backtest_reports_bad_indicators(monkeypatch, params):
+    events = stream_events(monkeypatch, strategy_json(params, [{"condition": "rsi_1 < 40", "action": "BUY"}]))
+    assert events == ["explanation", "error"]
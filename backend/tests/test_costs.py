@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+import pytest
+
+import backtest_api
+import backtester
+import costs
+from conftest import make_candles
+
+
+@pytest.mark.parametrize("config, error", [
+    (None, None),
+    (True, None),
+    (False, None),
+    ({"taker_fee_bps": 2, "order_type": "maker", "funding": False}, None),
+    ({"taker_fee_bps": "x"}, "costs.taker_fee_bps must be a non-negative number"),
+    ({"impact_coef": -1}, "costs.impact_coef must be a non-negative number"),
+    ({"half_spread_bps": float("nan")}, "costs.half_spread_bps must be a non-negative number"),
+    ({"order_type": "market"}, "costs.order_type must be 'taker' or 'maker'"),
+    ({"funding": "yes"}, "costs.funding must be true or false"),
+    ({"fee": 1}, "Unknown cost setting 'fee'"),
+    ("on", "costs must be true, false or an object of overrides"),
+])
+def test_config_error(config, error):
+    assert costs.config_error(config) == error
+    if error:
+        with pytest.raises(ValueError):
+            costs.resolve(config)
+
+
+def test_bad_costs_are_a_logic_error():
+    df = backtester.calculate_indicators(make_candles(300))
+    assert backtest_api.logic_error(df, {"type": "RSI", "costs": {"taker_fee_bps": "x"}}) == "costs.taker_fee_bps must be a non-negative number"
+    assert backtest_api.logic_error(df, {"type": "RSI", "costs": True}) is None
+
+
+def test_funding_fetch_does_not_block_other_coins(tmp_path, monkeypatch):
+    release = threading.Event()
+    fetches = []
+
+    def fetch_funding_history(coin, start_ms, end_ms=None):
+        fetches.append(coin)
+        if coin == "SLOW":
+            release.wait(5)
+        return [{"time": start_ms + 3_600_000 * k, "fundingRate": "0.0001"} for k in range(10)]
+    monkeypatch.setattr(costs.market_data, "fetch_funding_history", fetch_funding_history)
+    monkeypatch.setattr(costs, "FUNDING_DIR", str(tmp_path))
+    monkeypatch.setattr(costs, "_funding_cache", {})
+
+    slow = [threading.Thread(target=costs.funding_rates, args=("SLOW", 0, 36_000_000)) for _ in range(3)]
+    for t in slow:
+        t.start()
+    # Another coin is served while SLOW's fetch is still running
+    times, rates = costs.funding_rates("FAST", 0, 36_000_000)
+    assert len(times) == 10 and np.allclose(rates, 1e-4)
+    release.set()
+    for t in slow:
+        t.join()
+    assert fetches.count("SLOW") == 1
+    assert len(costs.funding_rates("SLOW", 0, 36_000_000)[0]) == 10
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester
+import costs
+import engine
+
+
+def test_long_round_trip():
+    eng = engine.PositionEngine(2, initial_capital=10000, invest_limit=2500)
+    eng.execute(0, engine.LONG, 100.0)  # 2500 / 100 = 25 coins
+    eng.mark(0, 100.0)
+    eng.execute(1, -1, 110.0)  # 25 * (110 - 100) = 250
+    eng.mark(1, 110.0)
+
+    assert eng.capital == pytest.approx(10250.0)
+    assert eng.equity.tolist() == pytest.approx([10000.0, 10250.0])
+    trades = eng.trades(["d0", "d1"])
+    assert [(t["side"], t["type"]) for t in trades] == [("BUY", "ENTRY"), ("SELL", "EXIT")]
+    assert trades[1]["pnl"] == 250.0
+
+
+def test_short_round_trip_with_leverage():
+    eng = engine.PositionEngine(2, initial_capital=10000, invest_limit=2500, leverage=2)
+    eng.execute(0, engine.SHORT, 100.0)  # notional 5000 -> 50 coins short, 2500 margin held
+    assert eng.qty == pytest.approx(-50.0)
+    assert eng.margin == 2500
+    eng.execute(1, -1, 90.0)  # 50 * (100 - 90) = 500
+
+    assert eng.capital == pytest.approx(10500.0)
+    assert eng.trades(["d0", "d1"])[1] == {"date": "d1", "side": "BUY", "price": 90.0, "type": "EXIT", "pnl": 500.0, "direction": "SHORT"}
+
+
+def test_flip_closes_then_opens():
+    eng = engine.PositionEngine(2, initial_capital=10000, invest_limit=2500)
+    eng.execute(0, engine.LONG, 100.0)
+    eng.execute(1, engine.SHORT, 120.0)  # long closes +500, then 2500 / 120 coins short
+
+    assert eng.capital == pytest.approx(10500.0 - 2500)
+    assert eng.qty == pytest.approx(-2500 / 120)
+    assert [t["type"] for t in eng.trades(["d0", "d1"])] == ["ENTRY", "EXIT", "ENTRY"]
+
+
+def test_leveraged_long_liquidation_price():
+    mmr = 0.005
+    eng = engine.PositionEngine(1, initial_capital=10000, invest_limit=2500, leverage=5, maintenance_margin=mmr)
+    eng.execute(0, engine.LONG, 100.0)  # notional 12500 -> 125 coins, 10000 borrowed, 7500 cash left
+
+    # Equity 7500 + 125p - 10000 equals the maintenance margin 125p * mmr
+    liq = (10000 - 7500) / (125 * (1 - mmr))
+    assert eng.liq_price == pytest.approx(liq)
+
+    assert not eng.check_liquidation(0, 99.0, 101.0, liq + 0.01)
+    assert eng.check_liquidation(0, 99.0, 101.0, liq - 0.01)
+    assert eng.qty == 0
+    assert eng.capital == pytest.approx(mmr * 125 * liq)
+    trade = eng.trades(["d0"])[-1]
+    assert trade["type"] == "LIQUIDATION"
+    assert trade["price"] == pytest.approx(liq)
+
+
+def test_short_liquidation_gap_fills_at_open_and_floors_capital():
+    eng = engine.PositionEngine(1, initial_capital=10000, invest_limit=2500, leverage=2)
+    eng.execute(0, engine.SHORT, 100.0)
+    assert eng.liq_price == pytest.approx((7500 + 2500 + 50 * 100) / (50 * 1.005))
+
+    # Gap far above the liquidation price: filled at the open, loss 50 * 300 exceeds the account
+    assert eng.check_liquidation(0, 400.0, 410.0, 395.0)
+    assert eng.trades(["d0"])[-1]["price"] == 400.0
+    assert eng.capital == 0
+
+
+def test_fees_on_position_path():
+    bars = pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=4, freq="h"),
+        "close": [100.0, 100.0, 110.0, 110.0],
+        "high": [101.0, 101.0, 111.0, 111.0],
+        "low": [99.0, 99.0, 109.0, 109.0],
+        "volume": [1e6] * 4,
+    })
+    config = costs.resolve({"funding": False, "half_spread_bps": 0, "impact_coef": 0})
+    parts = costs.compute(bars, [0, 25, 25, 0], config)
+
+    # Taker 4.5 bps on 25 * 100 bought and 25 * 110 sold
+    assert parts["fees"].tolist() == pytest.approx([0, 2500 * 4.5e-4, 0, 2750 * 4.5e-4])
+    assert not parts["slippage"].any()
+    assert not parts["funding"].any()
+
+    maker = costs.compute(bars, [0, 25, 25, 0], costs.resolve({"order_type": "maker", "funding": False}))
+    assert maker["fees"].sum() == pytest.approx(5250 * 1.5e-4)
+
+
+def test_backtest_costs_match_fills(candles):
+    logic = {"type": "RULES", "params": {"rules": [
+        {"all": [["rsi", "<", 40]], "action": "BUY"},
+        {"all": [["rsi", ">", 60]], "action": "SELL"},
+    ]}}
+    df = backtester.calculate_indicators(candles)
+    plain = backtester.run_backtest(df, logic)
+    charged = backtester.run_backtest(df, {**logic, "costs": {"funding": False, "half_spread_bps": 0, "impact_coef": 0}})
+
+    # Every fill pays 4.5 bps of price * 2500 / entry price coins
+    expected = 0.0
+    entry = None
+    for t in plain["trades"]:
+        if t["type"] == "ENTRY":
+            entry = t["price"]
+        expected += 2500 / entry * t["price"] * 4.5e-4
+    assert plain["trades"]
+    assert charged["metrics"]["costs"]["fees"] == pytest.approx(expected, abs=0.01)
+    assert charged["metrics"]["final_equity"] == pytest.approx(plain["metrics"]["final_equity"] - expected, abs=0.02)
+    assert [t["price"] for t in charged["trades"]] == [t["price"] for t in plain["trades"]]
+
+
+def test_simulate_matches_manual_engine():
+    close = np.array([100.0, 105.0, 95.0, 98.0])
+    eng = engine.simulate(np.array([1, 0, -1, 0]), close)
+    assert eng.equity.tolist() == pytest.approx([10000, 10125, 9875, 9875])
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import backtester
+import feature_store
+from candles import CandleArrays
+from feature_store import FeatureStore, CONTEXT_BARS
+from conftest import make_candles
+
+
+def assert_same_features(df, expected):
+    assert list(df.columns) == list(expected.columns)
+    assert (df['timestamp'].to_numpy() == expected['timestamp'].to_numpy()).all()
+    for name in expected.columns:
+        if name != 'timestamp':
+            np.testing.assert_allclose(df[name].to_numpy(), expected[name].to_numpy(), rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize("chunks", [[1], [7, 1, 50], [CONTEXT_BARS + 40, 3]])
+def test_incremental_appends_match_full_recompute(tmp_path, chunks):
+    df = make_candles(900, seed=3)
+    arrays = CandleArrays.from_frame(df)
+    store = FeatureStore(str(tmp_path))
+
+    n = len(df) - sum(chunks)
+    assert store.append(arrays.slice(0, n)) == n
+    for size in chunks:
+        assert store.append(arrays.slice(0, n + size)) == size
+        n += size
+
+    assert_same_features(store.frame("TEST", "1h"), backtester.calculate_indicators(df))
+
+
+def test_append_is_idempotent(tmp_path):
+    arrays = CandleArrays.from_frame(make_candles(300))
+    store = FeatureStore(str(tmp_path))
+    store.append(arrays)
+    assert store.append(arrays) == 0
+    assert store.meta("TEST", "1h")["rows"] == 300
+
+
+def test_gap_rebuilds_series(tmp_path):
+    df = make_candles(400, seed=5)
+    arrays = CandleArrays.from_frame(df)
+    store = FeatureStore(str(tmp_path))
+    store.append(arrays.slice(0, 200))
+
+    # Bars 200..249 missing: the store restarts from the later history
+    later = df.iloc[250:].reset_index(drop=True)
+    later.attrs = dict(df.attrs)
+    store.append(CandleArrays.from_frame(later))
+    assert_same_features(store.frame("TEST", "1h"), backtester.calculate_indicators(later))
+
+
+def test_frame_window_is_zero_copy(tmp_path):
+    df = make_candles(300)
+    store = FeatureStore(str(tmp_path))
+    store.append(CandleArrays.from_frame(df))
+
+    ts = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    frame = store.frame("TEST", "1h", int(ts[100]), int(ts[199]))
+    assert len(frame) == 100
+    assert not frame['close'].to_numpy().flags.writeable
+
+
+@pytest.mark.parametrize("coin, interval", [("../../escape/x", "1h"), ("BTC/../X", "1h"), ("BTC", "../1h"), ("BTC", "7h")])
+def test_unsafe_names_are_rejected(tmp_path, monkeypatch, coin, interval):
+    def fetch(*args, **kwargs):
+        raise AssertionError("fetched an invalid market")
+    monkeypatch.setattr(feature_store.market_data, "get_candle_arrays", fetch)
+    monkeypatch.setattr(feature_store.market_data, "fetch_candle_arrays", fetch)
+    monkeypatch.setattr(feature_store, "_store", FeatureStore(str(tmp_path)))
+
+    for shared in (False, True):
+        monkeypatch.setattr(feature_store, "SHARED", shared)
+        assert feature_store.get_features(coin, interval).empty
+    assert not any(tmp_path.iterdir())
+
+
+def test_failed_shared_fetch_leaves_no_series_dir(tmp_path, monkeypatch):
+    empty = CandleArrays([], [], [], [], [], [], coin="NOPE", interval="1h")
+    monkeypatch.setattr(feature_store.market_data, "fetch_candle_arrays", lambda *args, **kwargs: empty)
+    monkeypatch.setattr(feature_store, "_store", FeatureStore(str(tmp_path)))
+    monkeypatch.setattr(feature_store, "SHARED", True)
+
+    assert feature_store.get_features("NOPE", "1h").empty
+    assert not [p for p in tmp_path.iterdir() if p.is_dir()]
+
+
+def test_get_features_many_batches_unseen_coins(tmp_path, monkeypatch):
+    candles = {coin: make_candles(800, seed=n, coin=coin).iloc[n * 100:].reset_index(drop=True) for n, coin in enumerate(("AAA", "BBB", "CCC"))}
+
+    def get_candle_arrays(coin, interval, days=30):
+        if coin == "BAD":
+            raise ConnectionError("exchange down")
+        return CandleArrays.from_frame(candles[coin], coin=coin, interval=interval)
+    calls = []
+    def calculate_indicators(df, seed=None):
+        calls.append(df)
+        return original(df, seed)
+    original = backtester.calculate_indicators
+    monkeypatch.setattr(feature_store.market_data, "get_candle_arrays", get_candle_arrays)
+    monkeypatch.setattr(backtester, "calculate_indicators", calculate_indicators)
+    monkeypatch.setattr(feature_store, "_store", FeatureStore(str(tmp_path)))
+    monkeypatch.setattr(feature_store, "_frames", {})
+
+    frames = feature_store.get_features_many(["AAA", "BBB", "CCC", "BAD"], "1h")
+    assert list(frames) == ["AAA", "BBB", "CCC", "BAD"]
+    assert frames["BAD"].empty
+    assert not calls # one batch pass, no per-coin indicator runs
+    for coin, df in candles.items():
+        assert_same_features(frames[coin], original(df).iloc[feature_store.WARMUP_BARS:])
+
+
+def test_windows_skip_the_warm_up_regardless_of_stored_history(tmp_path):
+    df = make_candles(1200, seed=12)
+    window = CandleArrays.from_frame(df.iloc[800:].reset_index(drop=True))
+    fresh = backtester.calculate_indicators(window).dropna()
+
+    long_running = FeatureStore(str(tmp_path / "long"))
+    long_running.append(CandleArrays.from_frame(df.iloc[:800].reset_index(drop=True)))
+    for store in (long_running, FeatureStore(str(tmp_path / "fresh"))):
+        frame = store.sync(window, now_ms=int(window.timestamp[-1]) + 3_600_000, skip=feature_store.WARMUP_BARS)
+        assert not frame.isna().any().any()
+        assert (frame['timestamp'].to_numpy() == fresh['timestamp'].to_numpy()).all()
+        # Windowed columns match exactly; EMAs differ only by how far back they are warmed
+        for name in ('rsi', 'sma_99', 'std_20', 'pivot_low', 'rsi_bull_div'):
+            np.testing.assert_allclose(frame[name].to_numpy(), fresh[name].to_numpy(), rtol=1e-9, atol=1e-9, err_msg=name)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import backtester
+import indicators
+from candles import CandleArrays
+from conftest import make_candles
+
+
+def assert_same_columns(got, expected):
+    assert list(got.columns) == list(expected.columns)
+    for name in expected.columns[1:]:
+        a, b = expected[name].to_numpy(dtype=np.float64), got[name].to_numpy(dtype=np.float64)
+        assert (np.isnan(a) == np.isnan(b)).all(), name
+        np.testing.assert_allclose(b[~np.isnan(b)], a[~np.isnan(a)], rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_batch_indicators_match_calculate_indicators_per_row():
+    frames = [make_candles(600, seed=seed) for seed in range(3)]
+    close = np.stack([df['close'].to_numpy() for df in frames])
+    high = np.stack([df['high'].to_numpy() for df in frames])
+    low = np.stack([df['low'].to_numpy() for df in frames])
+    cols = indicators.batch_indicators(close, high, low)
+    for r, df in enumerate(frames):
+        expected = backtester.calculate_indicators(df)
+        for name, matrix in cols.items():
+            a = expected[name].to_numpy(dtype=np.float64)
+            assert (np.isnan(a) == np.isnan(matrix[r])).all(), name
+            np.testing.assert_allclose(matrix[r][~np.isnan(a)], a[~np.isnan(a)], rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize("starts", [[0, 0, 0], [0, 150, 420]])
+def test_batch_features_match_calculate_indicators(starts):
+    candles = {}
+    for n, start in enumerate(starts):
+        df = make_candles(800, seed=n, coin=f"C{n}").iloc[start:].reset_index(drop=True)
+        candles[f"C{n}"] = CandleArrays.from_frame(df, coin=f"C{n}", interval="1h", dtype=np.float64)
+    # A history with a missing bar cannot share the batch
+    df = make_candles(300, seed=9, coin="GAP").drop(index=[100]).reset_index(drop=True)
+    candles["GAP"] = CandleArrays.from_frame(df, coin="GAP", interval="1h", dtype=np.float64)
+
+    out = indicators.batch_features(candles)
+    assert set(out) == set(candles)
+    for key, c in candles.items():
+        assert out[key].attrs['coin'] == key
+        assert_same_columns(out[key], backtester.calculate_indicators(c))
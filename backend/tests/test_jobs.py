@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobManager, JobStore
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def looping_job(payload, report):
+    """
+    Reports progress until cancelled (or payload["steps"] reports).
+    """
+    for step in range(payload.get("steps", 10_000)):
+        report(step / payload.get("steps", 10_000), {"step": step})
+        time.sleep(0.005)
+    return {"steps": payload.get("steps")}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+@pytest.fixture
+def managers(db_path):
+    """
+    Two managers on one database, as two serve.py workers would be.
+    """
+    a, b = JobManager(JobStore(db_path), max_workers=2), JobManager(JobStore(db_path), max_workers=2)
+    for m in (a, b):
+        m.register("loop", looping_job)
+    yield a, b
+    a.shutdown()
+    b.shutdown()
+
+
+def test_other_manager_sees_progress_and_result(managers):
+    a, b = managers
+    job_id = a.submit("loop", {"steps": 5})
+    wait_for(lambda: b.get(job_id)["status"] == jobs.DONE)
+    job = b.get(job_id)
+    assert job["result"] == {"steps": 5}
+    assert job["progress"] == 1.0
+    assert job["owner"] == a.owner
+
+
+def test_other_manager_cancels_running_job(managers):
+    a, b = managers
+    job_id = a.submit("loop", {})
+    wait_for(lambda: (b.get(job_id)["partial"] or {}).get("step", 0) > 2)
+
+    assert b.cancel(job_id)
+    wait_for(lambda: a.get(job_id)["status"] == jobs.CANCELLED)
+    assert not b.cancel(job_id)
+
+
+def test_queued_job_cancelled_elsewhere_never_starts(db_path):
+    release = threading.Event()
+    started = []
+    a = JobManager(JobStore(db_path), max_workers=1)
+    a.register("block", lambda payload, report: release.wait(5))
+    a.register("record", lambda payload, report: started.append(payload))
+    b = JobManager(JobStore(db_path), max_workers=1)
+    try:
+        blocker = a.submit("block", {})
+        queued = a.submit("record", {"n": 1})
+        assert b.get(queued)["status"] == jobs.QUEUED
+
+        assert b.cancel(queued)
+        assert b.get(queued)["status"] == jobs.CANCELLED
+        release.set()
+        wait_for(lambda: a.get(blocker)["status"] == jobs.DONE)
+        time.sleep(0.05)
+        assert a.get(queued)["status"] == jobs.CANCELLED
+        assert not started
+    finally:
+        release.set()
+        a.shutdown()
+        b.shutdown()
+
+
+def test_new_manager_leaves_live_jobs_alone(db_path):
+    a = JobManager(JobStore(db_path), max_workers=1)
+    a.register("loop", looping_job)
+    try:
+        job_id = a.submit("loop", {})
+        wait_for(lambda: a.get(job_id)["status"] == jobs.RUNNING)
+
+        # A second worker starting up must not fail the first worker's job
+        b = JobManager(JobStore(db_path))
+        assert b.get(job_id)["status"] == jobs.RUNNING
+        assert b.cancel(job_id)
+        wait_for(lambda: a.get(job_id)["status"] == jobs.CANCELLED)
+        b.shutdown()
+    finally:
+        a.shutdown()
+
+
+def test_jobs_of_dead_processes_are_failed(db_path):
+    store = JobStore(db_path)
+    store.create("orphan", "loop", {}, owner="999999999:1")
+    store.start("orphan")
+
+    manager = JobManager(JobStore(db_path))
+    job = manager.get("orphan")
+    manager.shutdown()
+    assert job["status"] == jobs.FAILED
+    assert job["error"] == "Interrupted by server restart"
+
+
+def test_error_results_are_failed(db_path):
+    manager = JobManager(JobStore(db_path), max_workers=1)
+    manager.register("nodata", lambda payload, report: {"error": "No Data"})
+    try:
+        job_id = manager.submit("nodata", {})
+        wait_for(lambda: manager.get(job_id)["status"] in jobs.FINISHED_STATES)
+        job = manager.get(job_id)
+        assert job["status"] == jobs.FAILED
+        assert job["error"] == "No Data"
+    finally:
+        manager.shutdown()
+
+
+def test_job_events_stream_ends_with_result(db_path, monkeypatch):
+    import jobs_api
+    manager = JobManager(JobStore(db_path), max_workers=1)
+    manager.register("loop", looping_job)
+    monkeypatch.setattr(jobs, "_manager", manager)
+    monkeypatch.setattr(jobs_api, "EVENT_POLL_SECONDS", 0.01)
+    try:
+        job_id = manager.submit("loop", {"steps": 3})
+
+        async def collect():
+            return [chunk async for chunk in jobs_api._job_events(job_id)]
+        chunks = asyncio.run(collect())
+        assert chunks[-1].startswith("event: result")
+        assert '"status": "done"' in chunks[-1]
+    finally:
+        manager.shutdown()
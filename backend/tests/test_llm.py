@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+import llm
+
+
+@pytest.fixture
+def backend():
+    previous = llm._backend
+    fake = llm.FakeBackend()
+    llm.set_backend(fake)
+    yield fake
+    llm.set_backend(previous)
+
+
+def test_concurrent_calls_are_capped(backend):
+    backend.delay = 0.05
+    n = llm.LLM_MAX_CONCURRENCY * 3
+
+    async def burst():
+        return await asyncio.gather(*[
+            llm.complete_async([{"role": "user", "content": f"rsi strategy {k}"}], timeout=5)
+            for k in range(n)
+        ])
+
+    replies = asyncio.run(burst())
+    assert len(replies) == n
+    assert backend.calls == n
+    assert backend.max_active == llm.LLM_MAX_CONCURRENCY
+
+
+def test_slow_call_times_out(backend):
+    backend.delay = 1.0
+
+    async def call():
+        return await llm.complete_async([{"role": "user", "content": "rsi strategy"}], timeout=0.1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call())
+
+
+def test_backend_receives_timeout(backend):
+    seen = []
+    complete = backend.complete
+    backend.complete = lambda messages, timeout=None: seen.append(timeout) or complete(messages, timeout)
+
+    asyncio.run(llm.complete_async([{"role": "user", "content": "hello"}], timeout=7))
+    assert seen == [7]
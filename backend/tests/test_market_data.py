@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import market_data
+from candles import CandleArrays
+from conftest import make_candles
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+    def fetch_candle_arrays(coin, interval="1h", dtype=np.float64, days=30):
+        calls.append(coin)
+        if coin == "NOPE":
+            return CandleArrays([], [], [], [], [], [], coin=coin, interval=interval)
+        return CandleArrays.from_frame(make_candles(200, coin=coin.upper()), coin=coin.upper(), interval=interval)
+    monkeypatch.setattr(market_data, "fetch_candle_arrays", fetch_candle_arrays)
+    monkeypatch.setattr(market_data, "_candle_cache", market_data.OrderedDict())
+    return calls
+
+
+def test_cached_history_is_shared_and_read_only(fetches):
+    a = market_data.get_candle_arrays("btc", "1h")
+    b = market_data.get_candle_arrays("BTC", "1h")
+    assert a is b and fetches == ["btc"]
+    assert a.dtype == np.float64
+    with pytest.raises(ValueError):
+        a.close[0] = 1.0
+
+    # Frames are built per call on the cached arrays
+    df = market_data.get_candles("BTC", "1h")
+    assert list(df.columns) == ["timestamp", "open", "high", "low", "close", "volume"]
+    assert df.attrs == {"coin": "BTC", "interval": "1h"}
+    assert fetches == ["btc"]
+
+
+def test_cache_is_bounded_lru(fetches, monkeypatch):
+    monkeypatch.setattr(market_data, "CANDLE_CACHE_SIZE", 2)
+    for coin in ("AAA", "BBB", "AAA", "CCC"):
+        market_data.get_candle_arrays(coin, "1h")
+    assert list(market_data._candle_cache) == [("AAA", "1h", 30), ("CCC", "1h", 30)]
+
+
+def test_empty_and_synthetic_histories_are_not_cached(fetches):
+    assert market_data.get_candle_arrays("NOPE", "1h").empty
+    assert market_data.get_candles("NOPE", "1h").empty
+    market_data.get_candle_arrays("SYNTH-GBM-1", "1h")
+    assert not market_data._candle_cache
+    assert fetches == ["NOPE", "NOPE", "SYNTH-GBM-1"]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import backtester
+import oracle_training
+from conftest import make_candles
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_oracle_signals_match_run_backtest(seed):
+    candles = make_candles(1500, seed=seed)
+    trades = backtester.run_backtest(candles, {"type": "ORACLE"})["trades"]
+
+    feats = backtester.calculate_indicators(candles).dropna().reset_index(drop=True)
+    buys, sells = oracle_training.oracle_signals(feats['high'].to_numpy(), feats['low'].to_numpy(), feats['close'].to_numpy())
+    dates = feats['timestamp'].dt.strftime('%Y-%m-%d %H:%M').tolist()
+
+    assert [t["date"] for t in trades if t["side"] == "BUY"] == [dates[i] for i in buys]
+    assert [t["date"] for t in trades if t["side"] == "SELL"] == [dates[i] for i in sells]
+
+
+def test_oracle_signals_close_at_end():
+    # Steady rise: one buy at the start, closed on the first bar without a full window
+    close = np.linspace(100, 200, 120)
+    buys, sells = oracle_training.oracle_signals(close * 1.001, close * 0.999, close)
+    assert buys.tolist() == [1]
+    assert sells.tolist() == [120 - backtester.ORACLE_LOOKAHEAD]
+
+
+def test_label_asset_joins_features_by_bar():
+    candles = make_candles(900, seed=3)
+    part = oracle_training.label_asset(("TEST", candles, None, None))
+    feats = backtester.calculate_indicators(candles).dropna()
+    buys, _ = oracle_training.oracle_signals(feats['high'].to_numpy(), feats['low'].to_numpy(), feats['close'].to_numpy())
+    assert part["windows"] == 1
+    np.testing.assert_array_equal(part["buy"], feats[oracle_training.FEATURES].to_numpy()[buys])
+
+
+def test_train_pools_assets():
+    frames = {f"C{k}": make_candles(700, seed=k) for k in range(3)}
+    model = oracle_training.train(frames, workers=1)
+    assert model["samples"]["assets"] == 3
+    assert model["samples"]["buys"] > 0
+    assert model["buy_stumps"][0]["youden_j"] >= model["buy_stumps"][-1]["youden_j"]
+
+
+@pytest.mark.parametrize("coins, interval, days, expected", [
+    (["btc", "BTC", "eth"], "1h", 30, (["BTC", "ETH"], 30)),
+    ("sol", "1h", 0, (["SOL"], 1)),
+    (["BTC"], "1m", 3650, (["BTC"], 34)),
+    (["BTC"], "1d", 10_000, (["BTC"], 10_000)),
+    ([f"C{k}" for k in range(50)], "1h", 5000, ([f"C{k}" for k in range(oracle_training.MAX_MARKETS)], 2083)),
+])
+def test_clamp_request(coins, interval, days, expected):
+    assert oracle_training.clamp_request(coins, interval, days) == expected
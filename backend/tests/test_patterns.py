@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+import backtester
+import patterns
+from conftest import make_candles
+
+
+def brute_pivots(x, left, right, lows):
+    out = np.zeros(len(x), dtype=bool)
+    for i in range(left, len(x) - right):
+        others = np.concatenate([x[i - left:i], x[i + 1:i + right + 1]])
+        out[i] = (x[i] < others).all() if lows else (x[i] > others).all()
+    return out
+
+
+def test_pivots_on_a_hand_series():
+    low = np.array([5, 4, 3, 4, 5, 4, 4, 5, 6], dtype=float)
+    assert np.flatnonzero(patterns.pivot_lows(low, confirmed=False)).tolist() == [2]
+    # Confirmed two bars later; the tie at 5/6 is not a pivot
+    assert np.flatnonzero(patterns.pivot_lows(low)).tolist() == [4]
+    assert np.flatnonzero(patterns.pivot_highs(-low, left=1, right=1, confirmed=False)).tolist() == [2]
+
+
+@pytest.mark.parametrize("left, right", [(2, 2), (3, 1), (1, 4)])
+def test_pivots_match_brute_force(left, right):
+    df = make_candles(500, seed=2)
+    low, high = df['low'].to_numpy(), df['high'].to_numpy()
+    assert (patterns.pivot_lows(low, left, right, confirmed=False) == brute_pivots(low, left, right, True)).all()
+    assert (patterns.pivot_highs(high, left, right, confirmed=False) == brute_pivots(high, left, right, False)).all()
+
+
+def test_nan_is_never_a_pivot():
+    low = np.array([5, 4, np.nan, 4, 5, 3, 4, 5], dtype=float)
+    assert np.flatnonzero(patterns.pivot_lows(low, confirmed=False)).tolist() == [5]
+
+
+def test_divergences_on_a_hand_series():
+    # Two price lows (bars 3 and 9), the second lower; the oscillator's second low is higher
+    low = np.array([10, 9, 8, 7, 8, 9, 8, 7, 6.5, 6, 7, 8, 9], dtype=float)
+    high = low + 1
+    osc = np.array([50, 40, 35, 30, 40, 45, 42, 40, 38, 35, 40, 45, 50], dtype=float)
+    flags = patterns.divergences(low, high, osc)
+    assert np.flatnonzero(flags["bull"]).tolist() == [11]
+    assert not flags["hidden_bull"].any()
+
+    # Higher second low in price, lower in the oscillator
+    low = np.array([10, 9, 8, 7, 8, 9, 8.5, 8, 7.8, 7.5, 8, 9, 10], dtype=float)
+    osc = np.array([50, 40, 35, 30, 40, 45, 40, 35, 30, 25, 40, 45, 50], dtype=float)
+    hidden = patterns.divergences(low, low + 1, osc)
+    assert np.flatnonzero(hidden["hidden_bull"]).tolist() == [11]
+    assert not hidden["bull"].any()
+
+    # Pivots further apart than the lookback are not compared
+    assert not patterns.divergences(low, low + 1, osc, lookback=5)["hidden_bull"].any()
+
+
+def test_bearish_divergences_mirror_bullish():
+    df = make_candles(600, seed=4)
+    low, high = df['low'].to_numpy(), df['high'].to_numpy()
+    osc = backtester.calculate_indicators(df)['rsi'].to_numpy()
+    flags = patterns.divergences(low, high, osc)
+    mirrored = patterns.divergences(-high, -low, -osc)
+    assert (flags["bear"] == mirrored["bull"]).all()
+    assert (flags["hidden_bear"] == mirrored["hidden_bull"]).all()
+
+
+def test_confirmed_outputs_are_lookahead_safe():
+    df = make_candles(800, seed=6)
+    low, high = df['low'].to_numpy(), df['high'].to_numpy()
+    osc = backtester.calculate_indicators(df)['rsi'].to_numpy()
+    full_div = patterns.divergences(low, high, osc)
+    full_swing = patterns.swing_column(high, low)
+    for k in (150, 333, 640):
+        assert (patterns.pivot_lows(low[:k]) == patterns.pivot_lows(low)[:k]).all()
+        assert (patterns.pivot_highs(high[:k]) == patterns.pivot_highs(high)[:k]).all()
+        for name, flags in patterns.divergences(low[:k], high[:k], osc[:k]).items():
+            assert (flags == full_div[name][:k]).all(), name
+        assert (patterns.swing_column(high[:k], low[:k]) == full_swing[:k]).all()
+
+
+@pytest.mark.parametrize("min_move", [0.01, 0.03, 0.08])
+def test_swing_points_alternate_and_move_enough(min_move):
+    df = make_candles(1500, seed=8)
+    high, low = df['high'].to_numpy(), df['low'].to_numpy()
+    swings = patterns.swing_points(high, low, min_move)
+    kind, index, price, confirmed = swings["kind"], swings["index"], swings["price"], swings["confirmed"]
+
+    assert len(kind) > 2
+    assert (kind[1:] != kind[:-1]).all()
+    assert (index[1:] > index[:-1]).all()
+    assert (confirmed > index).all()
+    assert (np.diff(confirmed) >= 0).all()
+    # Every leg between consecutive swings moves at least min_move
+    legs = price[1:] / price[:-1] - 1
+    assert (np.where(kind[1:] == 1, legs, -legs) >= min_move * (1 - 1e-12) - 1e-12).all()
+    # Swing lows are lows / highs are highs of their bars
+    assert (price[kind == -1] == low[index[kind == -1]]).all()
+    assert (price[kind == 1] == high[index[kind == 1]]).all()
+
+
+def test_swing_points_on_short_or_flat_series():
+    assert len(patterns.swing_points(np.ones(1), np.ones(1))["index"]) == 0
+    assert len(patterns.swing_points(np.ones(50), np.ones(50))["index"]) == 0
+
+
+def test_window_swings_match_brute_force():
+    df = make_candles(300, seed=9)
+    high, low, close = (df[c].to_numpy() for c in ('high', 'low', 'close'))
+    lookahead, min_move = 12, 0.01
+    lows, highs = patterns.window_swings(high, low, close, lookahead, min_move)
+    assert len(lows) == len(close) - lookahead
+    for i in range(len(lows)):
+        lo, hi = low[i:i + lookahead + 1].min(), high[i:i + lookahead + 1].max()
+        assert lows[i] == (lo == low[i] and (hi - close[i]) / close[i] > min_move)
+        assert highs[i] == (hi == high[i] and (close[i] - lo) / close[i] > min_move)
+    assert patterns.window_swings(high[:5], low[:5], close[:5], lookahead, min_move)[0].size == 0
+
+
+def test_swing_strategy_trades_on_confirmations():
+    df = make_candles(1200, seed=10)
+    result = backtester.run_backtest(df, {"type": "SWING", "params": {"min_move": 0.02}})
+    assert result["trades"]
+    # No lookahead: the trades made on a prefix are the prefix of the full run's trades
+    prefix = backtester.run_backtest(df.iloc[:900].copy(), {"type": "SWING", "params": {"min_move": 0.02}})
+    n = len(prefix["trades"])
+    assert prefix["trades"][:n - 1] == result["trades"][:n - 1]
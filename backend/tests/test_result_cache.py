@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+import result_cache
+from candles import CandleArrays
+from result_cache import ResultCache, cache_key, fingerprint_candles
+
+LOGIC = {"type": "TREND", "params": {"invest_limit": 2500}}
+
+
+def test_identical_frames_share_a_key(candles):
+    assert cache_key(candles, LOGIC) == cache_key(candles.copy(), dict(LOGIC))
+    # epoch-ms timestamps: a frame and its CandleArrays agree
+    assert fingerprint_candles(candles) == fingerprint_candles(CandleArrays.from_frame(candles))
+
+
+def test_logic_key_ignores_dict_order(candles):
+    reordered = {"params": {"invest_limit": 2500}, "type": "TREND"}
+    assert cache_key(candles, LOGIC) == cache_key(candles, reordered)
+    assert cache_key(candles, LOGIC) != cache_key(candles, {"type": "TREND", "params": {"invest_limit": 1000}})
+
+
+@pytest.mark.parametrize("column", ["open", "high", "low", "close", "volume"])
+def test_forming_bar_update_changes_key(candles, column):
+    updated = candles.copy()
+    updated.loc[updated.index[-1], column] *= 1.001
+    assert cache_key(candles, LOGIC) != cache_key(updated, LOGIC)
+
+
+def test_new_bar_changes_key(candles):
+    shorter = candles.iloc[:-1].copy()
+    shorter.attrs = dict(candles.attrs)
+    assert cache_key(candles, LOGIC) != cache_key(shorter, LOGIC)
+
+
+def test_market_changes_key(candles):
+    other = candles.copy()
+    other.attrs = {**candles.attrs, "coin": "OTHER"}
+    assert cache_key(candles, LOGIC) != cache_key(other, LOGIC)
+
+
+def test_frames_without_metadata_hash_prices(candles):
+    bare = candles.copy()
+    bare.attrs = {}
+    changed = bare.copy()
+    changed.loc[changed.index[10], "close"] *= 1.01
+    assert cache_key(bare, LOGIC) != cache_key(changed, LOGIC)
+
+
+def test_cached_backtest_reuses_result(candles, monkeypatch):
+    monkeypatch.setattr(result_cache, "_cache", ResultCache(max_entries=8))
+    first = result_cache.cached_backtest(candles, LOGIC)
+    assert result_cache.cached_backtest(candles, LOGIC) is first
+
+    updated = candles.copy()
+    updated.loc[updated.index[-1], "close"] *= 1.01
+    assert result_cache.cached_backtest(updated, LOGIC) is not first
+    assert result_cache.get_cache().stats()["hits"] == 1
+
+
+def test_memory_tier_is_lru():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_disk_tier_expires_and_prunes(tmp_path):
+    cache = ResultCache(max_entries=1, cache_dir=str(tmp_path), disk_max_entries=3, disk_max_age=60)
+    for k in range(5):
+        cache.put(f"k{k}", {"n": k})
+        path = cache._disk_path(f"k{k}")
+        os.utime(path, (time.time() - 10 + k, time.time() - 10 + k))
+
+    # Expired files are misses even before a prune removes them
+    old = time.time() - 3600
+    os.utime(cache._disk_path("k3"), (old, old))
+    cache.clear()
+    assert cache.get("k3") is None
+    assert cache.get("k4") == {"n": 4}
+
+    cache.prune_disk()
+    assert sorted(os.listdir(tmp_path)) == ["k1.json", "k2.json", "k4.json"]
@@ -0,0 +1,33 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import backtest_api
+import backtester
+import robustness
+from conftest import make_candles
+
+
+@pytest.fixture(scope="module")
+def result():
+    return backtester.run_backtest(make_candles(1500, seed=11), {"type": "RSI"})
+
+
+def test_analyze_is_reproducible_with_a_seed(result):
+    a = robustness.analyze(result, n_variants=300, seed=7)
+    b = robustness.analyze(result, n_variants=300, seed=7)
+    assert a == b
+    assert a["round_trips"] > 0
+    for method in ("trade_shuffle", "block_bootstrap", "fill_jitter"):
+        p = a[method]["return_pct"]
+        assert p["p5"] <= p["p50"] <= p["p95"]
+    # Costs only ever lower the jittered returns
+    assert robustness.analyze(result, n_variants=300, seed=7, fee_bps=50)["fill_jitter"]["return_pct"]["p50"] < a["fill_jitter"]["return_pct"]["p50"]
+
+
+@pytest.mark.parametrize("body", [{"jitter_bps": -1}, {"fee_bps": -0.5}, {"block_size": 0}, {"seed": -3}])
+def test_invalid_robustness_requests_are_rejected(body):
+    app = FastAPI()
+    app.include_router(backtest_api.router)
+    response = TestClient(app).post("/robustness", json=body)
+    assert response.status_code == 422
@@ -0,0 +1,75 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+from starlette.requests import Request
+
+import serialization
+
+RESULT = {
+    "metrics": {"total_return_pct": np.float64(1.5), "total_trades": np.int64(3), "sharpe": float("nan")},
+    "trades": [],
+    "equity_curve": [{"date": f"2024-01-01 {h % 24:02d}:00", "equity": 10000.0 + h, "price": 100.0 + h} for h in range(200)],
+}
+
+
+def make_request(accept_encoding="", accept="", query=""):
+    headers = [(b"accept-encoding", accept_encoding.encode()), (b"accept", accept.encode())]
+    return Request({"type": "http", "method": "POST", "path": "/run", "headers": headers, "query_string": query.encode()})
+
+
+def decode(response):
+    body = response.body
+    if response.headers.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def test_plain_json_with_numpy_and_nan():
+    response = serialization.respond(make_request(), RESULT)
+    assert response.media_type == "application/json"
+    assert "content-encoding" not in response.headers
+    data = decode(response)
+    assert data["metrics"] == {"total_return_pct": 1.5, "total_trades": 3, "sharpe": None}
+    assert len(data["equity_curve"]) == 200
+
+
+@pytest.mark.parametrize("header, encoding", [("gzip", "gzip"), ("gzip;q=0", None), ("br, gzip;q=0.5", "gzip"), ("identity", None)])
+def test_gzip_negotiation(header, encoding):
+    response = serialization.respond(make_request(accept_encoding=header), RESULT)
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding, Accept"
+    assert decode(response)["metrics"]["total_trades"] == 3
+
+
+def test_small_bodies_are_not_compressed():
+    response = serialization.respond(make_request(accept_encoding="gzip"), {"ok": True})
+    assert "content-encoding" not in response.headers
+
+
+def test_zstd_is_preferred_when_available():
+    zstandard = pytest.importorskip("zstandard")
+    response = serialization.respond(make_request(accept_encoding="gzip, zstd"), RESULT)
+    assert response.headers["content-encoding"] == "zstd"
+    assert json.loads(zstandard.ZstdDecompressor().decompressobj().decompress(response.body))["metrics"]["total_trades"] == 3
+
+
+def test_arrow_is_opt_in():
+    pa = pytest.importorskip("pyarrow")
+    benchmark = [{"date": p["date"], "equity": 1.0} for p in RESULT["equity_curve"]]
+    response = serialization.respond(make_request(query="format=arrow"), RESULT, arrow_result=RESULT, arrow_benchmark=benchmark)
+    assert response.media_type == serialization.ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert table.column_names == ["date", "equity", "price", "benchmark_equity"]
+    assert json.loads(table.schema.metadata[b"result"])["metrics"]["total_trades"] == 3
+
+    # Without the opt-in (or without arrow_result) the same call answers JSON
+    assert serialization.respond(make_request(), RESULT, arrow_result=RESULT).media_type == "application/json"
+
+
+def test_arrow_falls_back_to_json_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(serialization, "to_arrow", lambda result, benchmark=None: None)
+    response = serialization.respond(make_request(accept=serialization.ARROW_MEDIA_TYPE), RESULT, arrow_result=RESULT)
+    assert response.media_type == "application/json"
+    assert decode(response)["metrics"]["total_trades"] == 3
@@ -0,0 +1,99 @@
+import threading
+
+from singleflight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, n):
+    """
+    Start n threads calling flight.do(key, fn). Returns (threads, results, errors);
+    results / errors fill in as the threads finish.
+    """
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def wait_for_waiters(flight, n):
+    while flight.stats()["coalesced"] < n:
+        threading.Event().wait(0.001)
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        return {"value": 42}
+
+    threads, results, errors = run_concurrently(flight, "k", fn, 8)
+    wait_for_waiters(flight, 7)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(runs) == 1
+    assert not errors
+    assert len(results) == 8
+    assert all(r is results[0] for r in results)
+    stats = flight.stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 7
+    assert stats["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("boom")
+
+    threads, results, errors = run_concurrently(flight, "k", fn, 4)
+    wait_for_waiters(flight, 3)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert not results
+    assert len(errors) == 4
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_finished_keys_run_again():
+    flight = SingleFlight("test")
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    assert flight.stats()["executions"] == 2
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        return threading.get_ident()
+
+    a = run_concurrently(flight, "a", fn, 1)
+    b = run_concurrently(flight, "b", fn, 1)
+    while flight.stats()["in_flight"] < 2:
+        threading.Event().wait(0.001)
+    release.set()
+    for t in a[0] + b[0]:
+        t.join()
+
+    assert a[1][0] != b[1][0]
+    assert flight.stats()["coalesced"] == 0
@@ -0,0 +1,35 @@
+import sys
+
+import benchmark
+import warmup
+from lazy import lazy_import
+
+
+def test_lazy_module_imports_on_first_attribute(tmp_path, monkeypatch):
+    (tmp_path / "lazy_probe_mod.py").write_text("VALUE = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_probe_mod", raising=False)
+
+    mod = lazy_import("lazy_probe_mod")
+    assert "lazy_probe_mod" not in sys.modules
+    assert "not loaded" in repr(mod)
+    assert mod.VALUE == 1
+    assert "lazy_probe_mod" in sys.modules
+    assert "(loaded)" in repr(mod)
+
+
+def test_importing_main_skips_the_data_stack():
+    ok, report = benchmark.bench_startup(runs=1, budget_ms=60_000)
+    assert report.get("health_status") == 200, report
+    assert report["eagerly_loaded"] == []
+    assert ok
+
+
+def test_warmup_fills_caches_and_reports(monkeypatch):
+    monkeypatch.setattr(warmup, "_status", {"state": "running", "modules_ms": {}, "markets_ms": {}, "errors": []})
+    warmup._run(["SYNTH-GBM-1"], "1h")
+    status = warmup.status()
+    assert status["state"] == "done"
+    assert set(status["modules_ms"]) == set(warmup.WARMUP_MODULES)
+    assert list(status["markets_ms"]) == ["SYNTH-GBM-1"]
+    assert status["errors"] == []
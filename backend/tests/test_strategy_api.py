@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester
+import strategy_api
+from strategy_api import BarContext, StrategyState, strategy
+from conftest import make_candles
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Strategies registered by a test disappear with it
+    monkeypatch.setattr(strategy_api, "STRATEGIES", dict(strategy_api.STRATEGIES))
+    return strategy_api.STRATEGIES
+
+
+def test_bar_context_views():
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=3, freq="h"),
+        "close": [1.0, 2.0, 3.0],
+        "label": ["a", "b", "c"],
+    })
+    df.attrs.update(coin="BTC", interval="1h")
+    ctx = BarContext.from_frame(df)
+    assert ctx.n == 3 and ctx.coin == "BTC" and ctx.interval == "1h"
+    assert ctx.close == [1.0, 2.0, 3.0] and ctx["close"] is ctx.close
+    assert isinstance(ctx.array("close"), np.ndarray)
+    assert ctx.timestamp[1] - ctx.timestamp[0] == 3_600_000
+    assert "close" in ctx and "label" not in ctx # non-numeric columns are left out
+    with pytest.raises(AttributeError):
+        ctx.volume
+
+
+def test_registered_strategy_runs_with_state_and_prepare(registry):
+    class CountState(StrategyState):
+        __slots__ = ('bars', 'entry_prices')
+
+        def __init__(self, ctx, params):
+            super().__init__(ctx, params)
+            self.bars = 0
+            self.entry_prices = []
+
+    def add_parity(df, params):
+        df['parity'] = np.arange(len(df)) % params.get("every", 10)
+        return df
+
+    states = []
+
+    @strategy("TEST_EVERY", state=CountState, prepare=add_parity)
+    def strat_every(ctx, position, params, state):
+        if not states or states[-1] is not state:
+            states.append(state)
+        state.bars += 1
+        if position == 1:
+            state.entry_prices.append(state.avg_entry_price)
+        if ctx.parity[ctx.i] == 0:
+            return 1 if position == 0 else -1
+        return 0
+
+    result = backtester.run_backtest(make_candles(500), {"type": "TEST_EVERY", "params": {"every": 25}})
+    assert "TEST_EVERY" in registry
+    assert len(states) == 1 # state is created once per run
+    state = states[0]
+    trades = result["trades"]
+    assert trades and [t["side"] for t in trades[:4]] == ["BUY", "SELL", "BUY", "SELL"]
+    assert state.bars == len(result["equity_curve"])
+    # avg_entry_price is the fill price while the position is open
+    assert state.entry_prices[0] == pytest.approx(trades[0]["price"])
+
+
+def test_unknown_type_runs_the_default(registry):
+    df = make_candles(400)
+    assert backtester.run_backtest(df, {"type": "NOPE"}) == backtester.run_backtest(df, {"type": strategy_api.DEFAULT_STRATEGY})
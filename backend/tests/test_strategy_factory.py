@@ -0,0 +1,78 @@
+import pytest
+
+import backtest_api
+import backtester
+import strategy_factory
+from conftest import make_candles
+
+
+@pytest.fixture(scope="module")
+def candles():
+    return make_candles(720, seed=11)
+
+
+def evolve(candles, **kwargs):
+    return strategy_factory.evolve_strategy(candles, workers=1, seed=0, **kwargs)
+
+
+def test_evolve_returns_runnable_rules(candles):
+    result = evolve(candles, population=30, generations=3)
+    assert result["type"] == "RULES"
+    assert result["params"]["rules"]
+    assert result["search"]["population"] == 30
+    assert 1 <= result["search"]["generations"] <= 3
+    assert "total_return_pct" in result["metrics"]
+
+
+def test_evolve_settings_are_clamped(candles, monkeypatch):
+    monkeypatch.setattr(strategy_factory, "MAX_POPULATION", 12)
+    monkeypatch.setattr(strategy_factory, "MAX_GENERATIONS", 2)
+    result = evolve(candles, population=100_000, generations=10_000, patience=100)
+    assert result["search"]["population"] == 12
+    assert result["search"]["generations"] == 2
+    assert result["search"]["evaluated"] == 24
+
+
+@pytest.mark.parametrize("population, generations, elite", [(0, 0, 0), (1, -5, 50), (2, 1, 2)])
+def test_evolve_degenerate_settings(candles, population, generations, elite):
+    result = evolve(candles, population=population, generations=generations, elite=elite)
+    assert result["search"]["population"] == 2
+    assert result["search"]["generations"] >= 1
+
+
+def test_evolve_is_seeded(candles):
+    a = evolve(candles, population=20, generations=2)
+    b = evolve(candles, population=20, generations=2)
+    assert a["params"] == b["params"]
+    assert a["fitness"] == b["fitness"]
+
+
+def test_finalists_are_rescored_through_the_engine(candles, monkeypatch):
+    calls = []
+    original = strategy_factory.engine.simulate
+    def simulate(signals, *args, **kwargs):
+        calls.append(signals)
+        return original(signals, *args, **kwargs)
+    monkeypatch.setattr(strategy_factory.engine, "simulate", simulate)
+    result = evolve(candles, population=30, generations=3)
+    assert 1 <= len(calls) <= strategy_factory.FINALISTS
+    # Long/flat signals only: entries and exits alternate
+    events = [s[s != 0] for s in calls]
+    assert all((e[::2] == 1).all() and (e[1::2] == -1).all() for e in events)
+    assert result["fitness"] > -1
+
+
+@pytest.mark.parametrize("params, error", [
+    ({"leverage": "5"}, None),
+    ({"leverage": 0.5, "invest_limit": 1000}, None),
+    ({"leverage": "x"}, "params.leverage must be a number"),
+    ({"invest_limit": -1}, "params.invest_limit must be a non-negative number"),
+    ({"leverage": None}, "params.leverage must be a number"),
+])
+def test_engine_params(candles, params, error):
+    df = backtester.calculate_indicators(candles)
+    assert backtest_api.logic_error(df, {"type": "RSI", "params": params}) == error
+    if error is None:
+        settings = backtester.engine_params(params)
+        assert settings["leverage"] >= 1
+        assert backtester.run_backtest(candles, {"type": "RSI", "params": params})["metrics"]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import feature_store
+import synthetic
+from feature_store import FeatureStore
+
+
+@pytest.mark.parametrize("scenario", list(synthetic.SCENARIOS))
+def test_candles_are_valid_and_seeded(scenario):
+    c = synthetic.generate_candle_arrays(5000, "1h", scenario, seed=3)
+    assert len(c) == 5000
+    assert (np.diff(c.timestamp) == 3_600_000).all()
+    assert (c.high >= np.maximum(c.open, c.close)).all()
+    assert (c.low <= np.minimum(c.open, c.close)).all()
+    assert (c.low > 0).all() and (c.volume > 0).all()
+    assert (c.open[1:] == c.close[:-1]).all()
+
+    again = synthetic.generate_candle_arrays(5000, "1h", scenario, seed=3)
+    assert all((a == b).all() for a, b in zip(c.columns().values(), again.columns().values()))
+    other = synthetic.generate_candle_arrays(5000, "1h", scenario, seed=4)
+    assert not (other.close == c.close).all()
+
+
+def test_long_paths_stay_in_the_price_band():
+    c = synthetic.generate_candle_arrays(200_000, "1m", "gbm", seed=1, sigma=5.0, price_band=10.0)
+    assert np.isfinite(c.close).all()
+    assert c.close.min() >= 10.0 - 1e-9 and c.close.max() <= 1000.0 + 1e-9
+
+
+def test_bootstrap_resamples_source_returns():
+    src = np.array([0.01, -0.02, 0.005, np.nan])
+    r = synthetic.log_returns(500, scenario="bootstrap", seed=0, source_returns=src, block_size=2)
+    assert set(np.round(r, 6)) <= {0.01, -0.02, 0.005}
+    with pytest.raises(ValueError):
+        synthetic.log_returns(10, scenario="bootstrap", source_returns=[np.nan])
+
+
+@pytest.mark.parametrize("kwargs", [{"scenario": "moon"}, {"interval": "7m"}])
+def test_unknown_settings_raise(kwargs):
+    with pytest.raises(ValueError):
+        synthetic.generate_candle_arrays(10, **kwargs)
+
+
+def test_market_names():
+    assert synthetic.is_synthetic_market("synth-gbm") and not synthetic.is_synthetic_market("BTC")
+    a = synthetic.from_market_name("SYNTH-CRASH-7", "4h", days=30)
+    assert a.coin == "SYNTH-CRASH-7" and a.interval == "4h" and len(a) == 180
+    assert (a.close == synthetic.from_market_name("synth-crash-7", "4h").close).all()
+    # Without a seed the name itself is the seed
+    assert (synthetic.from_market_name("SYNTH-JUMP").close == synthetic.from_market_name("SYNTH-JUMP").close).all()
+    assert not (synthetic.from_market_name("SYNTH-JUMP").close == synthetic.from_market_name("SYNTH-JUMP-1").close).all()
+
+
+def test_synthetic_features_stay_out_of_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, "_store", FeatureStore(str(tmp_path)))
+    monkeypatch.setattr(feature_store, "_synthetic_frames", feature_store.OrderedDict())
+    monkeypatch.setattr(feature_store, "SYNTHETIC_CACHE_SIZE", 2)
+    df = feature_store.get_features("SYNTH-REGIME-1", "1h")
+    assert len(df) == 720 and "rsi" in df
+    assert feature_store.get_features("SYNTH-REGIME-1", "1h") is df
+    for seed in (2, 3):
+        feature_store.get_features(f"SYNTH-REGIME-{seed}", "1h")
+    assert len(feature_store._synthetic_frames) == 2
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,73 @@
+import os
+import time
+import threading
+from lazy import lazy_import
+
+# Background warmup after startup: /health answers as soon as FastAPI is up, while this
+# thread pays the data-stack import cost and fills the candle / feature / result caches
+# for the markets most requests ask for. The engine is pure NumPy/pandas (no JIT), so a
+# backtest per market is what brings every code path up to speed.
+
+WARMUP_ENABLED = os.getenv("WARMUP", "1") != "0"
+WARMUP_MARKETS = [m.strip().upper() for m in os.getenv("WARMUP_MARKETS", "BTC,ETH,SOL").split(",") if m.strip()]
+WARMUP_TIMEFRAME = os.getenv("WARMUP_TIMEFRAME", "1h")
+WARMUP_MODULES = ["numpy", "pandas", "backtester", "feature_store", "result_cache", "serialization"]
+
+feature_store = lazy_import("feature_store")
+result_cache = lazy_import("result_cache")
+
+_status = {"state": "idle", "modules_ms": {}, "markets_ms": {}, "errors": []}
+_lock = threading.Lock()
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _run(markets, timeframe):
+    import importlib
+
+    for name in WARMUP_MODULES:
+        ms = _timed(lambda: importlib.import_module(name))
+        with _lock:
+            _status["modules_ms"][name] = ms
+
+    for coin in markets:
+        def warm():
+            df = feature_store.get_features(coin, timeframe)
+            if not df.empty:
+                result_cache.cached_backtest(df, {"type": "TREND"})
+        try:
+            ms = _timed(warm)
+            with _lock:
+                _status["markets_ms"][coin] = ms
+        except Exception as e:
+            print(f"Error warming {coin}: {e}")
+            with _lock:
+                _status["errors"].append(f"{coin}: {e}")
+
+    with _lock:
+        _status["state"] = "done"
+        _status["finished_at"] = time.time()
+
+
+def start(markets=None, timeframe=WARMUP_TIMEFRAME):
+    """
+    Kick off warmup in a daemon thread (no-op when WARMUP=0 or already started).
+    """
+    with _lock:
+        if not WARMUP_ENABLED:
+            _status["state"] = "disabled"
+            return
+        if _status["state"] != "idle":
+            return
+        _status["state"] = "running"
+        _status["started_at"] = time.time()
+    threading.Thread(target=_run, args=(markets or WARMUP_MARKETS, timeframe), name="warmup", daemon=True).start()
+
+
+def status():
+    with _lock:
+        return {**_status, "modules_ms": dict(_status["modules_ms"]), "markets_ms": dict(_status["markets_ms"]), "errors": list(_status["errors"])}